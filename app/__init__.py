@@ -28,6 +28,8 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
     app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['UPLOAD_CHUNK_MAX_BYTES'] = UPLOAD_CHUNK_MAX_BYTES
+    app.config['PREFLIGHT_MAX_BYTES'] = PREFLIGHT_MAX_BYTES
     app.config['MAIL_SERVER'] = MAIL_SERVER
     app.config['MAIL_PORT'] = MAIL_PORT
     app.config['MAIL_USE_TLS'] = MAIL_USE_TLS
@@ -37,6 +39,28 @@ def create_app():
     app.config['MAIL_DEFAULT_SENDER'] = MAIL_DEFAULT_SENDER
     app.config['ADMIN_EMAILS'] = ADMIN_EMAILS
     app.config['SEVEN_ZIP_CMD'] = SEVEN_ZIP_CMD
+    app.config['EXTRACT_OWNER'] = EXTRACT_OWNER
+    app.config['EXTRACT_MAX_DEPTH'] = EXTRACT_MAX_DEPTH
+    app.config['EXTRACT_WORKERS'] = EXTRACT_WORKERS
+    app.config['ZERO_EXTRACTION'] = ZERO_EXTRACTION
+    app.config['JOB_WORKERS'] = JOB_WORKERS
+    app.config['JOB_WEB_WORKERS'] = JOB_WEB_WORKERS
+    app.config['JOB_CLAIM_LOCK'] = JOB_CLAIM_LOCK
+    app.config['JOB_HEARTBEAT_INTERVAL'] = JOB_HEARTBEAT_INTERVAL
+    app.config['JOB_LEASE_SECONDS'] = JOB_LEASE_SECONDS
+    app.config['JOB_MAX_ATTEMPTS'] = JOB_MAX_ATTEMPTS
+    app.config['ANALYZER_POOL'] = ANALYZER_POOL
+    app.config['ANALYZER_WORKERS'] = ANALYZER_WORKERS
+    app.config['ANALYZER_RECYCLE_JOBS'] = ANALYZER_RECYCLE_JOBS
+    app.config['SCRIPTS_FOLDER'] = SCRIPTS_FOLDER
+    app.config['JOB_AGING_RATE'] = JOB_AGING_RATE
+    app.config['JOB_USER_MAX_RUNNING'] = JOB_USER_MAX_RUNNING
+    app.config['JOB_USER_WEIGHTS'] = JOB_USER_WEIGHTS
+    app.config['SCRIPT_CPU_LIMIT'] = SCRIPT_CPU_LIMIT
+    app.config['SCRIPT_MEMORY_LIMIT'] = SCRIPT_MEMORY_LIMIT
+    app.config['SCRIPT_OUTPUT_LIMIT'] = SCRIPT_OUTPUT_LIMIT
+    app.config['RESULT_CACHE_FOLDER'] = RESULT_CACHE_FOLDER
+    app.config['RESULT_CACHE_MAX_BYTES'] = RESULT_CACHE_MAX_BYTES
     
     # Log the static folder path for debugging
     app_logger = logging.getLogger('app')
@@ -92,6 +116,12 @@ def create_app():
     employee_logger.handlers = [file_handler, console_handler]
     employee_logger.propagate = False
 
+    # Configure upload_routes logger
+    upload_logger = logging.getLogger('app.routes.upload_routes')
+    upload_logger.setLevel(logging.DEBUG)
+    upload_logger.handlers = [file_handler, console_handler]
+    upload_logger.propagate = False
+
     # Configure Flask's built-in logger
     app.logger.handlers = [file_handler, console_handler]
     app.logger.setLevel(logging.DEBUG)
@@ -103,12 +133,22 @@ def create_app():
     
     # Register blueprints
   	
-    from app.routes import auth_routes, employee_routes, admin_routes, static_routes
+    from app.routes import auth_routes, employee_routes, admin_routes, static_routes, upload_routes
     app.register_blueprint(auth_routes.auth_bp)
     app.register_blueprint(employee_routes.employee_bp)
+    app.register_blueprint(upload_routes.upload_bp, url_prefix='/upload')
     app.register_blueprint(admin_routes.admin_bp, url_prefix='/admin')
     app.register_blueprint(static_routes.static_bp)
     
+    # Script job worker pool (threads start on first use), the pipeline stages and analyzers it runs
+    from app.jobs import job_queue
+    from app.analyzers import analyzer_pool
+    from app.result_cache import result_cache
+    from app import pipeline
+    job_queue.init_app(app)
+    analyzer_pool.init_app(app)
+    result_cache.init_app(app)
+    
     # Add custom Jinja filter
     app.jinja_env.filters['exists'] = file_exists
     
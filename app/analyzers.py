@@ -0,0 +1,266 @@
+# Location: /opt/my_flask_app/app/analyzers.py
+"""
+Warm process pool for the analysis scripts.
+
+Each script under SCRIPTS_FOLDER has a run(...) entry point taking the same
+arguments as its command line. Pool workers import all of them when they
+start, so interpreter start-up, imports and the compiled pattern tables are
+paid once per worker instead of once per report (and CHR no longer starts two
+more interpreters for its steps). A job that overruns its timeout is stopped
+inside its worker by SIGALRM, which keeps the worker warm; if that does not
+get through, the pool is killed and replaced. Python 3.8's ProcessPoolExecutor
+has no max_tasks_per_child, so the whole pool is replaced once it has run
+ANALYZER_RECYCLE_JOBS jobs per worker. An analyzer's progress(**counts) hook
+is pointed at the session's progress channel (app.progress) for each job.
+
+Each job runs under the script resource limits (app.limits) and reports the
+CPU time and peak RSS it used. A job is cancelled by leaving a marker named
+after its token in the pool's cancel folder and sending SIGUSR1 to the
+workers: the one running that job raises AnalyzerCancelled, the others
+ignore it. A job given a run record (app.journal) holds its lock while it
+runs and records its success there, so the job can be recovered if the
+process that submitted it dies first.
+"""
+import io
+import os
+import time
+import uuid
+import shlex
+import signal
+import logging
+import resource
+import tempfile
+import threading
+import contextlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from app.progress import ProgressReporter
+from app.limits import ResourceLimits, restore, cpu_time, reset_peak_rss, peak_rss
+
+logger = logging.getLogger(__name__)
+
+# Job name -> script, relative to SCRIPTS_FOLDER
+ANALYZER_SCRIPTS = {
+    'CCR': 'CCR/ccr_engine.py',  # both reports, with-default and skip-default, from one pass
+    'CHR': 'CHR/script_chr.py',
+    'BUCKET': 'Bucket/script_bucket.py',
+    'KEYWORD': 'KeyWord/script_keyword.py',
+}
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+TIMEOUT_GRACE = 30  # seconds past the job timeout before the pool is killed
+CANCEL_GRACE = 10  # seconds a cancelled job has to stop before the pool is killed
+CANCEL_POLL = 1  # seconds between checks for a cancel request while a job runs
+
+_modules = {}  # script path -> module, in each worker
+_cancel_folder = None  # in each worker: where cancel markers are left
+_current_token = None  # in each worker: the token of the job it is running
+
+
+class AnalyzerTimeout(Exception):
+    """Raised when an analyzer runs past its timeout."""
+
+
+class AnalyzerCancelled(Exception):
+    """Raised when an analyzer job is cancelled."""
+
+
+def _load(path):
+    module = _modules.get(path)
+    if module is None:
+        name = 'analyzer_' + os.path.splitext(os.path.basename(path))[0].replace('-', '_').lower()
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[path] = module
+    return module
+
+
+def _warm(paths, cancel_folder):
+    """Worker initializer: import every analyzer once, and listen for cancel requests."""
+    global _cancel_folder
+    _cancel_folder = cancel_folder
+    signal.signal(signal.SIGUSR1, _cancel)
+    logging.getLogger().setLevel(logging.INFO)
+    for path in paths:
+        try:
+            _load(path)
+        except Exception as e:
+            logger.error(f"Could not preload analyzer {path}: {str(e)}")
+
+
+def _alarm(signum, frame):
+    raise AnalyzerTimeout('Timed out')
+
+
+def _cancel(signum, frame):
+    if _current_token and os.path.exists(os.path.join(_cancel_folder, _current_token)):
+        raise AnalyzerCancelled('Cancelled')
+
+
+def _run(path, args, timeout, channel=None, limits=None, token=None, record=None):
+    """
+    Worker side of a job: run(*args) under limits, with logging sent to its log file and progress
+    to the (channel path, script name) channel, if any. Returns (what it printed, CPU seconds,
+    peak RSS in bytes).
+    """
+    global _current_token
+    lock_file = None
+    if record is not None:
+        lock_file = record.hold()
+        record.set_owner(lock_file, os.getpid())
+    module = _load(path)
+    report = getattr(module, 'progress', None)
+    if channel and report is not None:
+        module.progress = ProgressReporter(*channel)
+    handler = logging.FileHandler(args[2])  # every analyzer takes its log file third
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    out = io.StringIO()
+    reset_peak_rss()
+    cpu_before = cpu_time(resource.getrusage(resource.RUSAGE_SELF))
+    previous = limits.apply() if limits else {}
+    _current_token = token
+    signal.signal(signal.SIGALRM, _alarm)
+    signal.alarm(timeout)
+    try:
+        _cancel(signal.SIGUSR1, None)  # cancelled while it waited for this worker
+        with contextlib.redirect_stdout(out):
+            module.run(*args)
+        if record is not None:
+            record.finish(0)
+    except BaseException as e:
+        # Travels back with the exception, so failed runs are measured too
+        e.usage = (cpu_time(resource.getrusage(resource.RUSAGE_SELF)) - cpu_before, peak_rss())
+        raise
+    finally:
+        signal.alarm(0)
+        _current_token = None
+        restore(previous)
+        root.removeHandler(handler)
+        handler.close()
+        if report is not None:
+            module.progress = report
+        if lock_file is not None:
+            lock_file.close()
+    return out.getvalue(), cpu_time(resource.getrusage(resource.RUSAGE_SELF)) - cpu_before, peak_rss()
+
+
+def _noop():
+    return os.getpid()
+
+
+class AnalyzerPool:
+    def __init__(self):
+        self.enabled = False
+        self.scripts_folder = None
+        self.workers = 1
+        self.recycle_jobs = 0
+        self.executor = None
+        self.submitted = 0
+        self.cancel_folder = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ANALYZER_POOL', False)
+        self.scripts_folder = app.config.get('SCRIPTS_FOLDER', '/opt/my_flask_app/scripts')
+        self.workers = max(1, app.config.get('ANALYZER_WORKERS', 4))
+        self.recycle_jobs = app.config.get('ANALYZER_RECYCLE_JOBS', 0)
+
+    def handles(self, script_name):
+        return self.enabled and script_name in ANALYZER_SCRIPTS
+
+    def _paths(self):
+        return [os.path.join(self.scripts_folder, script) for script in ANALYZER_SCRIPTS.values()]
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is not None and self.recycle_jobs and self.submitted >= self.recycle_jobs * self.workers:
+                logger.info(f"Recycling analyzer pool after {self.submitted} jobs")
+                self.executor.shutdown(wait=False)  # running jobs finish, then its workers exit
+                self.executor = None
+            if self.executor is None:
+                # forkserver: workers don't inherit the server's threads, locks and DB connections
+                if self.cancel_folder is None:
+                    self.cancel_folder = tempfile.mkdtemp(prefix='analyzer-cancel-')
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context('forkserver'),
+                                                    initializer=_warm, initargs=(self._paths(), self.cancel_folder))
+                self.submitted = 0
+            self.submitted += 1
+            return self.executor
+
+    def _discard(self, executor, kill=False):
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        if kill:
+            for process in list(getattr(executor, '_processes', {}).values()):
+                process.kill()
+        executor.shutdown(wait=False)
+
+    def prestart(self):
+        """Start (and warm) the workers now rather than on the first job."""
+        if self.enabled:
+            executor = self._executor()
+            for _ in range(self.workers):
+                executor.submit(_noop)
+
+    def run(self, script_name, command, timeout, progress_path=None, limits=None, cancelled=None, record=None):
+        """
+        Run the analyzer a shell command would have run ("python3.8 <script> <args>...") in
+        the pool under limits, reporting its progress to the channel at progress_path and
+        stopping it once cancelled() returns True, with its lock and success in record. Returns (what it printed, CPU seconds, peak
+        RSS in bytes); raises what it raised, AnalyzerTimeout or AnalyzerCancelled, with the
+        (CPU seconds, peak RSS) of a run that got as far as the worker in its usage attribute.
+        """
+        argv = shlex.split(command)
+        executor = self._executor()
+        channel = (progress_path, script_name) if progress_path else None
+        token = uuid.uuid4().hex
+        future = executor.submit(_run, argv[1], argv[2:], timeout, channel, limits or ResourceLimits(), token, record)
+        deadline = time.monotonic() + timeout + TIMEOUT_GRACE
+        try:
+            while True:
+                try:
+                    return future.result(timeout=max(0, min(CANCEL_POLL, deadline - time.monotonic())))
+                except FutureTimeout:
+                    if time.monotonic() >= deadline:
+                        logger.error(f"{script_name} analyzer did not stop at its timeout, killing the analyzer pool")
+                        self._discard(executor, kill=True)
+                        raise AnalyzerTimeout('Timed out')
+                    if cancelled is not None and cancelled():
+                        return self._cancel(executor, future, token, script_name)
+        except BrokenProcessPool:
+            logger.error(f"An analyzer worker died while running {script_name}, replacing the analyzer pool")
+            self._discard(executor)
+            raise
+        finally:
+            try:
+                os.remove(os.path.join(self.cancel_folder, token))
+            except OSError:
+                pass
+
+    def _cancel(self, executor, future, token, script_name):
+        """Stop a running job: signal the workers, and kill the pool if it doesn't stop in CANCEL_GRACE."""
+        logger.info(f"Cancelling {script_name} analyzer job {token}")
+        if future.cancel():
+            raise AnalyzerCancelled('Cancelled')
+        open(os.path.join(self.cancel_folder, token), 'w').close()
+        for process in list(getattr(executor, '_processes', {}).values()):
+            try:
+                os.kill(process.pid, signal.SIGUSR1)
+            except OSError:
+                pass
+        try:
+            return future.result(timeout=CANCEL_GRACE)  # it finished before the signal got there
+        except FutureTimeout:
+            logger.error(f"{script_name} analyzer did not stop when cancelled, killing the analyzer pool")
+            self._discard(executor, kill=True)
+            raise AnalyzerCancelled('Cancelled')
+
+
+analyzer_pool = AnalyzerPool()
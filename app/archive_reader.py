@@ -0,0 +1,270 @@
+# Location: /opt/my_flask_app/app/archive_reader.py
+"""
+Read members of an uploaded bundle in place, without extracting them.
+
+The member headers of the root logs.tar / logs.tar.gz are indexed once into the
+session's member index (table archive_members: name, data offset, size). For a
+plain .tar a member is then a bounded read at a known offset. For a .tar.gz the
+offsets are positions in the decompressed stream; while indexing we keep seek
+checkpoints (compressed offset, uncompressed offset, copy of the inflate state)
+every GZIP_CHECKPOINT_SPACING bytes, so reading a member only inflates from the
+nearest checkpoint instead of from the start of the file.
+
+zlib cannot serialise its inflate state, so gzip checkpoints live in memory
+(one small LRU per process). A process that has not seen the archive yet
+rebuilds them lazily while serving its first read.
+"""
+import io
+import os
+import zlib
+import tarfile
+import logging
+import threading
+from collections import OrderedDict
+
+from app.member_index import MemberIndex, has_index, member_kind
+
+logger = logging.getLogger(__name__)
+
+GZIP_CHECKPOINT_SPACING = 32 * 1024 * 1024
+GZIP_READ_SIZE = 64 * 1024
+CHECKPOINT_CACHE_SIZE = 4
+
+_checkpoint_cache = OrderedDict()
+_checkpoint_lock = threading.Lock()
+
+
+def is_gzip(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+
+class GzipCheckpoints:
+    """Seek checkpoints into one gzip file: sorted (compressed offset, uncompressed offset, inflate state)."""
+
+    def __init__(self, path, spacing=GZIP_CHECKPOINT_SPACING):
+        self.path = path
+        self.spacing = spacing
+        self.points = [(0, 0, None)]
+        self.lock = threading.Lock()
+
+    def add(self, compressed_offset, uncompressed_offset, decompressor):
+        with self.lock:
+            if uncompressed_offset < self.points[-1][1] + self.spacing:
+                return
+            self.points.append((compressed_offset, uncompressed_offset, decompressor.copy()))
+
+    def nearest(self, offset):
+        with self.lock:
+            best = self.points[0]
+            for point in self.points:
+                if point[1] > offset:
+                    break
+                best = point
+            return best
+
+    def open_at(self, offset):
+        """Return a GzipStream positioned at the given uncompressed offset."""
+        compressed_offset, uncompressed_offset, decompressor = self.nearest(offset)
+        stream = GzipStream(self, compressed_offset, uncompressed_offset,
+                            decompressor.copy() if decompressor else None)
+        stream.skip(offset - uncompressed_offset)
+        return stream
+
+
+def gzip_checkpoints(path):
+    """Process-wide checkpoints for path, rebuilt when the file changes."""
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+    with _checkpoint_lock:
+        checkpoints = _checkpoint_cache.pop(key, None) or GzipCheckpoints(path)
+        _checkpoint_cache[key] = checkpoints
+        while len(_checkpoint_cache) > CHECKPOINT_CACHE_SIZE:
+            _checkpoint_cache.popitem(last=False)
+    return checkpoints
+
+
+class GzipStream(io.RawIOBase):
+    """Forward-only decompressed view of a gzip file that records checkpoints as it goes."""
+
+    def __init__(self, checkpoints, compressed_offset=0, uncompressed_offset=0, decompressor=None):
+        self.checkpoints = checkpoints
+        self.file = open(checkpoints.path, 'rb')
+        self.file.seek(compressed_offset)
+        self.decompressor = decompressor or zlib.decompressobj(wbits=31)
+        self.position = uncompressed_offset
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        """Inflate the next piece of output into self.pending. Returns False at end of stream."""
+        while not self.pending:
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                if self.decompressor.eof:
+                    data = self.decompressor.unused_data
+                    if not data:
+                        data = self.file.read(GZIP_READ_SIZE)
+                    if not data.lstrip(b'\x00'):
+                        return False
+                    # Concatenated gzip members
+                    self.decompressor = zlib.decompressobj(wbits=31)
+                else:
+                    data = self.file.read(GZIP_READ_SIZE)
+                    if not data:
+                        return False
+            self.pending = self.decompressor.decompress(data, GZIP_READ_SIZE * 16)
+            if not self.decompressor.unconsumed_tail and not self.decompressor.eof:
+                self.checkpoints.add(self.file.tell(), self.position + len(self.pending), self.decompressor)
+        return True
+
+    def readinto(self, buffer):
+        if not self._fill():
+            return 0
+        count = min(len(buffer), len(self.pending))
+        buffer[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        self.position += count
+        return count
+
+    def skip(self, count):
+        while count > 0:
+            if not self._fill():
+                raise EOFError(f"Unexpected end of {self.checkpoints.path}")
+            step = min(count, len(self.pending))
+            self.pending = self.pending[step:]
+            self.position += step
+            count -= step
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
+
+
+class MemberReader(io.RawIOBase):
+    """Seekable read-only view of one member's data inside a .tar or .tar.gz."""
+
+    def __init__(self, tar_path, offset, size, gzipped=None):
+        self.tar_path = tar_path
+        self.offset = offset
+        self.size = size
+        self.position = 0
+        self.gzipped = is_gzip(tar_path) if gzipped is None else gzipped
+        self._stream = None
+        self._file = None if self.gzipped else open(tar_path, 'rb')
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def disk_location(self):
+        """(file descriptor, offset) of the member's bytes in a plain .tar; None for .tar.gz."""
+        return None if self.gzipped else (self._file.fileno(), self.offset)
+
+    def seek(self, position, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            position += self.position
+        elif whence == io.SEEK_END:
+            position += self.size
+        self.position = max(0, min(position, self.size))
+        return self.position
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.size - self.position)
+        if count <= 0:
+            return 0
+        if not self.gzipped:
+            self._file.seek(self.offset + self.position)
+            count = self._file.readinto(memoryview(buffer)[:count])
+        else:
+            target = self.offset + self.position
+            if self._stream is None or self._stream.position > target:
+                if self._stream is not None:
+                    self._stream.close()
+                self._stream = gzip_checkpoints(self.tar_path).open_at(target)
+            else:
+                self._stream.skip(target - self._stream.position)
+            count = self._stream.readinto(memoryview(buffer)[:count])
+        self.position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            if self._file:
+                self._file.close()
+            if self._stream:
+                self._stream.close()
+        super().close()
+
+
+def index_archive(tar_path, transaction_folder, on_header=None):
+    """
+    Index the member headers of tar_path into the session's member index.
+
+    For .tar.gz this decompresses the bundle once (recording gzip checkpoints on
+    the way); nothing is written besides the index. on_header, if given, is called
+    with every member's TarInfo. Returns the number of members.
+    """
+    archive = os.path.relpath(tar_path, transaction_folder)
+    rows = []
+    if is_gzip(tar_path):
+        with GzipStream(gzip_checkpoints(tar_path)) as stream:
+            with tarfile.open(fileobj=io.BufferedReader(stream, GZIP_READ_SIZE), mode='r|') as tar:
+                for member in tar:
+                    if on_header is not None:
+                        on_header(member)
+                    rows.append((member.name, member.offset_data, member.size, int(member.mtime), member_kind(member)))
+    else:
+        with tarfile.open(tar_path, mode='r:') as tar:
+            for member in tar:
+                if on_header is not None:
+                    on_header(member)
+                rows.append((member.name, member.offset_data, member.size, int(member.mtime), member_kind(member)))
+    with MemberIndex(transaction_folder) as index:
+        index.add_archive_members(archive, rows)
+    logger.info(f"Indexed {len(rows)} members of {tar_path} for in-place reads")
+    return len(rows)
+
+
+def open_session_member(transaction_folder, name):
+    """
+    Open the first member called name for binary reading: the extracted copy if
+    there is one, otherwise the member inside the uploaded archive. None if absent.
+    """
+    if has_index(transaction_folder):
+        with MemberIndex(transaction_folder) as index:
+            rel_path = index.find(name)
+            archive_member = None if rel_path else index.find_archive_member(name)
+        if rel_path:
+            return open(os.path.join(transaction_folder, rel_path), 'rb')
+        if archive_member and os.path.exists(os.path.join(transaction_folder, archive_member[0])):
+            archive, member_name, offset, size = archive_member
+            logger.debug(f"Reading {member_name} in place from {archive} (offset {offset}, {size} bytes)")
+            return io.BufferedReader(MemberReader(os.path.join(transaction_folder, archive), offset, size),
+                                     GZIP_READ_SIZE)
+        return None
+    # Sessions extracted before the member index existed
+    for root, _, files in os.walk(transaction_folder):
+        if name in files:
+            return open(os.path.join(root, name), 'rb')
+    return None
+
+
+def ensure_archive_indexed(tar_path, transaction_folder, on_header=None):
+    """
+    Index tar_path for in-place reads unless that was already done. Returns the number of members
+    indexed; on_header is called with their headers (see index_archive).
+    """
+    if has_index(transaction_folder):
+        with MemberIndex(transaction_folder) as index:
+            if index.has_archive(os.path.relpath(tar_path, transaction_folder)):
+                return 0
+    return index_archive(tar_path, transaction_folder, on_header)
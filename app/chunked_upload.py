@@ -0,0 +1,158 @@
+# Location: /opt/my_flask_app/app/chunked_upload.py
+"""
+Resumable chunked uploads.
+
+A chunked upload lives in a normal transaction folder. Each chunk is checked
+against its SHA-256 and written straight into logs.tar* at its byte offset, so
+the server never holds a second temporary copy of the bundle. The byte ranges
+received so far are kept in upload.json next to it; a client whose connection
+dropped asks for the missing ranges and sends only those. Once every byte is
+present the upload is finalized and handed to the normal extraction pipeline.
+"""
+import os
+import json
+import hashlib
+import logging
+
+from app.dedup import HASH_CHUNK_SIZE, digest_lock
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'upload.json'
+
+
+class ChunkError(Exception):
+    """Raised when a chunk is rejected (bad offset, size or checksum)."""
+
+
+def manifest_path(transaction_folder):
+    return os.path.join(transaction_folder, MANIFEST_FILENAME)
+
+
+def load_manifest(transaction_folder):
+    """Return the manifest of a chunked upload, or None if the folder has none."""
+    try:
+        with open(manifest_path(transaction_folder), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_manifest(transaction_folder, manifest):
+    path = manifest_path(transaction_folder)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def _lock(transaction_folder):
+    return digest_lock(transaction_folder, '.upload')
+
+
+def _merge_range(ranges, start, end):
+    """Add [start, end) to a sorted list of disjoint [start, end) ranges."""
+    merged = []
+    for range_start, range_end in sorted(ranges + [[start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def missing_ranges(manifest):
+    """Byte ranges [start, end) of the upload that have not been received yet."""
+    missing = []
+    position = 0
+    for start, end in manifest['received']:
+        if start > position:
+            missing.append([position, start])
+        position = max(position, end)
+    if position < manifest['size']:
+        missing.append([position, manifest['size']])
+    return missing
+
+
+def create_upload(transaction_folder, upload_id, filename, size, username, case_number, script_options):
+    """Start a chunked upload into transaction_folder. Returns the manifest."""
+    tar_name = 'logs.tar.gz' if filename.endswith('.tar.gz') else 'logs.tar'
+    manifest = {
+        'upload_id': upload_id,
+        'filename': filename,
+        'tar_name': tar_name,
+        'size': size,
+        'username': username,
+        'case_number': case_number,
+        'script_options': script_options,
+        'received': [],
+        'finalized': False,
+    }
+    with _lock(transaction_folder):
+        # Sparse file of the final size; chunks fill it in place
+        with open(os.path.join(transaction_folder, tar_name), 'wb') as f:
+            f.truncate(size)
+        _save_manifest(transaction_folder, manifest)
+    logger.info(f"Started chunked upload {upload_id} of {filename} ({size} bytes)")
+    return manifest
+
+
+def write_chunk(transaction_folder, offset, data, sha256, max_chunk):
+    """Verify a chunk and write it at offset. Returns the updated manifest."""
+    if len(data) > max_chunk:
+        raise ChunkError(f"Chunk of {len(data)} bytes exceeds the {max_chunk} byte limit")
+    if hashlib.sha256(data).hexdigest() != (sha256 or '').lower():
+        raise ChunkError(f"Checksum mismatch for chunk at offset {offset}")
+    with _lock(transaction_folder):
+        manifest = load_manifest(transaction_folder)
+        if manifest['finalized']:
+            raise ChunkError('Upload is already finalized')
+        if offset < 0 or offset + len(data) > manifest['size']:
+            raise ChunkError(f"Chunk at offset {offset} ({len(data)} bytes) is outside the {manifest['size']} byte upload")
+        fd = os.open(os.path.join(transaction_folder, manifest['tar_name']), os.O_WRONLY)
+        try:
+            view = memoryview(data)
+            written = 0
+            while written < len(data):
+                written += os.pwrite(fd, view[written:], offset + written)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if data:
+            manifest['received'] = _merge_range(manifest['received'], offset, offset + len(data))
+        _save_manifest(transaction_folder, manifest)
+    return manifest
+
+
+def upload_status(manifest):
+    received = sum(end - start for start, end in manifest['received'])
+    return {
+        'upload_id': manifest['upload_id'],
+        'size': manifest['size'],
+        'received_bytes': received,
+        'received': manifest['received'],
+        'missing': missing_ranges(manifest),
+        'finalized': manifest['finalized'],
+    }
+
+
+def finalize_upload(transaction_folder):
+    """
+    Mark a complete upload finalized. Returns (manifest, tar path, sha256 hex).
+    Raises ChunkError while ranges are still missing.
+    """
+    with _lock(transaction_folder):
+        manifest = load_manifest(transaction_folder)
+        missing = missing_ranges(manifest)
+        if missing:
+            raise ChunkError(f"Upload is incomplete, {len(missing)} byte ranges missing")
+        tar_path = os.path.join(transaction_folder, manifest['tar_name'])
+        digest = hashlib.sha256()
+        with open(tar_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        manifest['finalized'] = True
+        manifest['sha256'] = digest.hexdigest()
+        _save_manifest(transaction_folder, manifest)
+    logger.info(f"Finalized chunked upload {manifest['upload_id']} ({manifest['size']} bytes, sha256 {manifest['sha256']})")
+    return manifest, tar_path, manifest['sha256']
@@ -5,6 +5,8 @@ import logging
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 
+from app.member_index import MemberIndex, has_index
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(
     filename="/opt/my_flask_app/logs/cleanup.log",
@@ -12,15 +14,78 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+def _cleanup_indexed_session(folder, now, raw_retention, io_retention):
+    """Clean one session using its member index instead of walking the extracted tree."""
+    # Raw uploads
+    for name in ("logs.tar", "logs.tar.gz"):
+        file_path = os.path.join(folder, name)
+        if os.path.exists(file_path) and now - datetime.utcfromtimestamp(os.path.getmtime(file_path)) > raw_retention:
+            try:
+                os.remove(file_path)
+                logger.info("Deleted raw file: %s", file_path)
+            except Exception as e:
+                logger.error("Error deleting file %s: %s", file_path, e)
+
+    # Generated input/output/log folders
+    for d in ("input", "output", "log"):
+        folder_path = os.path.join(folder, d)
+        if os.path.isdir(folder_path) and now - datetime.utcfromtimestamp(os.path.getmtime(folder_path)) > io_retention:
+            try:
+                shutil.rmtree(folder_path)
+                logger.info("Deleted I/O folder: %s", folder_path)
+            except Exception as e:
+                logger.error("Error deleting folder %s: %s", folder_path, e)
+
+    # Untarred intermediate data, except config (kept for the keyword script)
+    cutoff = (now - raw_retention - datetime(1970, 1, 1)).total_seconds()
+    with MemberIndex(folder) as index:
+        removed = []
+        for rel_path, kind in list(index.extracted_before(cutoff)):
+            if rel_path == "config" or rel_path.startswith("config/"):
+                continue
+            member_path = index.abspath(rel_path)
+            try:
+                if kind == "dir":
+                    os.rmdir(member_path)
+                else:
+                    os.remove(member_path)
+                removed.append(rel_path)
+            except FileNotFoundError:
+                removed.append(rel_path)
+            except OSError as e:
+                logger.debug("Keeping %s: %s", member_path, e)
+        index.remove(removed)
+    if removed:
+        logger.info("Deleted %d intermediate members from %s", len(removed), folder)
+
+
 def cleanup_files(app):
     with app.app_context():
+        from app.models import SessionMetadata
+
         upload_folder = app.config["UPLOAD_FOLDER"]
         now = datetime.utcnow()
         raw_retention = timedelta(days=app.config.get("RAW_RETENTION_DAYS", 30))
         io_retention = timedelta(days=app.config.get("IO_RETENTION_DAYS", 360))
 
-        # Walk through the UPLOAD_FOLDER recursively
-        for root, dirs, files in os.walk(upload_folder, topdown=False):
+        # Sessions with a member index are cleaned from the index
+        indexed = set()
+        for session in SessionMetadata.query.all():
+            folder = session.transaction_folder
+            if os.path.isdir(folder) and has_index(folder):
+                try:
+                    _cleanup_indexed_session(folder, now, raw_retention, io_retention)
+                except Exception as e:
+                    logger.error("Error cleaning session folder %s: %s", folder, e)
+                indexed.add(os.path.normpath(folder))
+
+        # Walk the rest of UPLOAD_FOLDER, skipping indexed sessions, then clean bottom-up
+        walked = []
+        for root, dirs, files in os.walk(upload_folder):
+            dirs[:] = [d for d in dirs if os.path.normpath(os.path.join(root, d)) not in indexed]
+            walked.append((root, list(dirs), files))
+
+        for root, dirs, files in reversed(walked):
             # Clean up files
             for file in files:
                 file_path = os.path.join(root, file)
@@ -43,6 +108,8 @@ def cleanup_files(app):
             # Clean up directories
             for d in dirs:
                 folder_path = os.path.join(root, d)
+                if not os.path.exists(folder_path):
+                    continue
                 mtime = datetime.utcfromtimestamp(os.path.getmtime(folder_path))
                 if d in ["input", "output", "log"]:
                     if now - mtime > io_retention:
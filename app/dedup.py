@@ -0,0 +1,158 @@
+# Location: /opt/my_flask_app/app/dedup.py
+"""
+Content-addressed reuse of uploaded bundles.
+
+The upload is hashed while it is written to disk and the digest is stored on
+SessionMetadata. A new session whose digest was seen before gets hardlinks to
+the earlier session's extracted tree and inputs instead of recomputing them,
+and a script run on it reuses the output of that session's last successful run
+of the script. Work on the same digest is serialised with a file lock so
+concurrent uploads (and runs) of the same bundle coalesce into one.
+"""
+import os
+import fcntl
+import shutil
+import hashlib
+import logging
+from contextlib import contextmanager
+
+from app.models import SessionMetadata, ScriptJob
+from app.extraction import PLAN_FILENAME, find_session_archive
+from app.member_index import INDEX_FILENAME
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+LOCK_DIRNAME = '.locks'
+# Per-session files that must not be shared between sessions; outputs are linked per run (link_existing_output)
+UNSHARED_DIRS = ('log', 'output')
+UNSHARED_FILES = ('upload.json', '.upload.lock')
+
+
+def save_and_hash(file_storage, dest_path, chunk_size=HASH_CHUNK_SIZE):
+    """Write an uploaded FileStorage to dest_path, hashing it on the way. Returns (sha256 hex, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, 'wb') as out:
+        while True:
+            chunk = file_storage.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def lock_dir(upload_folder):
+    return os.path.join(upload_folder, LOCK_DIRNAME)
+
+
+@contextmanager
+def digest_lock(locks_folder, key):
+    """Hold an exclusive lock for key across threads and processes sharing the upload folder."""
+    os.makedirs(locks_folder, exist_ok=True)
+    path = os.path.join(locks_folder, f"{key}.lock")
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def duplicate_sessions(digest, exclude_session_id):
+    """Earlier sessions with the same upload digest whose transaction folders are still there, newest first."""
+    if not digest:
+        return []
+    sessions = SessionMetadata.query.filter(
+        SessionMetadata.content_digest == digest,
+        SessionMetadata.session_id != exclude_session_id
+    ).order_by(SessionMetadata.upload_timestamp.desc()).all()
+    return [s for s in sessions if os.path.isdir(s.transaction_folder)]
+
+
+def duplicate_folders(digest, exclude_session_id):
+    """Transaction folders of earlier sessions with the same upload digest, newest first."""
+    return [s.transaction_folder for s in duplicate_sessions(digest, exclude_session_id)]
+
+
+def _link_file(src_path, dst_path):
+    if os.path.lexists(dst_path):
+        return False
+    if os.path.islink(src_path):
+        os.symlink(os.readlink(src_path), dst_path)
+        return True
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copy2(src_path, dst_path)
+    return True
+
+
+def link_session(src_folder, dst_folder, tar_path):
+    """
+    Populate dst_folder with hardlinks to everything src_folder has produced.
+
+    Files that already exist in dst_folder are left alone, and the freshly saved
+    upload at tar_path is replaced by a link to the identical source archive so
+    the bundle is only stored once. Returns the number of files linked.
+    """
+    src_archive = find_session_archive(src_folder)
+    if src_archive and os.path.basename(src_archive) == os.path.basename(tar_path):
+        temp_path = tar_path + '.link'
+        try:
+            os.link(src_archive, temp_path)
+            os.replace(temp_path, tar_path)
+        except OSError as e:
+            logger.debug(f"Keeping separate copy of {tar_path}: {str(e)}")
+
+    linked = 0
+    for root, dirs, files in os.walk(src_folder):
+        rel_root = os.path.relpath(root, src_folder)
+        if rel_root == '.':
+            dirs[:] = [d for d in dirs if d not in UNSHARED_DIRS]
+        dst_root = os.path.normpath(os.path.join(dst_folder, rel_root))
+        os.makedirs(dst_root, exist_ok=True)
+        for file in files:
+            if rel_root == '.' and (file.startswith('logs.tar') or file.startswith('output_') or file in UNSHARED_FILES):
+                continue
+            if file.endswith('.tmp') or file.endswith('-journal'):
+                continue
+            if rel_root == '.' and file == INDEX_FILENAME:
+                # SQLite rewrites the index in place, so each session needs its own copy
+                shutil.copy2(os.path.join(root, file), os.path.join(dst_root, file))
+                linked += 1
+                continue
+            if _link_file(os.path.join(root, file), os.path.join(dst_root, file)):
+                linked += 1
+    logger.info(f"Linked {linked} files from {src_folder} into {dst_folder}")
+    return linked
+
+
+def reuse_duplicate(digest, session_id, transaction_folder, tar_path):
+    """Link the extraction, inputs and outputs of an earlier identical upload. Returns the source folder or None."""
+    for folder in duplicate_folders(digest, session_id):
+        if os.path.exists(os.path.join(folder, PLAN_FILENAME)):
+            link_session(folder, transaction_folder, tar_path)
+            return folder
+    return None
+
+
+def link_existing_output(session_ids, script, output_path):
+    """
+    Link output_path to the output of script in an identical session, if that session's
+    latest run of it finished successfully. Returns True if an output was linked.
+    """
+    for session_id in session_ids:
+        latest = ScriptJob.query.filter_by(session_id=session_id, script=script).order_by(ScriptJob.id.desc()).first()
+        if latest is None or latest.status != 'done':
+            continue
+        candidate = latest.output_path
+        if os.path.basename(candidate) != os.path.basename(output_path) or not os.path.isfile(candidate):
+            continue
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if _link_file(candidate, output_path):
+            logger.info(f"Reused {candidate} for {output_path}")
+            return True
+    return False
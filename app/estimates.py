@@ -0,0 +1,177 @@
+# Location: /opt/my_flask_app/app/estimates.py
+"""
+Runtime model of the scripts and pipeline stages, for scheduling and ETAs.
+
+Every job records the size of its input and how long it ran. A script's model
+is a least-squares line elapsed = intercept + slope * input bytes over its
+recent successful runs; with no input size (pipeline stages, or a run whose
+input is not built yet) it predicts the script's mean runtime. app.jobs claims
+the queued job with the lowest predicted runtime, less JOB_AGING_RATE seconds
+for every second it has waited, so short reports overtake a large BUCKET run
+without starving it. estimate_finish replays that order on the workers to give
+the dashboard a completion time per job.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import db
+from app.models import ScriptJob, JobDependency
+
+logger = logging.getLogger(__name__)
+
+HISTORY_RUNS = 50  # most recent successful runs each model is fitted on
+COUNT_BUFSIZE = 1024 * 1024
+USAGE_WINDOW = timedelta(days=7)  # runs usage_stats is taken over
+
+
+class RuntimeModel:
+    def __init__(self, intercept, slope, mean_elapsed):
+        self.intercept = intercept
+        self.slope = slope
+        self.mean_elapsed = mean_elapsed
+
+    def predict(self, input_bytes=None):
+        if input_bytes is None:
+            return self.mean_elapsed
+        return max(0.0, self.intercept + self.slope * input_bytes)
+
+    def __repr__(self):
+        return f"<RuntimeModel {self.intercept:.2f}s + {self.slope * 1024 * 1024:.4f}s/MB>"
+
+
+def fit(script):
+    """Fit the runtime model of a script (or stage) from its recent runs. Returns None without history."""
+    rows = db.session.query(ScriptJob.input_bytes, ScriptJob.elapsed).filter(
+        ScriptJob.script == script,
+        ScriptJob.status == 'done',
+        ScriptJob.elapsed.isnot(None)
+    ).order_by(ScriptJob.id.desc()).limit(HISTORY_RUNS).all()
+    if not rows:
+        return None
+    ys = [elapsed for _, elapsed in rows]
+    mean_y = sum(ys) / len(ys)
+    sized = [(input_bytes, elapsed) for input_bytes, elapsed in rows if input_bytes is not None]
+    if not sized:
+        return RuntimeModel(mean_y, 0.0, mean_y)
+    mean_x = sum(x for x, _ in sized) / len(sized)
+    mean_sy = sum(y for _, y in sized) / len(sized)
+    variance = sum((x - mean_x) ** 2 for x, _ in sized)
+    if variance:
+        slope = sum((x - mean_x) * (y - mean_sy) for x, y in sized) / variance
+    else:
+        # All runs on inputs of one size: assume runtime grows in proportion to it
+        slope = mean_sy / mean_x if mean_x else 0.0
+    if slope < 0:
+        # Noise swamped the size effect; the mean is the better guess
+        return RuntimeModel(mean_sy, 0.0, mean_y)
+    return RuntimeModel(mean_sy - slope * mean_x, slope, mean_y)
+
+
+def fit_models(scripts):
+    return {script: fit(script) for script in set(scripts)}
+
+
+def input_size(path):
+    """Size in bytes of a job's input, or None if it does not exist (yet)."""
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+def count_lines(path):
+    """Number of lines in a file, or None if it cannot be read."""
+    lines = 0
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(COUNT_BUFSIZE), b''):
+                lines += chunk.count(b'\n')
+    except (OSError, TypeError):
+        return None
+    return lines
+
+
+def predict(job, models, input_bytes=None):
+    """Predicted runtime of a job in seconds, or None without history for its script."""
+    model = models.get(job.script)
+    if model is None:
+        return None
+    return model.predict(job.input_bytes if job.input_bytes is not None else input_bytes)
+
+
+def priority(job, now, aging_rate, stages=()):
+    """
+    Scheduling key: lower runs first. Pipeline stages come first, since they unblock the
+    runs; a script with no history yet counts as instant, so it gets some soon.
+    """
+    if job.script in stages:
+        predicted = 0.0
+    else:
+        predicted = job.predicted or 0.0
+    since = job.ready_at or job.created_at
+    waited = (now - since).total_seconds() if since else 0.0
+    return (predicted - aging_rate * waited, job.id)
+
+
+def estimate_finish(workers, aging_rate, stages=()):
+    """
+    Estimated finish time (naive UTC datetime) of every queued or running job, keyed by job id.
+
+    The queue is replayed on the workers in scheduling order, each job starting when a worker
+    and its dependencies are free. A job whose duration is unknown counts as instant.
+    """
+    now = datetime.utcnow()
+    running = ScriptJob.query.filter_by(status='running').all()
+    queued = ScriptJob.query.filter_by(status='queued').all()
+    models = fit_models(job.script for job in running + queued)
+
+    def duration(job):
+        if job.predicted is not None:
+            return job.predicted
+        # Not ready yet: size its input if it is already built
+        return predict(job, models, input_size(job.input_path) if job.input_path else None)
+
+    finish = {}
+    free = []
+    for job in running:
+        started = job.started_at or now
+        finish[job.id] = max(now, started + timedelta(seconds=duration(job) or 0))
+        free.append(finish[job.id])
+    free = sorted(free)[:workers]
+    free += [now] * (workers - len(free))
+
+    dependencies = {}
+    if queued:
+        for edge in JobDependency.query.filter(JobDependency.job_id.in_([job.id for job in queued])).all():
+            dependencies.setdefault(edge.job_id, []).append(edge.depends_on_id)
+    waiting = sorted(queued, key=lambda j: priority(j, now, aging_rate, stages))
+    queued_ids = {job.id for job in queued}
+    while waiting:
+        # The first job in scheduling order whose queued dependencies have been placed
+        job = next((j for j in waiting if all(d in finish or d not in queued_ids for d in dependencies.get(j.id, ()))),
+                   waiting[0])
+        waiting.remove(job)
+        free.sort()
+        ready = max([finish[d] for d in dependencies.get(job.id, ()) if d in finish], default=now)
+        start = max(free[0], ready)
+        finish[job.id] = start + timedelta(seconds=duration(job) or 0)
+        free[0] = finish[job.id]
+    return finish
+
+
+def usage_stats():
+    """Runs, mean and largest CPU seconds and peak RSS (bytes) per script over the last USAGE_WINDOW, for sizing the hosts."""
+    rows = db.session.query(
+        ScriptJob.script, func.count(ScriptJob.id),
+        func.avg(ScriptJob.cpu_time), func.max(ScriptJob.cpu_time),
+        func.avg(ScriptJob.peak_rss), func.max(ScriptJob.peak_rss)
+    ).filter(
+        ScriptJob.peak_rss.isnot(None),
+        ScriptJob.finished_at >= datetime.utcnow() - USAGE_WINDOW
+    ).group_by(ScriptJob.script).order_by(ScriptJob.script).all()
+    return [{'script': script, 'runs': runs, 'mean_cpu': mean_cpu, 'max_cpu': max_cpu,
+             'mean_rss': float(mean_rss), 'max_rss': max_rss}
+            for script, runs, mean_cpu, max_cpu, mean_rss, max_rss in rows]
@@ -0,0 +1,538 @@
+# Location: /opt/my_flask_app/app/extraction.py
+"""
+In-process streaming extraction of uploaded tech-support bundles.
+
+Replaces the per-archive `7z x` / `chown -R` shell-outs: every archive is read
+sequentially with tarfile (gzip handled transparently), members are written and
+chowned as they stream past, and nested archives are discovered from the members
+just written instead of re-walking the extraction tree.
+"""
+import os
+import pwd
+import json
+import time
+import shutil
+import tarfile
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from app.member_index import MemberIndex, record_extraction, member_kind
+from app.archive_reader import ensure_archive_indexed
+
+logger = logging.getLogger(__name__)
+
+NESTED_ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz')
+COPY_BUFSIZE = 1024 * 1024
+PLAN_FILENAME = 'extraction.json'
+
+# Which part of the bundle each script reads. CCR, CHR and BUCKET only need
+# tech-support.log; KEYWORD scans the flash/mswitch/var/config trees.
+SCRIPT_MEMBER_GROUPS = {
+    'ccr': 'tech_support',
+    'chr': 'tech_support',
+    'bucket': 'tech_support',
+    'keyword': 'tree',
+}
+TREE_PREFIXES = ('flash/', 'mswitch/', 'var/', 'config/')
+# Groups that can be read straight from the uploaded archive (see app.archive_reader)
+IN_PLACE_GROUPS = frozenset({'tech_support'})
+
+
+class ExtractionPlan:
+    """The set of member groups the selected scripts will read; None means extract everything."""
+
+    def __init__(self, groups=None):
+        self.groups = None if groups is None else frozenset(groups)
+
+    @classmethod
+    def for_scripts(cls, script_options):
+        return cls(SCRIPT_MEMBER_GROUPS[s] for s in script_options if s in SCRIPT_MEMBER_GROUPS)
+
+    def wants_member(self, rel_name, depth):
+        """Return True if the member at transaction-relative rel_name should be written."""
+        if self.groups is None:
+            return True
+        if 'tech_support' in self.groups and os.path.basename(rel_name) == 'tech-support.log':
+            return True
+        if 'tree' in self.groups:
+            # Everything inside a nested archive we chose to enter is part of the tree
+            if depth > 0 or rel_name.startswith(TREE_PREFIXES) or os.path.basename(rel_name).startswith('configs.tar'):
+                return True
+        return False
+
+    def wants_nested(self):
+        return self.groups is None or 'tree' in self.groups
+
+    def __repr__(self):
+        return f"<ExtractionPlan {'full' if self.groups is None else sorted(self.groups)}>"
+
+
+def should_extract(tar_path, session_id):
+    """Return True for archives we recurse into: root logs.tar*, configs.tar* and memlogs."""
+    # Always extract the root logs.tar or logs.tar.gz
+    if os.path.basename(tar_path).startswith('logs.tar'):
+        return True
+    # Extract configs.tar.gz and its nested archives
+    if tar_path.endswith('configs.tar.gz') or 'configs.tar' in tar_path:
+        return True
+    # Extract files under var/log/oslog/memlogs
+    if f"{session_id}/var/log/oslog/memlogs" in tar_path:
+        return True
+    return False
+
+
+def resolve_owner(owner):
+    """Map a user name to (uid, gid); None when unknown or when we cannot chown anyway."""
+    if not owner:
+        return None
+    try:
+        entry = pwd.getpwnam(owner)
+    except KeyError:
+        logger.warning(f"Extraction owner {owner} does not exist, leaving ownership unchanged")
+        return None
+    if os.geteuid() != 0 and os.geteuid() != entry.pw_uid:
+        logger.debug(f"Not running as root, cannot chown extracted files to {owner}")
+        return None
+    return entry.pw_uid, entry.pw_gid
+
+
+def _new_stats():
+    return {'archives': 0, 'members': 0, 'bytes': 0, 'skipped': 0, 'filtered': 0, 'stages': defaultdict(float),
+            'entries': [], 'moves': []}
+
+
+def _chown(path, owner_ids, stats):
+    if owner_ids is None:
+        return
+    start = time.perf_counter()
+    try:
+        os.chown(path, owner_ids[0], owner_ids[1], follow_symlinks=False)
+    except OSError as e:
+        logger.error(f"Failed to set ownership for {path}: {str(e)}")
+    stats['stages']['chown'] += time.perf_counter() - start
+
+
+def _makedirs(path, owner_ids, stats):
+    """Create path and any missing parents, chowning each directory we create."""
+    if os.path.isdir(path):
+        return
+    parent = os.path.dirname(path)
+    if parent and parent != path:
+        _makedirs(parent, owner_ids, stats)
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        return
+    _chown(path, owner_ids, stats)
+
+
+def _safe_target(root, name):
+    """Resolve a member name under root, or None if it would escape the extraction folder."""
+    target = os.path.realpath(os.path.join(root, name))
+    if target != root and not target.startswith(root + os.sep):
+        return None
+    return target
+
+
+def _write_member(tar, member, target, root, final_target, transaction_root, owner_ids, stats):
+    """Write a single tar member to target. Returns True if something was written."""
+    if member.isdir():
+        _makedirs(target, owner_ids, stats)
+        return True
+
+    _makedirs(os.path.dirname(target), owner_ids, stats)
+    if os.path.islink(target) or (os.path.exists(target) and not os.path.isdir(target)):
+        os.unlink(target)
+
+    if member.isfile():
+        source = tar.extractfile(member)
+        with open(target, 'wb') as out:
+            shutil.copyfileobj(source, out, COPY_BUFSIZE)
+        os.chmod(target, (member.mode & 0o777) | 0o600)
+        os.utime(target, (member.mtime, member.mtime))
+        stats['bytes'] += member.size
+    elif member.issym():
+        # Judge relative links from where the member ends up, not from a staging folder
+        link_target = os.path.join(os.path.dirname(final_target), member.linkname)
+        if _safe_target(transaction_root, link_target) is None:
+            logger.warning(f"Skipping symlink {member.name} -> {member.linkname} (points outside extraction folder)")
+            return False
+        os.symlink(member.linkname, target)
+    elif member.islnk():
+        source = _safe_target(root, member.linkname)
+        if source is None or not os.path.isfile(source):
+            logger.warning(f"Skipping hardlink {member.name} -> {member.linkname} (target not extracted)")
+            return False
+        shutil.copyfile(source, target)
+    else:
+        logger.debug(f"Skipping special member {member.name}")
+        return False
+
+    _chown(target, owner_ids, stats)
+    return True
+
+
+def _extract_one(tar_path, extract_path, transaction_root, depth, plan, owner_ids, stats, staging_path=None,
+                 fileobj=None, on_header=None):
+    """
+    Stream one archive into extract_path. Returns nested archives written, in archive order.
+
+    With staging_path, members are written there instead and merged into extract_path
+    later by the caller; the returned nested paths are their final locations.
+    With fileobj, the archive is read from it instead of from tar_path. on_header, if
+    given, is called with every member's TarInfo before it is filtered or written.
+    """
+    final_root = os.path.realpath(extract_path)
+    root = os.path.realpath(staging_path) if staging_path else final_root
+    origin = os.path.relpath(os.path.realpath(tar_path), transaction_root)
+    nested = []
+    start = time.perf_counter()
+    with tarfile.open(tar_path, mode='r|*', fileobj=fileobj) as tar:
+        for member in tar:
+            if on_header is not None:
+                on_header(member)
+            target = _safe_target(root, member.name)
+            if target is None:
+                logger.warning(f"Skipping unsafe member {member.name} in {tar_path}")
+                stats['skipped'] += 1
+                continue
+            final_target = os.path.join(final_root, os.path.relpath(target, root)) if staging_path else target
+            rel_name = os.path.relpath(final_target, transaction_root).replace(os.sep, '/')
+            if member.isdir():
+                rel_name += '/'
+            if not plan.wants_member(rel_name, depth):
+                stats['filtered'] += 1
+                continue
+            if not _write_member(tar, member, target, root, final_target, transaction_root, owner_ids, stats):
+                stats['skipped'] += 1
+                continue
+            stats['members'] += 1
+            # Hardlinks are written as copies
+            kind = 'file' if member.islnk() else member_kind(member)
+            stats['entries'].append((rel_name.rstrip('/'), member.size, int(member.mtime), kind, origin))
+            if member.isfile() and member.name.endswith(NESTED_ARCHIVE_SUFFIXES) and plan.wants_nested():
+                nested.append(os.path.normpath(final_target))
+    stats['archives'] += 1
+    stats['stages']['extract'] += time.perf_counter() - start
+    return nested
+
+
+def _is_configs_archive(tar_path):
+    return tar_path.endswith('configs.tar.gz') or 'configs.tar' in tar_path
+
+
+def _move_flash_to_config(tar_path, extract_path, session_id, stats):
+    """After a configs.tar* is extracted, move its flash/ contents to <transaction>/config."""
+    start = time.perf_counter()
+    # Find the root transaction folder
+    root_transaction_folder = extract_path
+    while os.path.basename(root_transaction_folder) != session_id:
+        parent = os.path.dirname(root_transaction_folder)
+        if parent == root_transaction_folder:
+            logger.error(f"Could not locate transaction folder for {extract_path}")
+            return
+        root_transaction_folder = parent
+    config_path = os.path.join(root_transaction_folder, 'config')
+
+    flash_path = os.path.join(extract_path, 'flash')
+    if os.path.exists(flash_path):
+        os.makedirs(config_path, exist_ok=True)
+        flash_contents = os.listdir(flash_path)
+        logger.debug(f"Contents of flash folder {flash_path}: {flash_contents}")
+        for item in flash_contents:
+            src_path = os.path.join(flash_path, item)
+            dst_path = os.path.join(config_path, item)
+            try:
+                shutil.move(src_path, dst_path)
+                logger.debug(f"Moved {src_path} to {dst_path}")
+                stats['moves'].append((os.path.relpath(src_path, root_transaction_folder),
+                                       os.path.relpath(dst_path, root_transaction_folder)))
+            except Exception as e:
+                logger.error(f"Failed to move {src_path} to {dst_path}: {str(e)}")
+        try:
+            os.rmdir(flash_path)
+            logger.debug(f"Removed empty flash folder: {flash_path}")
+            stats['moves'].append((os.path.relpath(flash_path, root_transaction_folder), None))
+        except Exception as e:
+            logger.warning(f"Failed to remove flash folder {flash_path}: {str(e)}")
+    else:
+        logger.warning(f"Flash folder not found after extracting {tar_path}")
+    stats['stages']['flash_move'] += time.perf_counter() - start
+
+
+def _should_process(tar_path, depth, max_depth, processed_files, session_id):
+    if depth > max_depth:
+        logger.warning(f"Max extraction depth reached at {tar_path}")
+        return False
+    if tar_path in processed_files:
+        logger.debug(f"Skipping already processed archive: {tar_path}")
+        return False
+    if not os.path.exists(tar_path):
+        logger.debug(f"Skipping non-existent archive: {tar_path}")
+        return False
+    if not should_extract(tar_path, session_id):
+        logger.debug(f"Skipping recursive extraction for {tar_path} (not in configs.tar.gz or memlogs)")
+        return False
+    return True
+
+
+def _extract_recursive(tar_path, extract_path, transaction_root, depth, max_depth, processed_files, session_id,
+                       plan, owner_ids, stats, fileobj=None, on_header=None):
+    if not _should_process(tar_path, depth, max_depth, processed_files, session_id):
+        return
+
+    processed_files.add(tar_path)
+    logger.debug(f"Extracting archive: {tar_path} at depth {depth}")
+    try:
+        nested = _extract_one(tar_path, extract_path, transaction_root, depth, plan, owner_ids, stats,
+                              fileobj=fileobj, on_header=on_header)
+    except (tarfile.TarError, OSError, EOFError) as e:
+        logger.error(f"Failed to extract {tar_path}: {str(e)}")
+        if fileobj is not None:
+            raise
+        return
+
+    for nested_tar_path in nested:
+        logger.debug(f"Processing nested archive: {nested_tar_path} (depth {depth + 1})")
+        _extract_recursive(nested_tar_path, os.path.dirname(nested_tar_path), transaction_root, depth + 1,
+                           max_depth, processed_files, session_id, plan, owner_ids, stats)
+
+    if _is_configs_archive(tar_path):
+        _move_flash_to_config(tar_path, extract_path, session_id, stats)
+
+
+def _extract_staged(tar_path, transaction_root, depth, plan, owner_ids):
+    """Process-pool task: extract one nested archive into a private staging folder next to it."""
+    extract_path = os.path.dirname(tar_path)
+    staging_path = os.path.join(extract_path, f".{os.path.basename(tar_path)}.staging")
+    shutil.rmtree(staging_path, ignore_errors=True)
+    stats = _new_stats()
+    try:
+        nested = _extract_one(tar_path, extract_path, transaction_root, depth, plan, owner_ids, stats,
+                              staging_path=staging_path)
+    except (tarfile.TarError, OSError, EOFError) as e:
+        logger.error(f"Failed to extract {tar_path}: {str(e)}")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        staging_path, nested = None, []
+    stats['stages'] = dict(stats['stages'])
+    return staging_path, nested, stats
+
+
+def _merge_stats(stats, other):
+    for key in ('archives', 'members', 'bytes', 'skipped', 'filtered', 'entries', 'moves'):
+        stats[key] += other[key]
+    for name, secs in other['stages'].items():
+        stats['stages'][name] += secs
+
+
+def _merge_staging(staging_path, extract_path, owner_ids, stats):
+    """Move a staged archive's files into extract_path (later merges win, as in sequential extraction)."""
+    start = time.perf_counter()
+    for root, dirs, files in os.walk(staging_path):
+        dst_root = os.path.join(extract_path, os.path.relpath(root, staging_path))
+        _makedirs(os.path.normpath(dst_root), owner_ids, stats)
+        for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            dst_path = os.path.join(dst_root, name)
+            if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                logger.warning(f"Not replacing directory {dst_path} with a file from {staging_path}")
+                continue
+            os.replace(os.path.join(root, name), dst_path)
+    shutil.rmtree(staging_path, ignore_errors=True)
+    stats['stages']['merge'] += time.perf_counter() - start
+
+
+def _extract_parallel(tar_path, extract_path, transaction_root, max_depth, processed_files, session_id,
+                      plan, owner_ids, stats, workers, fileobj=None, on_header=None):
+    """
+    Breadth-first extraction: sibling nested archives of one level are extracted
+    concurrently in a process pool. Staged results are merged in discovery order
+    and flash -> config moves run deepest first, so the final layout does not
+    depend on which worker finishes first.
+    """
+    if not _should_process(tar_path, 0, max_depth, processed_files, session_id):
+        return
+    processed_files.add(tar_path)
+    logger.debug(f"Extracting archive: {tar_path} at depth 0")
+    try:
+        nested = _extract_one(tar_path, extract_path, transaction_root, 0, plan, owner_ids, stats,
+                              fileobj=fileobj, on_header=on_header)
+    except (tarfile.TarError, OSError, EOFError) as e:
+        logger.error(f"Failed to extract {tar_path}: {str(e)}")
+        if fileobj is not None:
+            raise
+        return
+
+    configs_archives = [(0, tar_path, extract_path)] if _is_configs_archive(tar_path) else []
+    frontier = [(path, 1) for path in nested]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while frontier:
+            batch = []
+            for path, depth in frontier:
+                if _should_process(path, depth, max_depth, processed_files, session_id):
+                    processed_files.add(path)
+                    batch.append((path, depth))
+            logger.debug(f"Extracting {len(batch)} nested archives with {workers} workers")
+            futures = [pool.submit(_extract_staged, path, transaction_root, depth, plan, owner_ids)
+                       for path, depth in batch]
+            frontier = []
+            for (path, depth), future in zip(batch, futures):
+                staging_path, nested, worker_stats = future.result()
+                _merge_stats(stats, worker_stats)
+                if staging_path is None:
+                    continue
+                _merge_staging(staging_path, os.path.dirname(path), owner_ids, stats)
+                frontier.extend((nested_path, depth + 1) for nested_path in nested)
+                if _is_configs_archive(path):
+                    configs_archives.append((depth, path, os.path.dirname(path)))
+
+    # Sequential extraction moves flash/ after a configs archive's own nested archives, i.e. deepest first
+    for depth, path, configs_extract_path in sorted(configs_archives, key=lambda entry: -entry[0]):
+        _move_flash_to_config(path, configs_extract_path, session_id, stats)
+
+
+def extract_archive(tar_path, extract_path, session_id, max_depth=10, owner=None, processed_files=None, plan=None,
+                    workers=1, fileobj=None, on_header=None):
+    """
+    Recursively extract tar_path into extract_path, following nested archives up to max_depth.
+
+    Only members wanted by plan (an ExtractionPlan; default: everything) are written.
+    With workers > 1, sibling nested archives are extracted in a process pool.
+    With fileobj, the root archive is streamed from it (e.g. while it is still being
+    uploaded to tar_path) and read errors are raised instead of logged; on_header
+    sees the root archive's member headers (see _extract_one).
+    Every member written is recorded in the session's member index (app.member_index).
+    Returns a stats dict with member/byte counts and the time spent per stage
+    ('extract', 'chown', 'merge', 'flash_move', 'index', 'total').
+    """
+    if processed_files is None:
+        processed_files = set()
+    if plan is None:
+        plan = ExtractionPlan()
+    stats = _new_stats()
+    start = time.perf_counter()
+    owner_ids = resolve_owner(owner)
+    transaction_root = os.path.realpath(extract_path)
+    if workers and workers > 1 and plan.wants_nested():
+        _extract_parallel(tar_path, extract_path, transaction_root, max_depth, processed_files, session_id,
+                          plan, owner_ids, stats, workers, fileobj=fileobj, on_header=on_header)
+    else:
+        _extract_recursive(tar_path, extract_path, transaction_root, 0, max_depth, processed_files, session_id,
+                           plan, owner_ids, stats, fileobj=fileobj, on_header=on_header)
+    index_start = time.perf_counter()
+    record_extraction(extract_path, stats.pop('entries'), stats.pop('moves'))
+    stats['stages']['index'] += time.perf_counter() - index_start
+    stats['stages']['total'] = time.perf_counter() - start
+    stats['stages'] = dict(stats['stages'])
+    logger.info(
+        f"Extracted {stats['archives']} archives ({stats['members']} members, {stats['bytes']} bytes, "
+        f"{stats['skipped']} skipped, {stats['filtered']} not needed by {plan}) from {tar_path}; stage timings: "
+        + ", ".join(f"{name}={secs:.2f}s" for name, secs in stats['stages'].items())
+    )
+    return stats
+
+
+def find_session_archive(transaction_folder):
+    """Return the uploaded logs.tar / logs.tar.gz of a session, or None."""
+    for name in ('logs.tar', 'logs.tar.gz'):
+        path = os.path.join(transaction_folder, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_extraction_state(transaction_folder):
+    """Read the per-session record of which member groups have been extracted."""
+    path = os.path.join(transaction_folder, PLAN_FILENAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'groups': []}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable extraction state {path}: {str(e)}")
+        return {'groups': []}
+
+
+def _save_extraction_state(transaction_folder, state):
+    path = os.path.join(transaction_folder, PLAN_FILENAME)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def ensure_extracted(tar_path, transaction_folder, session_id, script_options, max_depth=10, owner=None, workers=1,
+                     in_place=False, fileobj=None, on_header=None):
+    """
+    Make sure every member the given scripts read has been extracted, fetching only what is missing.
+
+    The groups already extracted are recorded in extraction.json next to the session,
+    so a later run that selects more scripts only writes the additional members.
+    With in_place, groups in IN_PLACE_GROUPS are not extracted at all: the upload's
+    member headers are indexed and those members are read from the archive itself.
+    With fileobj, the root archive is streamed from it in a single pass (see
+    app.ingest); headers for in-place reads are collected during that pass, and
+    on_header (e.g. an app.preflight.Preflight) is called with each of them.
+    Otherwise on_header sees the root archive's headers from the first pass that
+    reads them, indexing or extraction, and only from that one.
+    Returns the stats of the extraction performed, or None if nothing was extracted.
+    """
+    state = load_extraction_state(transaction_folder)
+    done = set(state.get('groups', []))
+    wanted = ExtractionPlan.for_scripts(script_options).groups
+    missing = wanted - done
+    if not missing and fileobj is None:
+        logger.debug(f"Members for {sorted(wanted)} already extracted in {transaction_folder}")
+        return None
+
+    stats = None
+    served = sorted(missing & IN_PLACE_GROUPS) if in_place else []
+    if served and fileobj is None:
+        start = time.perf_counter()
+        indexed = ensure_archive_indexed(tar_path, transaction_folder, on_header)
+        if indexed:
+            on_header = None
+        _record_in_place(state, served, indexed, time.perf_counter() - start)
+        logger.info(f"Serving {served} in place from {tar_path} ({indexed} headers indexed)")
+    missing -= set(served)
+
+    headers = [] if served and fileobj is not None else None
+
+    def collect_header(member):
+        if headers is not None:
+            headers.append((member.name, member.offset_data, member.size, int(member.mtime), member_kind(member)))
+        if on_header is not None:
+            on_header(member)
+
+    if missing or fileobj is not None:
+        # A streamed upload is read once even if nothing needs writing, to index its headers
+        plan = ExtractionPlan(missing)
+        stats = extract_archive(tar_path, transaction_folder, session_id, max_depth=max_depth, owner=owner,
+                                plan=plan, workers=workers, fileobj=fileobj, on_header=collect_header)
+        state.setdefault('runs', []).append({
+            'groups': sorted(missing),
+            'members': stats['members'],
+            'bytes': stats['bytes'],
+            'seconds': round(stats['stages']['total'], 3),
+        })
+    if headers is not None:
+        start = time.perf_counter()
+        with MemberIndex(transaction_folder) as index:
+            index.add_archive_members(os.path.relpath(tar_path, transaction_folder), headers)
+        _record_in_place(state, served, len(headers), time.perf_counter() - start)
+        logger.info(f"Serving {served} in place from {tar_path} ({len(headers)} headers indexed while streaming)")
+    state['groups'] = sorted(done | missing | set(served))
+    _save_extraction_state(transaction_folder, state)
+    return stats
+
+
+def _record_in_place(state, groups, indexed, seconds):
+    state['in_place'] = sorted(set(state.get('in_place', [])) | set(groups))
+    state.setdefault('runs', []).append({
+        'groups': groups,
+        'in_place': True,
+        'members': indexed,
+        'bytes': 0,
+        'seconds': round(seconds, 3),
+    })
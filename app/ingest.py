@@ -0,0 +1,130 @@
+# Location: /opt/my_flask_app/app/ingest.py
+"""
+Extract-while-uploading ingestion of tech-support bundles.
+
+The request body is read in chunks and each chunk is written to logs.tar*,
+hashed, and handed through a bounded in-memory pipe to an extraction thread
+that parses the tar stream (gunzipping on the fly) and writes only the members
+the selected scripts need. Network transfer, decompression and disk writes
+overlap, so there is no separate extraction phase once the upload completes.
+If streaming extraction fails, the saved upload is extracted from disk instead.
+An optional app.preflight.Preflight sees every header as it streams past; when
+it rejects the bundle, reading the request body stops right there.
+"""
+import queue
+import hashlib
+import tarfile
+import logging
+import threading
+
+from app.extraction import ensure_extracted
+from app.preflight import PreflightError
+
+logger = logging.getLogger(__name__)
+
+INGEST_CHUNK_SIZE = 1024 * 1024
+PIPE_MAX_CHUNKS = 64
+
+
+class StreamPipe:
+    """Bounded pipe from the request reader to the extraction thread (file-like on the reading side)."""
+
+    def __init__(self, max_chunks=PIPE_MAX_CHUNKS):
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.reader_done = threading.Event()
+        self.buffer = b''
+        self.eof = False
+
+    def _put(self, item):
+        while not self.reader_done.is_set():
+            try:
+                self.chunks.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def write(self, chunk):
+        """Queue a chunk for the reader. Returns False once the reader has stopped."""
+        return self._put(chunk)
+
+    def finish(self):
+        self._put(None)
+
+    def close_reader(self):
+        self.reader_done.set()
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.eof = True
+            else:
+                self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def ingest_upload(stream, tar_path, transaction_folder, session_id, script_options, chunk_size=INGEST_CHUNK_SIZE,
+                  preflight=None, **extraction_options):
+    """
+    Save stream to tar_path while extracting the members script_options need.
+
+    extraction_options are passed to ensure_extracted. Returns (sha256 hex, size,
+    extraction stats); stats are None when the upload had to be extracted from
+    disk afterwards and nothing was needed. Raises PreflightError if preflight
+    rejects the bundle; the caller owns cleaning up transaction_folder.
+    """
+    pipe = StreamPipe()
+    result = {}
+
+    def consume():
+        try:
+            result['stats'] = ensure_extracted(tar_path, transaction_folder, session_id, script_options,
+                                               fileobj=pipe, on_header=preflight, **extraction_options)
+            if preflight is not None:
+                preflight.finish()
+        except (tarfile.TarError, EOFError) as e:
+            # With a preflight, an unreadable stream is a bad bundle rather than a reason to retry from disk
+            result['error'] = PreflightError('Not a readable .tar or .tar.gz archive.') if preflight else e
+        except Exception as e:
+            result['error'] = e
+        finally:
+            pipe.close_reader()
+
+    digest = hashlib.sha256()
+    size = 0
+    streaming = True
+    with open(tar_path, 'wb') as out:
+        extractor = threading.Thread(target=consume, name=f"ingest-{session_id}", daemon=True)
+        extractor.start()
+        try:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+                if streaming:
+                    streaming = pipe.write(chunk)
+                    if not streaming and isinstance(result.get('error'), PreflightError):
+                        break
+        finally:
+            pipe.finish()
+    extractor.join()
+
+    if isinstance(result.get('error'), PreflightError):
+        logger.warning(f"Rejected upload {tar_path} after {size} bytes: {str(result['error'])}")
+        raise result['error']
+    if 'error' in result:
+        logger.warning(f"Streaming extraction of {tar_path} failed ({str(result['error'])}), "
+                       f"extracting the saved upload instead")
+        result['stats'] = ensure_extracted(tar_path, transaction_folder, session_id, script_options,
+                                           **extraction_options)
+    stats = result.get('stats')
+    if stats:
+        logger.info(f"Ingested {size} bytes into {tar_path}; extracted {stats['members']} members while uploading")
+    return digest.hexdigest(), size, stats
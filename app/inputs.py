@@ -0,0 +1,258 @@
+# Location: /opt/my_flask_app/app/inputs.py
+"""
+Generation of the per-script input files (CCR, CHR, BUCKET, KEYWORD) from an
+extracted session. Used by the INDEX and per-script input stages of
+app.pipeline. tech-support.log may also be read in place from the uploaded
+archive (see app.archive_reader).
+"""
+import os
+import json
+import zlib
+import logging
+import contextlib
+
+from app.member_index import MemberIndex, has_index, ARCHIVE_SUFFIXES
+from app.archive_reader import open_session_member
+from app import log_index
+from app.log_index import iter_lines
+from app.staging import copy_range, stage_copy
+
+logger = logging.getLogger(__name__)
+
+INPUT_FILENAMES = {
+    'ccr': 'CCR_input.txt',
+    'chr': 'CHR_input.txt',
+    'bucket': 'bucket_input.txt',
+    'keyword': 'keyword_input.json',
+}
+TECH_SUPPORT_SCRIPTS = ('ccr', 'chr', 'bucket')
+KEYWORD_DIRS = ('flash', 'mswitch', 'var', 'config')
+
+
+class InputError(Exception):
+    """Raised when the inputs for the selected scripts cannot be prepared."""
+
+
+@contextlib.contextmanager
+def _building(path):
+    """
+    Yield the temporary path to write the input at path to. It takes its name once complete, so
+    a build cut off by a crash never leaves a partial input that missing_inputs takes as built.
+    """
+    temp_path = path + '.part'
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+
+
+def _write_blocks(path, source, index, slices):
+    """
+    Write slices of tech-support.log, lines joined by newlines and slices by a blank line.
+    Clean slices are copied as byte ranges; the rest are rewritten line by line.
+    """
+    copied = 0
+    with open(path, 'wb') as f:
+        for n, piece in enumerate(slices):
+            if n:
+                f.write(b"\n\n")
+            if piece.clean:
+                copy_range(source, piece.start, piece.clean_bytes(index), f)
+                copied += 1
+                continue
+            for i, line in enumerate(iter_lines(source, piece.block, piece.count)):
+                if i:
+                    f.write(b"\n")
+                f.write(line.encode('utf-8'))
+    logger.debug(f"Wrote {len(slices)} blocks to {path} ({copied} copied as byte ranges)")
+
+
+def build_ccr_input(source, index, input_folder, notices):
+    """CCR Script: Extract the running-config, vrrp stats and ap active blocks."""
+    ccr_blocks = []
+    for piece in log_index.ccr_blocks(index):
+        logger.debug(f"Found '{piece.block[5]}' at line {piece.block[0]} "
+                     f"({piece.count} lines{'' if piece.closed else ', runs to end of log'})")
+        ccr_blocks.append(piece)
+
+    ccr_input_path = os.path.join(input_folder, INPUT_FILENAMES['ccr'])
+    if ccr_blocks:
+        with _building(ccr_input_path) as temp_path:
+            _write_blocks(temp_path, source, index, ccr_blocks)
+        logger.debug(f"Generated CCR input with {len(ccr_blocks)} blocks")
+    else:
+        with _building(ccr_input_path) as temp_path, open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("No relevant blocks found for CCR.")
+        logger.warning(f"No relevant blocks found for CCR in tech-support.log")
+        notices.append(('No relevant blocks found for CCR in tech-support.log.', 'warning'))
+    logger.debug(f"Input file created for CCR: {ccr_input_path}")
+
+
+def build_chr_input(source, index, input_folder, notices):
+    """CHR Script: Extract only the first "show running-config" block."""
+    chr_block = log_index.chr_block(index)
+
+    chr_input_path = os.path.join(input_folder, INPUT_FILENAMES['chr'])
+    if chr_block:
+        logger.debug(f"Found '{chr_block.block[5]}' for CHR at line {chr_block.block[0]} ({chr_block.count} lines)")
+        with _building(chr_input_path) as temp_path:
+            _write_blocks(temp_path, source, index, [chr_block])
+        logger.debug(f"Generated CHR input with show running-config block")
+    else:
+        with _building(chr_input_path) as temp_path, open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("No show running-config block found for CHR.")
+        logger.warning(f"No show running-config block found for CHR in tech-support.log")
+        notices.append(('No show running-config block found for CHR in tech-support.log.', 'warning'))
+    logger.debug(f"Input file created for CHR: {chr_input_path}")
+
+
+def index_tech_support(transaction_folder, source):
+    """Return the block index of tech-support.log, scanning it only if there is no saved index for it."""
+    index = log_index.load_index(transaction_folder, source)
+    if index is not None:
+        logger.debug(f"Using saved tech-support.log index ({len(index['blocks'])} blocks)")
+        return index
+    index = log_index.scan(source)
+    log_index.save_index(transaction_folder, index)
+    logger.debug(f"Indexed tech-support.log: {index['lines']} lines, {len(index['blocks'])} blocks, "
+                 f"{index['dirty_lines']} lines to rewrite")
+    return index
+
+
+@contextlib.contextmanager
+def tech_support_source(transaction_folder):
+    """Open a session's tech-support.log and its block index as (source, index). Read errors raise InputError."""
+    source = open_session_member(transaction_folder, 'tech-support.log')
+    if source is None:
+        logger.error(f"tech-support.log not found in {transaction_folder}")
+        raise InputError('tech-support.log not found.')
+    try:
+        with source:
+            yield source, index_tech_support(transaction_folder, source)
+    except (OSError, EOFError, zlib.error) as e:
+        logger.error(f"Skipping scripts due to unreadable tech-support.log: {str(e)}")
+        raise InputError('Could not read tech-support.log from the uploaded archive.')
+
+
+def index_session(transaction_folder):
+    """Index a session's tech-support.log ahead of building the CCR, CHR and BUCKET inputs. Raises InputError."""
+    with tech_support_source(transaction_folder) as (source, index):
+        log_index.log_markers(index)
+
+
+def build_bucket_input(source, index, input_folder):
+    """BUCKET Script: Use the complete tech-support.log."""
+    bucket_input_path = os.path.join(input_folder, INPUT_FILENAMES['bucket'])
+    with _building(bucket_input_path) as temp_path:
+        if index['decode_errors']:
+            # BUCKET reads its input as strict UTF-8, so undecodable bytes are replaced
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                log_index.copy_decoded(source, f)
+            method = 'decoded copy'
+        else:
+            method = stage_copy(source, temp_path)
+    logger.debug(f"Generated Bucket input length: {index['size']} bytes ({method})")
+    logger.debug(f"Input file created for BUCKET: {bucket_input_path}")
+
+
+def _keyword_files(transaction_folder):
+    """Yield the files KEYWORD scans, from the member index when the session has one."""
+    if has_index(transaction_folder):
+        with MemberIndex(transaction_folder) as index:
+            for target_dir in KEYWORD_DIRS:
+                for rel_path, _, _ in index.files(prefixes=(target_dir + '/',), exclude_suffixes=ARCHIVE_SUFFIXES):
+                    yield os.path.join(transaction_folder, rel_path)
+        return
+    for target_dir in (os.path.join(transaction_folder, d) for d in KEYWORD_DIRS):
+        if not os.path.exists(target_dir):
+            logger.debug(f"Directory {target_dir} does not exist, skipping for KEYWORD script")
+            continue
+        logger.debug(f"Scanning directory for KEYWORD: {target_dir}")
+        for root, dirs, files in os.walk(target_dir):
+            logger.debug(f"Walking directory: {root}, dirs: {dirs}, files: {files}")
+            for file in files:
+                file_path = os.path.join(root, file)
+                if os.path.isfile(file_path) and not file.endswith(ARCHIVE_SUFFIXES):
+                    yield file_path
+
+
+def build_keyword_input(transaction_folder, input_folder, notices):
+    """KEYWORD Script: Read every file under the flash, mswitch, var and config directories."""
+    keyword_input = {}
+    try:
+        for file_path in _keyword_files(transaction_folder):
+            try:
+                # Read the file content
+                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                    content = f.read().splitlines()
+                # Create lowercase version for case-insensitive search
+                content_lowercase = [line.lower() for line in content]
+                # Keyed by the path within the bundle, so a session reusing this file shows its own paths
+                keyword_input[os.path.relpath(file_path, transaction_folder)] = {
+                    "content": content,
+                    "content_lowercase": content_lowercase
+                }
+                logger.debug(f"Added file to keyword_input: {file_path}")
+            except Exception as e:
+                logger.error(f"Error reading file {file_path} for KEYWORD script: {str(e)}")
+                continue
+        # Write JSON atomically and validate
+        keyword_input_path = os.path.join(input_folder, INPUT_FILENAMES['keyword'])
+        temp_keyword_path = keyword_input_path + '.tmp'
+        with open(temp_keyword_path, 'w', encoding='utf-8') as f:
+            json.dump(keyword_input, f, indent=2)
+        os.rename(temp_keyword_path, keyword_input_path)
+        # Validate JSON
+        with open(keyword_input_path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        logger.debug(f"Generated Keyword input dataset with {len(keyword_input)} files")
+        logger.debug(f"Input file created for KEYWORD: {keyword_input_path}")
+    except json.JSONDecodeError as e:
+        logger.error(f"Generated keyword_input.json is invalid: {str(e)}")
+        notices.append((f"KEYWORD input file is invalid JSON: {str(e)}", 'error'))
+    except Exception as e:
+        logger.error(f"Failed to generate keyword_input.json: {str(e)}")
+        notices.append((f"Failed to generate KEYWORD input file: {str(e)}", 'error'))
+
+
+def prepare_inputs(transaction_folder, script_options, progress=None):
+    """
+    Build the input files for the selected scripts under <transaction_folder>/input.
+
+    Returns a list of (message, category) notices for the user. Raises InputError
+    if tech-support.log is required but missing or unreadable. progress, if given,
+    is called with a short description of each step.
+    """
+    input_folder = os.path.join(transaction_folder, 'input')
+    os.makedirs(input_folder, exist_ok=True)
+    notices = []
+    report = progress or (lambda message: None)
+
+    if any(script in script_options for script in TECH_SUPPORT_SCRIPTS):
+        # Find tech-support.log for CCR, CHR, and BUCKET scripts
+        report('Indexing tech-support.log')
+        with tech_support_source(transaction_folder) as (source, index):
+            if 'bucket' in script_options:
+                report('Building BUCKET input')
+                build_bucket_input(source, index, input_folder)
+            if 'ccr' in script_options:
+                report('Building CCR input')
+                build_ccr_input(source, index, input_folder, notices)
+            if 'chr' in script_options:
+                report('Building CHR input')
+                build_chr_input(source, index, input_folder, notices)
+
+    if 'keyword' in script_options:
+        report('Building KEYWORD input')
+        build_keyword_input(transaction_folder, input_folder, notices)
+
+    return notices
+
+
+def missing_inputs(transaction_folder, script_options):
+    """Return the selected scripts whose input file does not exist yet."""
+    input_folder = os.path.join(transaction_folder, 'input')
+    return [script for script in script_options
+            if script in INPUT_FILENAMES and not os.path.exists(os.path.join(input_folder, INPUT_FILENAMES[script]))]
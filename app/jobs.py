@@ -0,0 +1,675 @@
+# Location: /opt/my_flask_app/app/jobs.py
+"""
+Database-backed queue of script runs.
+
+process_scripts only inserts ScriptJob rows; a fixed pool of JOB_WORKERS
+threads per worker process claims queued rows (an UPDATE ... WHERE
+status='queued', so each row runs once) and runs the script. A request never
+waits for a script, and no matter how many sessions are submitted at once at
+most JOB_WORKERS scripts run at a time in each worker process.
+
+The rows are the job journal, and outlive the process. Rows still queued when
+the app restarts are picked up by the next pool, and the ones that were
+running are reconciled with their run records (app.journal) as it starts: a
+script that outlived the process is left to finish, one that finished is
+recorded done or failed without running again, and one that was cut off is
+queued again, or marked interrupted after JOB_MAX_ATTEMPTS tries. Pipeline
+stages are queued again too; they skip the work whose output already exists.
+
+Pipeline stages (see app.pipeline) are jobs too: their handlers are registered
+in stage_handlers under the job's script name and run in the worker instead of
+a shell command.
+
+A job can be queued after other jobs (JobDependency rows). It is only claimed
+once they have all finished, and when one it needs fails it is failed too
+instead of run, so a session's jobs form a small DAG that the workers walk in
+whatever order its nodes become ready. Which ready job goes next is up to the
+scheduling policy: escalated sessions first, then fair shares between users,
+then the shortest predicted runtime (see app.scheduling and app.estimates).
+
+A script run whose output is in the result cache (app.result_cache) is not
+run: its output is linked in place, by the worker or, when the job is ready as
+it is queued, straight away by enqueue_job.
+
+Scripts run under the SCRIPT_*_LIMIT resource limits (app.limits), a script
+started as a subprocess in a process group of its own, so a timeout or cancel
+kills whatever it started too. cancel_job fails a queued job at once and
+flags a running one; the worker running it, in whichever process, polls the
+flag and stops the script. Each run's CPU time and peak RSS are recorded.
+
+The queue is shared by every process that runs jobs: the web process and any
+worker.py daemons on other hosts (see app.workers). A claim locks the row it
+takes with SELECT ... FOR UPDATE SKIP LOCKED, so workers claiming at the same
+time take different jobs without waiting on each other (JOB_CLAIM_LOCK
+"file" serialises claims with a lock file on the shared upload folder
+instead, for databases without SKIP LOCKED). A claimed job holds its worker's
+lease; the jobs of a worker whose heartbeat stops are queued again, and
+outputs and progress go to the session's folder on shared storage wherever
+the job ran. Across processes the per-user caps can be overshot by one job
+per worker claiming at the same moment.
+"""
+import os
+import time
+import signal
+import logging
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from contextlib import nullcontext
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import ScriptJob, JobDependency, SessionMetadata
+from app.dedup import digest_lock, lock_dir, duplicate_sessions, link_existing_output
+from app.analyzers import analyzer_pool, AnalyzerTimeout, AnalyzerCancelled
+from app.limits import ResourceLimits, cpu_time, exit_code
+from app.estimates import fit_models, predict, input_size, count_lines, estimate_finish
+from app.scheduling import SchedulerPolicy, pick_job
+from app.result_cache import result_cache
+from app.progress import channel_path, publish
+from app.workers import worker_name, register, heartbeat, deregister, live_workers, gone, capacity, remove_dead
+from app.journal import RunRecord
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_TIMEOUT = 1800  # 30 minutes
+POLL_INTERVAL = 5  # seconds an idle worker sleeps between looks at the table
+ERROR_MAX_CHARS = 4000
+ACTIVE_STATUSES = ('queued', 'running')
+FAILED_STATUSES = ('failed', 'interrupted')  # interrupted: its worker died on it JOB_MAX_ATTEMPTS times
+PROCESS_POLL = 0.2  # seconds between checks on a running script subprocess
+CANCEL_POLL = 1  # seconds between looks at a running job's cancel flag
+CLAIM_LOCK_KEY = 'job-claim'  # lock file claims are serialised on with JOB_CLAIM_LOCK = "file"
+
+# Pipeline stage name -> handler(job); a handler raises to fail the job
+stage_handlers = {}
+
+
+class ScriptCancelled(Exception):
+    """Raised when a script subprocess is stopped because its job was cancelled."""
+
+
+class ScriptRun:
+    """
+    How one script run is watched: the progress channel it reports to (see app.progress), the
+    limits it runs under, a cancelled() callback polled while it runs and the run record it
+    keeps (see app.journal). Its CPU seconds and peak RSS in bytes are filled in once it has
+    finished.
+    """
+
+    def __init__(self, progress_path=None, limits=None, cancelled=None, record=None):
+        self.progress_path = progress_path
+        self.limits = limits or ResourceLimits()
+        self.cancelled = cancelled or (lambda: False)
+        self.record = record
+        self.cpu_time = None
+        self.peak_rss = None
+
+
+def run_script(command, script_name, output_path, coalesce=None, run=None):
+    """
+    Run one script. Returns (return code, error message or None, seconds it ran or None if reused).
+
+    Any earlier output at output_path is removed first, so a failed run never leaves one
+    behind that looks finished. coalesce is an optional (lock folder, upload digest,
+    identical session ids) tuple. Runs of the same script on the same digest are
+    serialised, and an output that an identical upload's last run produced successfully
+    is linked instead of recomputed. run is the ScriptRun that watches it.
+    """
+    run = run or ScriptRun()
+    if coalesce:
+        locks_folder, digest, session_ids = coalesce
+        with digest_lock(locks_folder, f"{digest}.{script_name}"):
+            _remove_output(output_path)
+            if link_existing_output(session_ids, script_name, output_path):
+                logger.debug(f"{script_name} output reused for identical upload: {output_path}")
+                return 0, None, None
+            return _timed_run(command, script_name, run)
+    _remove_output(output_path)
+    return _timed_run(command, script_name, run)
+
+
+def _remove_output(output_path):
+    try:
+        os.remove(output_path)
+    except FileNotFoundError:
+        pass
+
+
+def _timed_run(command, script_name, run):
+    start_time = time.time()
+    return_code, error = _run_script(command, script_name, run)
+    return return_code, error, time.time() - start_time
+
+
+def _run_process(command, run):
+    """
+    Run a shell command in a new process group under run.limits, killing the whole group on
+    timeout or cancel and once the shell has exited. Returns (return code, stdout, stderr) and
+    records the group's CPU time and peak RSS on run.
+    """
+    lock_file = run.record.hold() if run.record else None
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        # Output goes to files, so a chatty script can't fill a pipe while we poll it. The script's
+        # processes inherit the run record's lock and its shell records the return code.
+        process = subprocess.Popen(run.record.command(command) if run.record else command, shell=True,
+                                   stdout=out, stderr=err, start_new_session=True,
+                                   preexec_fn=run.limits.preexec if run.limits else None,
+                                   pass_fds=(lock_file.fileno(),) if lock_file else ())
+        if lock_file:
+            run.record.set_owner(lock_file, -process.pid)
+            lock_file.close()
+        deadline = time.monotonic() + SCRIPT_TIMEOUT
+        checked = time.monotonic()
+        stopped = None
+        try:
+            while True:
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    break
+                now = time.monotonic()
+                if now >= deadline:
+                    stopped = subprocess.TimeoutExpired(command, SCRIPT_TIMEOUT)
+                elif now - checked >= CANCEL_POLL:
+                    checked = now
+                    if run.cancelled():
+                        stopped = ScriptCancelled('Cancelled')
+                if stopped is not None:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    pid, status, usage = os.wait4(process.pid, 0)
+                    break
+                time.sleep(PROCESS_POLL)
+        finally:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)  # whatever the shell left running
+            except OSError:
+                pass
+        process.returncode = exit_code(status)
+        run.cpu_time = cpu_time(usage)
+        run.peak_rss = usage.ru_maxrss * 1024
+        if stopped is not None:
+            raise stopped
+        out.seek(0)
+        err.seek(0)
+        return process.returncode, out.read().decode(errors='replace'), err.read().decode(errors='replace')
+
+
+def _run_script(command, script_name, run):
+    start_time = time.time()
+    try:
+        if analyzer_pool.handles(script_name):
+            logger.debug(f"Running {script_name} analyzer in the pool for command: {command}")
+            try:
+                output, run.cpu_time, run.peak_rss = analyzer_pool.run(script_name, command, SCRIPT_TIMEOUT,
+                                                                       run.progress_path, run.limits, run.cancelled,
+                                                                       run.record)
+            except Exception as e:
+                run.cpu_time, run.peak_rss = getattr(e, 'usage', (None, None))
+                raise
+            logger.debug(f"{script_name} analyzer finished in {time.time() - start_time:.2f} seconds: {output}")
+            return 0, None
+        logger.debug(f"Running {script_name} script with command: {command}")
+        return_code, stdout, stderr = _run_process(command, run)
+        elapsed_time = time.time() - start_time
+        if return_code == 0:
+            logger.debug(f"{script_name} script executed successfully in {elapsed_time:.2f} seconds: {stdout}")
+            if stderr:
+                logger.warning(f"{script_name} script warnings: {stderr}")
+            return 0, None
+        logger.error(f"{script_name} script failed with return code {return_code} after {elapsed_time:.2f} seconds: {stderr}")
+        return return_code, stderr[-ERROR_MAX_CHARS:] or f"Exited with return code {return_code}"
+    except (subprocess.TimeoutExpired, AnalyzerTimeout):
+        elapsed_time = time.time() - start_time
+        logger.error(f"{script_name} script timed out after 30 minutes (elapsed: {elapsed_time:.2f} seconds)")
+        return None, 'Timed out after 30 minutes'
+    except (ScriptCancelled, AnalyzerCancelled):
+        logger.info(f"{script_name} script cancelled after {time.time() - start_time:.2f} seconds")
+        return None, 'Cancelled'
+    except MemoryError:
+        logger.error(f"{script_name} script ran out of memory after {time.time() - start_time:.2f} seconds")
+        return None, 'Out of memory (SCRIPT_MEMORY_LIMIT)'
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        logger.error(f"Error running {script_name} script after {elapsed_time:.2f} seconds: {str(e)}")
+        return None, str(e)
+
+
+class JobQueue:
+    """
+    This process's worker pool. Threads are started on first use so CLI commands (flask db ...)
+    don't start any, and not at all in a web process with JOB_WEB_WORKERS off.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.name = None  # in the worker registry
+        self.workers = []
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()  # no more claims
+        self.stopped = threading.Event()  # running jobs finished too: no more heartbeats
+        self.lock = threading.Lock()
+        self.claim_lock = threading.Lock()  # one pick at a time, so the per-user caps hold
+
+    def init_app(self, app):
+        self.app = app
+
+    def start(self, threads=None):
+        """Start threads workers (worker.py), or JOB_WORKERS of them if the web process runs jobs."""
+        with self.lock:
+            if self.workers or self.app is None:
+                return
+            if threads is None:
+                if not self.app.config.get('JOB_WEB_WORKERS', True):
+                    return
+                threads = self.app.config.get('JOB_WORKERS', 4)
+            threads = max(1, threads)
+            self.name = worker_name()
+            with self.app.app_context():
+                # Settle what the last process left running before taking on anything new
+                reclaim_jobs(restarting=self.name)
+                # Before the first claim, or its job would look like a dead worker's
+                register(self.name, threads)
+            for i in range(threads):
+                worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self.workers.append(worker)
+            threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+            logger.info(f"Started {len(self.workers)} script job workers as {self.name}")
+        analyzer_pool.prestart()
+
+    def stop(self):
+        """Stop claiming jobs, wait for the running ones to finish and leave the worker registry."""
+        self.stopping.set()
+        self.wakeup.set()
+        for worker in self.workers:
+            worker.join()
+        self.stopped.set()
+        with self.app.app_context():
+            deregister(self.name)
+
+    def notify(self):
+        self.start()
+        self.wakeup.set()
+
+    def _work(self):
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            try:
+                with self.app.app_context():
+                    job = claim_job()
+                    if job is not None:
+                        run_job(job)
+                        continue
+            except Exception as e:
+                logger.error(f"Script job worker error: {str(e)}")
+            self.wakeup.wait(POLL_INTERVAL)
+
+    def _heartbeat(self):
+        """Renew this worker's lease and reclaim the jobs of dead workers, every JOB_HEARTBEAT_INTERVAL seconds."""
+        while not self.stopped.wait(self.app.config.get('JOB_HEARTBEAT_INTERVAL', 15)):
+            try:
+                with self.app.app_context():
+                    heartbeat(self.name, len(self.workers))
+                    if reclaim_jobs():
+                        self.wakeup.set()
+            except Exception as e:
+                logger.error(f"Script job heartbeat error: {str(e)}")
+
+
+job_queue = JobQueue()
+
+
+def _blocked():
+    """EXISTS clause for a ScriptJob with a dependency that is unfinished, or failed when it needed success."""
+    blocker = aliased(ScriptJob)
+    return db.session.query(JobDependency.job_id).join(blocker, blocker.id == JobDependency.depends_on_id).filter(
+        JobDependency.job_id == ScriptJob.id,
+        or_(blocker.status.in_(ACTIVE_STATUSES),
+            and_(JobDependency.needs_success.is_(True), blocker.status != 'done'))
+    ).exists()
+
+
+def _estimate(jobs):
+    """Record the input size and predicted runtime of ready script jobs that don't have them yet."""
+    for job in jobs:
+        if job.ready_at is None:
+            # Queued before ready_at was recorded
+            job.ready_at = datetime.utcnow()
+    pending = [job for job in jobs if job.predicted is None and job.script not in stage_handlers]
+    if pending:
+        models = fit_models(job.script for job in pending)
+        for job in pending:
+            if job.input_bytes is None:
+                job.input_bytes = input_size(job.input_path)
+            job.predicted = predict(job, models)
+    db.session.commit()
+
+
+def _release_dependents(job):
+    """Mark the queued jobs that were only waiting for job ready. The caller commits."""
+    dependents = ScriptJob.query.join(JobDependency, JobDependency.job_id == ScriptJob.id).filter(
+        JobDependency.depends_on_id == job.id,
+        ScriptJob.status == 'queued',
+        ~_blocked()
+    ).all()
+    for dependent in dependents:
+        dependent.ready_at = job.finished_at
+
+
+def _claim_lock():
+    """Lock serialising claims across processes: none with JOB_CLAIM_LOCK "database", where rows are locked instead."""
+    if job_queue.app.config.get('JOB_CLAIM_LOCK', 'database') == 'file':
+        return digest_lock(lock_dir(job_queue.app.config['UPLOAD_FOLDER']), CLAIM_LOCK_KEY)
+    return nullcontext()
+
+
+def _lock_queued(job):
+    """Lock job's row until the commit, unless another worker has it locked. Returns False if it is taken."""
+    if job_queue.app.config.get('JOB_CLAIM_LOCK', 'database') == 'file':
+        return True
+    return db.session.query(ScriptJob.id).filter_by(id=job.id, status='queued').with_for_update(
+        skip_locked=True).first() is not None
+
+
+def claim_job():
+    """
+    Mark the ready queued job (dependencies met) that the scheduling policy picks running on this
+    worker and return it, or None if there is none or every user with ready jobs is at the cap.
+    A job another worker is claiming at the same time is passed over for the next pick.
+    """
+    policy = SchedulerPolicy.from_config(job_queue.app.config)
+    with job_queue.claim_lock, _claim_lock():
+        ready = ScriptJob.query.filter(ScriptJob.status == 'queued', ~_blocked()).all()
+        if not ready:
+            return None
+        _estimate(ready)
+        now = datetime.utcnow()
+        while ready:
+            job = pick_job(ready, policy, now, stage_handlers)
+            if job is None:
+                return None
+            if _lock_queued(job) and ScriptJob.query.filter_by(id=job.id, status='queued').update(
+                    {'status': 'running', 'started_at': datetime.utcnow(), 'worker': job_queue.name,
+                     'attempts': ScriptJob.attempts + 1}, synchronize_session=False):
+                db.session.commit()
+                db.session.refresh(job)
+                return job
+            ready.remove(job)
+    return None
+
+
+def reclaim_jobs(restarting=None):
+    """
+    Recover the running jobs of dead workers (see _recover) and drop the dead workers from the
+    registry. restarting is the name this process is about to register under. Returns the
+    number of jobs queued again.
+    """
+    config = job_queue.app.config
+    lease = config.get('JOB_LEASE_SECONDS', 90)
+    live = {name for (name,) in live_workers(lease)}
+    stale = [job for job in ScriptJob.query.filter_by(status='running').all() if gone(job.worker, live, restarting)]
+    requeued = sum(_recover(job, config.get('JOB_MAX_ATTEMPTS', 3)) for job in stale)
+    remove_dead(lease)
+    db.session.commit()
+    return requeued
+
+
+def _recover(job, max_attempts):
+    """
+    Settle a running job whose worker died, from its run record (app.journal). A script still
+    running is left to finish, unless it was cancelled or has overrun SCRIPT_TIMEOUT, when it is
+    killed. A script that got to the end is finished with its return code; anything else was
+    cut off and is queued again, without its partial output, or left interrupted once it has
+    been cut off JOB_MAX_ATTEMPTS times. Returns True if the job was queued again.
+    """
+    record = None if job.script in stage_handlers else RunRecord.for_job(job)
+    now = datetime.utcnow()
+    overran = job.started_at is not None and (now - job.started_at).total_seconds() > SCRIPT_TIMEOUT
+    if record is not None and record.in_progress():
+        if not (job.cancelled_by or overran) or not record.stop():
+            return False  # it outlived its worker; recovered once it exits
+    return_code = record.return_code() if record is not None else None
+    if job.cancelled_by:
+        values = {'status': 'failed', 'error': f"Cancelled by {job.cancelled_by}"}
+    elif return_code is not None:
+        values = {'status': 'done' if return_code == 0 else 'failed', 'return_code': return_code,
+                  'error': None if return_code == 0 else f"Exited with return code {return_code}"}
+    elif overran:
+        values = {'status': 'failed', 'error': 'Timed out after 30 minutes'}
+    elif job.attempts >= max_attempts:
+        values = {'status': 'interrupted', 'error': f"Interrupted {job.attempts} times: worker {job.worker} stopped"}
+    else:
+        values = {'status': 'queued', 'started_at': None, 'worker': None,
+                  'error': f"Interrupted: worker {job.worker} stopped"}
+    if values['status'] != 'queued':
+        values['finished_at'] = now
+    # Unless it finished, or another worker recovered it, since it was read
+    if not ScriptJob.query.filter_by(id=job.id, status='running', worker=job.worker).update(
+            values, synchronize_session=False):
+        db.session.rollback()
+        return False
+    logger.warning(f"Script job {job.id} ({job.script}, session {job.session_id}) of dead worker {job.worker} "
+                   f"recovered: {values['status']}")
+    db.session.refresh(job)
+    if job.status == 'queued':
+        if record is not None and os.path.isfile(job.output_path):
+            os.remove(job.output_path)
+    else:
+        if job.status != 'done':
+            fail_dependents(job)
+        _release_dependents(job)
+    db.session.commit()
+    if record is not None and job.status != 'queued':
+        record.clear()
+    publish(channel_path(job.session.transaction_folder), 'job', script=job.script, status=job.status)
+    return job.status == 'queued'
+
+
+def holds_lease(job):
+    """Whether this worker still runs job, rather than having been given up for dead and the job reclaimed."""
+    with db.engine.connect() as connection:
+        return connection.execute(select(ScriptJob.worker).where(
+            ScriptJob.id == job.id, ScriptJob.status == 'running')).scalar() == job.worker
+
+
+def run_job(job):
+    start_time = time.time()
+    elapsed = None
+    progress_path = channel_path(job.session.transaction_folder)
+    publish(progress_path, 'job', script=job.script, status='running')
+    handler = stage_handlers.get(job.script)
+    run = ScriptRun(progress_path, ResourceLimits.from_config(job_queue.app.config),
+                    lambda: cancel_requested(job.id) is not None, RunRecord.for_job(job) if handler is None else None)
+    try:
+        if handler is not None:
+            handler(job)
+            return_code, error, elapsed = 0, None, time.time() - start_time
+        else:
+            return_code, error, elapsed = run_cached(job, run)
+    except Exception as e:
+        logger.error(f"Script job {job.id} could not be run: {str(e)}")
+        db.session.rollback()
+        return_code, error = None, str(e)
+    if not holds_lease(job):
+        db.session.rollback()
+        logger.warning(f"Script job {job.id} ({job.script}, session {job.session_id}) was reclaimed from "
+                       f"{job.worker} while it ran; its result is dropped")
+        return
+    cancelled_by = cancel_requested(job.id)
+    if cancelled_by is not None and (error is not None or handler is not None):
+        # A stage is not interrupted, but what needed it doesn't run
+        error = f"Cancelled by {cancelled_by}"
+    job.return_code = return_code
+    job.error = error
+    job.elapsed = elapsed
+    job.cpu_time = run.cpu_time
+    job.peak_rss = run.peak_rss
+    if job.input_path and elapsed is not None:
+        # Counted after the run, while the script's read of the input is still cached
+        job.input_bytes = input_size(job.input_path)
+        job.input_lines = count_lines(job.input_path)
+    job.status = 'done' if error is None else 'failed'
+    job.finished_at = datetime.utcnow()
+    if job.status == 'failed':
+        fail_dependents(job)
+    _release_dependents(job)
+    db.session.commit()
+    if run.record is not None:
+        run.record.clear()
+    logger.info(f"Script job {job.id} ({job.script}, session {job.session_id}) {job.status}")
+    publish(progress_path, 'job', script=job.script, status=job.status)
+    # Jobs that were waiting for this one may be ready now
+    job_queue.wakeup.set()
+
+
+def run_cached(job, run=None):
+    """
+    run_script for a job, served from the result cache on a hit. On a miss run_script removes
+    any earlier output first, and only an output the script produced in this call is stored:
+    one linked from an identical session may come from older code than the key names.
+    """
+    key = result_cache.key(job)
+    if key is not None:
+        job.cache_hit = result_cache.fetch(key, job.output_path)
+        if job.cache_hit:
+            return 0, None, None
+    return_code, error, elapsed = run_script(job.command, job.script, job.output_path, script_coalesce(job), run)
+    if key is not None and error is None and elapsed is not None:
+        result_cache.store(key, job.output_path, job.script)
+    return return_code, error, elapsed
+
+
+def _serve_cached(job):
+    """Finish a ready script job from the result cache without queueing it. The caller commits."""
+    if job.script in stage_handlers:
+        return False
+    key = result_cache.key(job)
+    if key is None or not result_cache.fetch(key, job.output_path):
+        return False
+    job.status = 'done'
+    job.return_code = 0
+    job.cache_hit = True
+    job.started_at = job.finished_at = datetime.utcnow()
+    return True
+
+
+def cancel_requested(job_id):
+    """Who asked to cancel a job, or None. Read on a connection of its own, so a request made by any process is seen."""
+    with db.engine.connect() as connection:
+        return connection.execute(select(ScriptJob.cancelled_by).where(ScriptJob.id == job_id)).scalar()
+
+
+def cancel_job(job, cancelled_by):
+    """
+    Cancel a queued or running job; returns False if it had already finished. A queued job is
+    failed at once, with the jobs that needed it. A running one is flagged, and the worker
+    running it stops the script and fails it.
+    """
+    error = f"Cancelled by {cancelled_by}"
+    now = datetime.utcnow()
+    if ScriptJob.query.filter_by(id=job.id, status='queued').update(
+            {'status': 'failed', 'error': error, 'cancelled_by': cancelled_by, 'finished_at': now},
+            synchronize_session=False):
+        db.session.refresh(job)
+        fail_dependents(job, error)
+        _release_dependents(job)
+        db.session.commit()
+        publish(channel_path(job.session.transaction_folder), 'job', script=job.script, status='failed')
+        job_queue.wakeup.set()
+    elif ScriptJob.query.filter_by(id=job.id, status='running').update(
+            {'cancelled_by': cancelled_by}, synchronize_session=False):
+        db.session.commit()
+    else:
+        db.session.rollback()
+        return False
+    logger.info(f"Script job {job.id} ({job.script}, session {job.session_id}) cancelled by {cancelled_by}")
+    return True
+
+
+def fail_dependents(job, error=None):
+    """Fail the queued jobs that needed job to succeed, and the ones that needed those. The caller commits."""
+    error = error or f"{job.script} failed: {job.error}"
+    dependents = ScriptJob.query.join(JobDependency, JobDependency.job_id == ScriptJob.id).filter(
+        JobDependency.depends_on_id == job.id,
+        JobDependency.needs_success.is_(True),
+        ScriptJob.status == 'queued'
+    ).all()
+    for dependent in dependents:
+        dependent.status = 'failed'
+        dependent.error = error
+        dependent.finished_at = datetime.utcnow()
+        logger.info(f"Script job {dependent.id} ({dependent.script}, session {dependent.session_id}) "
+                    f"not run: {job.script} failed")
+        fail_dependents(dependent, error)
+
+
+def script_coalesce(job):
+    session = SessionMetadata.query.filter_by(session_id=job.session_id).first()
+    if not (session and session.content_digest):
+        return None
+    return (lock_dir(job_queue.app.config['UPLOAD_FOLDER']), session.content_digest,
+            [s.session_id for s in duplicate_sessions(session.content_digest, job.session_id)])
+
+
+def enqueue_job(session_id, script, command, output_path, after=(), needs_success=True, input_path=None):
+    """
+    Queue a script run and return its ScriptJob. An identical run for the session
+    that is still queued or running is returned instead of a new one.
+
+    The job waits for the jobs in after to finish; with needs_success it is failed
+    rather than run if any of them fails. input_path is the file a script reads,
+    sized for its runtime estimate once the job is ready. A script run that is ready
+    and has its output in the result cache is returned already done.
+    """
+    job = ScriptJob.query.filter(
+        ScriptJob.session_id == session_id,
+        ScriptJob.script == script,
+        ScriptJob.command == command,
+        ScriptJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+    if job is None:
+        job = ScriptJob(session_id=session_id, script=script, command=command, output_path=output_path,
+                        input_path=input_path)
+        db.session.add(job)
+        db.session.flush()
+        for dependency in after:
+            db.session.add(JobDependency(job_id=job.id, depends_on_id=dependency.id, needs_success=needs_success))
+        failed = ScriptJob.query.filter(ScriptJob.id.in_([d.id for d in after]),
+                                        ScriptJob.status.in_(FAILED_STATUSES)).first() if needs_success and after else None
+        if failed is not None:
+            # It failed before the edge existed, so fail_dependents missed this job
+            job.status = 'failed'
+            # (a job failed by fail_dependents never started and already carries the original error)
+            job.error = failed.error if failed.started_at is None else f"{failed.script} failed: {failed.error}"
+            job.finished_at = datetime.utcnow()
+        elif ScriptJob.query.filter(ScriptJob.id == job.id, _blocked()).first() is None:
+            job.ready_at = datetime.utcnow()
+            if _serve_cached(job):
+                db.session.commit()
+                logger.info(f"Script job {job.id} ({script}, session {session_id}) served from the result cache")
+                return job
+        db.session.commit()
+        logger.debug(f"Queued script job {job.id}: {script} for session {session_id}")
+    job_queue.notify()
+    return job
+
+
+def latest_jobs(session_id):
+    """The most recent job of each script for a session, keyed by script."""
+    jobs = {}
+    for job in ScriptJob.query.filter_by(session_id=session_id).order_by(ScriptJob.id).all():
+        jobs[job.script] = job
+    return jobs
+
+
+def session_estimates(session_id):
+    """Estimated finish time (naive UTC) of a session's queued and running jobs, keyed by job id."""
+    config = job_queue.app.config
+    workers = capacity(config.get('JOB_LEASE_SECONDS', 90), config.get('JOB_WORKERS', 4))
+    finish = estimate_finish(max(1, workers), config.get('JOB_AGING_RATE', 1.0), stage_handlers)
+    ids = {job_id for (job_id,) in db.session.query(ScriptJob.id).filter(
+        ScriptJob.session_id == session_id, ScriptJob.status.in_(ACTIVE_STATUSES))}
+    return {job_id: eta for job_id, eta in finish.items() if job_id in ids}
@@ -0,0 +1,119 @@
+# Location: /opt/my_flask_app/app/journal.py
+"""
+On-disk record of script runs, for recovering jobs whose worker died.
+
+The ScriptJob rows are the job journal; what they cannot know after a crash is
+how far a run got, because a script outlives the process that started it (it
+runs in a session of its own, and a pool worker finishes the job it is on).
+So every run keeps, under <transaction folder>/log/jobs/:
+
+    <job id>.lock   flocked by the run for as long as any of its processes
+                    lives, and holding "<host> <pid>" of them (a negative pid
+                    is a process group)
+    <job id>.exit   the script's return code, written the moment it ends by
+                    the script's shell or by the pool worker that ran it
+
+Reconciliation (app.jobs.reclaim_jobs) reads them for the running jobs of a
+dead worker: a run still holding its lock is left to finish, one with a
+return code is finished from it without being run again, and the rest were
+cut off and are queued again.
+"""
+import os
+import shlex
+import fcntl
+import signal
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIRNAME = 'jobs'
+
+
+class RunRecord:
+    """The lock and exit files of one job's run. Plain paths, so it can be sent to a pool worker."""
+
+    def __init__(self, folder, job_id):
+        self.lock_path = os.path.join(folder, f"{job_id}.lock")
+        self.exit_path = os.path.join(folder, f"{job_id}.exit")
+
+    @classmethod
+    def for_job(cls, job):
+        return cls(os.path.join(job.session.transaction_folder, 'log', JOURNAL_DIRNAME), job.id)
+
+    def hold(self):
+        """Take the run's lock. Returns the open lock file; the lock lasts while it (or a copy in a child) is open."""
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        if os.path.exists(self.exit_path):
+            os.remove(self.exit_path)  # from an attempt cut off after the script ended
+        lock_file = open(self.lock_path, 'a+')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def set_owner(self, lock_file, pid):
+        """Record which process (negative: process group) the run is, so it can be stopped after its worker dies."""
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{socket.gethostname()} {pid}\n")
+        lock_file.flush()
+
+    def owner(self):
+        """(host, pid) of the run, or None."""
+        try:
+            with open(self.lock_path) as f:
+                host, pid = f.read().split()
+            return host, int(pid)
+        except (OSError, ValueError):
+            return None
+
+    def in_progress(self):
+        """Whether a process of the run is still alive, holding the lock."""
+        try:
+            with open(self.lock_path) as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return True
+                fcntl.flock(f, fcntl.LOCK_UN)
+        except OSError:
+            pass
+        return False
+
+    def command(self, command):
+        """command, followed by writing its return code to the exit file."""
+        return f"{command}\necho $? > {shlex.quote(self.exit_path)}"
+
+    def finish(self, return_code):
+        temp_path = self.exit_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(f"{return_code}\n")
+        os.replace(temp_path, self.exit_path)
+
+    def return_code(self):
+        """The run's recorded return code, or None if the script did not get to the end."""
+        try:
+            with open(self.exit_path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def stop(self):
+        """Kill the run's processes, if they are on this host. Returns False if they could not be reached."""
+        owner = self.owner()
+        if owner is None or owner[0] != socket.gethostname():
+            return False
+        try:
+            os.kill(owner[1], signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not stop run {self.lock_path}: {str(e)}")
+            return False
+        return True
+
+    def clear(self):
+        for path in (self.lock_path, self.exit_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
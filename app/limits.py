@@ -0,0 +1,117 @@
+# Location: /opt/my_flask_app/app/limits.py
+"""
+Resource limits and usage accounting for script runs.
+
+SCRIPT_CPU_LIMIT, SCRIPT_MEMORY_LIMIT and SCRIPT_OUTPUT_LIMIT cap the CPU
+seconds, address space and size of any file a run writes, through
+setrlimit. A script started as a subprocess gets them in its new process
+group (preexec), so they cover the shell and its python child alike. A warm
+analyzer pool worker gets them for the length of one job: its soft limits
+are lowered (CPU relative to what the worker has already used) and put
+back afterwards. Usage is CPU seconds (user + system) and peak RSS in
+bytes; in a pool worker the kernel's high-water mark is reset before each
+job so the peak is the job's own.
+"""
+import os
+import signal
+import logging
+import resource
+
+logger = logging.getLogger(__name__)
+
+CPU_KILL_GRACE = 5  # seconds between SIGXCPU and SIGKILL for a subprocess over its CPU limit
+
+
+class LimitExceeded(Exception):
+    """Raised in a pool worker whose job ran past its CPU time limit."""
+
+
+class ResourceLimits:
+    def __init__(self, cpu_seconds=0, address_space=0, file_size=0):
+        self.cpu_seconds = cpu_seconds
+        self.address_space = address_space
+        self.file_size = file_size
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('SCRIPT_CPU_LIMIT', 0), config.get('SCRIPT_MEMORY_LIMIT', 0),
+                   config.get('SCRIPT_OUTPUT_LIMIT', 0))
+
+    def __bool__(self):
+        return bool(self.cpu_seconds or self.address_space or self.file_size)
+
+    def preexec(self):
+        """Set the limits in a freshly forked subprocess (its preexec_fn). Only plain setrlimit calls here."""
+        if self.cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + CPU_KILL_GRACE))
+        if self.address_space:
+            resource.setrlimit(resource.RLIMIT_AS, (self.address_space, self.address_space))
+        if self.file_size:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (self.file_size, self.file_size))
+
+    def apply(self):
+        """
+        Lower this process's soft limits for one job. Returns the previous soft limits, for
+        restore(). Over the CPU limit the job gets LimitExceeded; over the file size, EFBIG.
+        """
+        previous = {}
+        if self.cpu_seconds:
+            used = cpu_time(resource.getrusage(resource.RUSAGE_SELF))
+            previous[resource.RLIMIT_CPU] = _lower(resource.RLIMIT_CPU, int(used) + 1 + self.cpu_seconds)
+            signal.signal(signal.SIGXCPU, _over_cpu)
+        if self.address_space:
+            previous[resource.RLIMIT_AS] = _lower(resource.RLIMIT_AS, self.address_space)
+        if self.file_size:
+            previous[resource.RLIMIT_FSIZE] = _lower(resource.RLIMIT_FSIZE, self.file_size)
+            signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+        return previous
+
+
+def _lower(which, soft):
+    current, hard = resource.getrlimit(which)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(which, (soft, hard))
+    return current
+
+
+def restore(previous):
+    for which, soft in previous.items():
+        resource.setrlimit(which, (soft, resource.getrlimit(which)[1]))
+
+
+def _over_cpu(signum, frame):
+    raise LimitExceeded('CPU time limit exceeded')
+
+
+def cpu_time(usage):
+    return usage.ru_utime + usage.ru_stime
+
+
+def reset_peak_rss():
+    """Reset this process's peak RSS (VmHWM). Returns False where the kernel does not support it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """This process's peak RSS in bytes since it started or reset_peak_rss()."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def exit_code(status):
+    """Return code, Popen style, of a wait status: negative for a signal."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
@@ -0,0 +1,247 @@
+# Location: /opt/my_flask_app/app/log_index.py
+"""
+Byte-offset index of the command blocks in a tech-support.log.
+
+One streaming scan records every line that starts a `show ...` command (or
+contains one of the CCR markers) and every `end` line, with its line number and
+byte offset. The index is saved next to the session as tech_support_index.json;
+CCR and CHR inputs are then sliced out of the log by seeking to the blocks they
+need (see app.staging). Only one line is held in memory at a time.
+
+The scan also tracks which lines are "clean" (valid UTF-8, nothing to strip,
+plain \n ending). A block made only of clean lines is byte-identical in the
+generated input, so it can be copied as a byte range without decoding.
+
+Line numbers and text match what content.splitlines() on the decoded log gave,
+so the generated inputs are unchanged.
+"""
+import os
+import json
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'tech_support_index.json'
+INDEX_VERSION = 2
+COMMAND_MAX_CHARS = 200
+
+# CCR markers, in the order the input builders test them
+MARKERS = (
+    ('running-config', ('show running-config', 'show running config')),
+    ('vrrp', ('show vrrp stats all',)),
+    ('ap', ('show ap active',)),
+)
+
+
+def index_path(transaction_folder):
+    return os.path.join(transaction_folder, INDEX_FILENAME)
+
+
+def _decode(raw, state):
+    try:
+        return raw.decode('utf-8'), True
+    except UnicodeDecodeError as e:
+        if not state.get('warned'):
+            logger.warning(f"Failed to decode tech-support.log as UTF-8: {str(e)}")
+            state['warned'] = True
+        return raw.decode('utf-8', errors='replace'), False
+
+
+def _line_marker(line_lower):
+    for marker, needles in MARKERS:
+        if any(needle in line_lower for needle in needles):
+            return marker
+    return None
+
+
+def _source_size(fileobj):
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def scan(fileobj):
+    """
+    Build the block index of a binary tech-support.log file object in one pass.
+
+    Each block is [line, byte offset, sub-line, marker, starts with "show", command,
+    dirty lines before it]; "sub-line" counts the lines before it that share its
+    newline-terminated record (splitlines also breaks on \r, \f, ...). Each end is
+    [line, byte offset, sub-line, dirty lines before it, line is dirty, next offset].
+    """
+    blocks = []
+    ends = []
+    head = []
+    state = {}
+    line_no = 0
+    offset = 0
+    dirty = 0
+    last_raw = b''
+    for raw in fileobj:
+        text, decoded = _decode(raw, state)
+        lines = text.splitlines()
+        newline = b'\n' if raw.endswith(b'\n') else b''
+        clean = decoded and len(lines) == 1 and raw == lines[0].strip().encode('utf-8') + newline
+        for sub, line in enumerate(lines):
+            if len(head) < 20:
+                head.append(line)
+            stripped = line.strip()
+            lower = stripped.lower()
+            if lower == 'end':
+                ends.append([line_no, offset, sub, dirty, not clean, offset + len(raw)])
+            marker = _line_marker(lower)
+            starts_show = lower.startswith('show')
+            if marker or starts_show:
+                blocks.append([line_no, offset, sub, marker, starts_show, stripped[:COMMAND_MAX_CHARS], dirty])
+            line_no += 1
+            if not clean:
+                dirty += 1
+        offset += len(raw)
+        last_raw = raw
+    logger.debug(f"First 20 lines of tech-support.log:\n{chr(10).join(head)}")
+    return {
+        'version': INDEX_VERSION,
+        'size': offset,
+        'lines': line_no,
+        'dirty_lines': dirty,
+        'trailing_newline': last_raw.endswith(b'\n'),
+        'decode_errors': bool(state.get('warned')),
+        'blocks': blocks,
+        'ends': ends,
+    }
+
+
+def copy_decoded(fileobj, out):
+    """Write the log to a text file the way it decodes (undecodable bytes replaced)."""
+    state = {}
+    fileobj.seek(0)
+    for raw in fileobj:
+        out.write(_decode(raw, state)[0])
+
+
+def load_index(transaction_folder, fileobj):
+    """Return the saved index if it was built from a log of this size, else None."""
+    try:
+        with open(index_path(transaction_folder), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != INDEX_VERSION or index.get('size') != _source_size(fileobj):
+        return None
+    return index
+
+
+def save_index(transaction_folder, index):
+    path = index_path(transaction_folder)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(temp_path, path)
+
+
+def block_ranges(index):
+    """(command, start offset, end offset, first line, last line) of every block, for display and drill-down."""
+    blocks = index['blocks']
+    for i, (line, offset, _, _, _, command, _) in enumerate(blocks):
+        if i + 1 < len(blocks):
+            yield command, offset, blocks[i + 1][1], line, blocks[i + 1][0] - 1
+        else:
+            yield command, offset, index['size'], line, index['lines'] - 1
+
+
+def log_markers(index):
+    for line, _, _, marker, _, command, _ in index['blocks']:
+        if marker == 'running-config':
+            logger.debug(f"Exact match for 'show running-config' at line {line}: {command}")
+        elif marker:
+            logger.debug(f"Exact match for '{dict(MARKERS)[marker][0]}' at line {line}: {command}")
+
+
+def iter_lines(fileobj, position, count=None):
+    """Yield up to count stripped lines starting at a block or end position [line, offset, sub, ...]."""
+    if count is not None and count <= 0:
+        return
+    _, offset, skip = position[:3]
+    state = {}
+    fileobj.seek(offset)
+    for raw in fileobj:
+        for line in _decode(raw, state)[0].splitlines():
+            if skip:
+                skip -= 1
+                continue
+            yield line.strip()
+            if count is not None:
+                count -= 1
+                if count == 0:
+                    return
+
+
+def _first_after(entries, lines, line):
+    """First entry whose line number is greater than line; lines are the entries' line numbers."""
+    i = bisect.bisect_right(lines, line)
+    return entries[i] if i < len(entries) else None
+
+
+class Slice:
+    """A run of count lines starting at block; start/stop are its byte range and clean says it needs no rewriting."""
+
+    def __init__(self, block, count, closed, stop, dirty):
+        self.block = block
+        self.count = count
+        self.closed = closed
+        self.start = block[1]
+        self.stop = stop
+        self.clean = dirty == 0
+
+    def clean_bytes(self, index):
+        """Length of the byte range that equals this slice's text (without the final newline)."""
+        ends_with_newline = self.stop < index['size'] or index['trailing_newline']
+        return self.stop - self.start - (1 if ends_with_newline else 0)
+
+
+def _running_config_slice(block, ends, end_lines, index):
+    end = _first_after(ends, end_lines, block[0])
+    if end:
+        return Slice(block, end[0] - block[0] + 1, True, end[5], end[3] + end[4] - block[6])
+    return Slice(block, index['lines'] - block[0], False, index['size'], index['dirty_lines'] - block[6])
+
+
+def ccr_blocks(index):
+    """
+    Slices of the CCR blocks: each running-config block up to and including its
+    "end" line, and each vrrp / ap block up to the next "show" line. As in the
+    original line scan, the "show" line that closes a block is not itself checked
+    for a marker.
+    """
+    ends = index['ends']
+    end_lines = [end[0] for end in ends]
+    shows = [block for block in index['blocks'] if block[4]]
+    show_lines = [block[0] for block in shows]
+    position = 0
+    for block in index['blocks']:
+        line, marker = block[0], block[3]
+        if line < position or not marker:
+            continue
+        if marker == 'running-config':
+            piece = _running_config_slice(block, ends, end_lines, index)
+            position = line + piece.count
+        else:
+            closing = _first_after(shows, show_lines, line)
+            if closing:
+                piece = Slice(block, closing[0] - line, True, closing[1], closing[6] - block[6])
+                position = closing[0] + 1
+            else:
+                piece = Slice(block, index['lines'] - line, False, index['size'], index['dirty_lines'] - block[6])
+                position = index['lines']
+        yield piece
+
+
+def chr_block(index):
+    """Slice of the first running-config block, or None."""
+    end_lines = [end[0] for end in index['ends']]
+    for block in index['blocks']:
+        if block[3] == 'running-config':
+            return _running_config_slice(block, index['ends'], end_lines, index)
+    return None
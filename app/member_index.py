@@ -0,0 +1,170 @@
+# Location: /opt/my_flask_app/app/member_index.py
+"""
+Per-session index of extracted archive members.
+
+Extraction records every member it writes (path, size, mtime, type and the
+archive it came from) in a small SQLite file next to the session, so lookups
+such as "where is tech-support.log" or "which files does KEYWORD scan" are
+index queries instead of os.walk over the extracted tree.
+
+The archive_members table holds the header index of the uploaded archive
+itself (see app.archive_reader), for members that are read in place.
+"""
+import os
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'members.sqlite'
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.gz')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    extracted_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_name ON members (name);
+CREATE TABLE IF NOT EXISTS archive_members (
+    archive TEXT NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data_offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (archive, path)
+);
+CREATE INDEX IF NOT EXISTS archive_members_name ON archive_members (name);
+"""
+
+
+def member_kind(member):
+    """Index kind of a tarfile.TarInfo."""
+    return 'dir' if member.isdir() else 'symlink' if member.issym() else 'file' if member.isfile() else 'other'
+
+
+def index_path(transaction_folder):
+    return os.path.join(transaction_folder, INDEX_FILENAME)
+
+
+def has_index(transaction_folder):
+    return os.path.exists(index_path(transaction_folder))
+
+
+class MemberIndex:
+    """SQLite index of the members extracted into one transaction folder. Paths are stored relative to it."""
+
+    def __init__(self, transaction_folder):
+        self.transaction_folder = transaction_folder
+        self.conn = sqlite3.connect(index_path(transaction_folder), timeout=30)
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.commit()
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def abspath(self, rel_path):
+        return os.path.join(self.transaction_folder, rel_path)
+
+    def add_many(self, entries):
+        """Insert (path, size, mtime, kind, origin) tuples, replacing earlier rows for the same path."""
+        now = int(time.time())
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO members (path, name, size, mtime, kind, origin, extracted_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((path, os.path.basename(path), size, mtime, kind, origin, now)
+             for path, size, mtime, kind, origin in entries)
+        )
+
+    def move(self, old_path, new_path):
+        """Re-point a moved file or directory (and everything under it) to its new location."""
+        self.conn.execute("DELETE FROM members WHERE path = ? OR substr(path, 1, ?) = ?",
+                          (new_path, len(new_path) + 1, new_path + '/'))
+        self.conn.execute(
+            "UPDATE members SET path = ? || substr(path, ?), name = CASE WHEN path = ? THEN ? ELSE name END "
+            "WHERE path = ? OR substr(path, 1, ?) = ?",
+            (new_path, len(old_path) + 1, old_path, os.path.basename(new_path),
+             old_path, len(old_path) + 1, old_path + '/')
+        )
+
+    def remove(self, paths):
+        self.conn.executemany("DELETE FROM members WHERE path = ?", ((path,) for path in paths))
+
+    def find(self, name):
+        """Relative path of the first member with the given basename, or None."""
+        row = self.conn.execute(
+            "SELECT path FROM members WHERE name = ? AND kind = 'file' ORDER BY length(path), path LIMIT 1", (name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def files(self, prefixes=None, exclude_suffixes=()):
+        """Yield (path, size, mtime) of indexed files, optionally limited to path prefixes, in path order."""
+        query = "SELECT path, size, mtime FROM members WHERE kind = 'file'"
+        params = []
+        if prefixes:
+            query += " AND (" + " OR ".join("substr(path, 1, ?) = ?" for _ in prefixes) + ")"
+            for prefix in prefixes:
+                params.extend((len(prefix), prefix))
+        query += " ORDER BY path"
+        for path, size, mtime in self.conn.execute(query, params):
+            if not path.endswith(exclude_suffixes):
+                yield path, size, mtime
+
+    def extracted_before(self, cutoff):
+        """Yield (path, kind) of members extracted before the cutoff timestamp, deepest paths first."""
+        yield from self.conn.execute(
+            "SELECT path, kind FROM members WHERE extracted_at < ? ORDER BY length(path) DESC", (int(cutoff),)
+        )
+
+    def add_archive_members(self, archive, rows):
+        """Replace the header index of archive with (path, data offset, size, mtime, kind) rows."""
+        self.conn.execute("DELETE FROM archive_members WHERE archive = ?", (archive,))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO archive_members (archive, path, name, data_offset, size, mtime, kind) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((archive, path, os.path.basename(path.rstrip('/')), offset, size, mtime, kind)
+             for path, offset, size, mtime, kind in rows)
+        )
+
+    def has_archive(self, archive):
+        return self.conn.execute("SELECT 1 FROM archive_members WHERE archive = ? LIMIT 1",
+                                 (archive,)).fetchone() is not None
+
+    def find_archive_member(self, name):
+        """(archive, path, data offset, size) of the first archived file with the given basename, or None."""
+        return self.conn.execute(
+            "SELECT archive, path, data_offset, size FROM archive_members WHERE name = ? AND kind = 'file' "
+            "ORDER BY length(path), path LIMIT 1", (name,)
+        ).fetchone()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+
+
+def record_extraction(transaction_folder, entries, moves):
+    """Write the entries and flash -> config moves (new path None = removed) collected during an extraction run."""
+    start = time.perf_counter()
+    with MemberIndex(transaction_folder) as index:
+        index.add_many(entries)
+        for old_path, new_path in moves:
+            if new_path is None:
+                index.remove([old_path])
+            else:
+                index.move(old_path, new_path)
+        total = index.count()
+    logger.debug(f"Indexed {len(entries)} members ({total} total) for {transaction_folder} "
+                 f"in {time.perf_counter() - start:.2f}s")
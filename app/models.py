@@ -41,6 +41,92 @@ class SessionMetadata(db.Model):
     case_number = db.Column(db.String(50), nullable=False)
     transaction_folder = db.Column(db.String(255), nullable=False)
     upload_timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    content_digest = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of the uploaded bundle
+    script_options = db.Column(db.String(100), nullable=True)  # Scripts selected at upload, comma-separated
+    pipeline_status = db.Column(db.String(20), nullable=True)  # queued, extracting, indexing, preparing, ready or failed
+    pipeline_progress = db.Column(db.String(255), nullable=True)
+    pipeline_error = db.Column(db.Text, nullable=True)
+    pipeline_notices = db.Column(db.Text, nullable=True)  # JSON list of [message, category]
+    priority = db.Column(db.Boolean, default=False, nullable=False)  # Escalated by an admin: jobs run in the priority lane
 
     def __repr__(self):
-        return f'<SessionMetadata {self.session_id}>'
\ No newline at end of file
+        return f'<SessionMetadata {self.session_id}>'
+
+class ScriptJob(db.Model):
+    __tablename__ = 'script_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(36), db.ForeignKey('session_metadata.session_id'), nullable=False, index=True)
+    script = db.Column(db.String(20), nullable=False)  # 'CCR', 'CHR', 'BUCKET', 'KEYWORD' or a pipeline stage
+    command = db.Column(db.Text, nullable=False)  # Shell command; for pipeline stages, the script options served
+    output_path = db.Column(db.String(255), nullable=False)
+    input_path = db.Column(db.String(255), nullable=True)  # The file the script reads, for runtime estimates
+    status = db.Column(db.String(20), default='queued', nullable=False, index=True)  # queued, running, done, failed, interrupted
+    return_code = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    ready_at = db.Column(db.DateTime, nullable=True)  # When its dependencies were met and it could be claimed
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    input_bytes = db.Column(db.BigInteger, nullable=True)
+    input_lines = db.Column(db.Integer, nullable=True)
+    elapsed = db.Column(db.Float, nullable=True)  # Seconds the script or stage itself ran (None if its output was reused)
+    predicted = db.Column(db.Float, nullable=True)  # Seconds the runtime model expected
+    cache_hit = db.Column(db.Boolean, nullable=True)  # Served from the result cache; None if not looked up
+    cpu_time = db.Column(db.Float, nullable=True)  # CPU seconds (user + system) the script used
+    peak_rss = db.Column(db.BigInteger, nullable=True)  # Peak resident memory of the script, in bytes
+    cancelled_by = db.Column(db.String(120), nullable=True)  # Who asked to cancel the job
+    worker = db.Column(db.String(120), nullable=True, index=True)  # JobWorker running (or that last ran) the job
+    attempts = db.Column(db.Integer, default=0, nullable=False)  # Times claimed; more than one if a worker died on it
+
+    session = db.relationship('SessionMetadata', backref=db.backref('jobs', lazy='dynamic'))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'session_id': self.session_id,
+            'script': self.script,
+            'status': self.status,
+            'return_code': self.return_code,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'ready_at': self.ready_at.isoformat() if self.ready_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'input_bytes': self.input_bytes,
+            'input_lines': self.input_lines,
+            'elapsed': self.elapsed,
+            'predicted': self.predicted,
+            'cache_hit': self.cache_hit,
+            'cpu_time': self.cpu_time,
+            'peak_rss': self.peak_rss,
+            'cancelled_by': self.cancelled_by,
+            'worker': self.worker,
+            'attempts': self.attempts,
+        }
+
+    def __repr__(self):
+        return f'<ScriptJob {self.id} {self.script} {self.status}>'
+
+class JobDependency(db.Model):
+    __tablename__ = 'job_dependency'
+
+    job_id = db.Column(db.Integer, db.ForeignKey('script_job.id'), primary_key=True)
+    depends_on_id = db.Column(db.Integer, db.ForeignKey('script_job.id'), primary_key=True, index=True)
+    needs_success = db.Column(db.Boolean, default=True, nullable=False)  # False: runs once the other job ends either way
+
+    def __repr__(self):
+        return f'<JobDependency {self.job_id} after {self.depends_on_id}>'
+
+class JobWorker(db.Model):
+    __tablename__ = 'job_worker'
+
+    id = db.Column(db.String(120), primary_key=True)  # host:pid
+    host = db.Column(db.String(255), nullable=False)
+    pid = db.Column(db.Integer, nullable=False)
+    threads = db.Column(db.Integer, nullable=False)  # Jobs it runs at a time
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<JobWorker {self.id}>'
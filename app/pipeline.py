@@ -0,0 +1,354 @@
+# Location: /opt/my_flask_app/app/pipeline.py
+"""
+Background pipeline from an uploaded bundle to script outputs.
+
+The upload request only saves the archive and the session row. For each
+selected script process_scripts queues a chain of jobs that ends in the script
+run, linked by app.jobs dependencies:
+
+    EXTRACT (tech_support) -> INDEX -> INPUT_CCR / INPUT_CHR / INPUT_BUCKET -> CCR / CHR / BUCKET
+    EXTRACT (tree) -> INPUT_KEYWORD -> KEYWORD
+    every run -> ZIP
+
+so each script starts as soon as its own input is built: the CCR, CHR and
+BUCKET reports appear while KEYWORD's tree is still being extracted and read.
+Stages record their progress, notices and failure on the SessionMetadata row
+and stream their progress to the dashboard through app.progress. Emailing a report stays on demand (email_output).
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import functools
+
+from flask import current_app
+
+from app import db
+from app.models import ScriptJob, SessionMetadata
+from app.jobs import stage_handlers, enqueue_job, ACTIVE_STATUSES
+from app.dedup import digest_lock, lock_dir, reuse_duplicate
+from app.extraction import ensure_extracted, find_session_archive, SCRIPT_MEMBER_GROUPS
+from app.inputs import prepare_inputs, missing_inputs, index_session, InputError
+from app.progress import channel_path, publish
+from app.preflight import PreflightError, new_preflight, is_compressed
+
+logger = logging.getLogger(__name__)
+
+STAGE_EXTRACT = 'EXTRACT'
+STAGE_INDEX = 'INDEX'
+STAGE_ZIP = 'ZIP'
+PIPELINE_ACTIVE = ('queued', 'extracting', 'indexing', 'preparing')
+PROGRESS_INTERVAL = 2  # seconds between progress updates while extracting
+
+# Script option -> (job name, input file, output file, command template)
+SCRIPTS = {
+    'ccr': ('CCR', 'CCR_input.txt', 'ccr_output.html',
+            "python3.8 /opt/my_flask_app/scripts/CCR/ccr_engine.py {input_path} {output_path} {log_file} both"),
+    'chr': ('CHR', 'CHR_input.txt', 'chr_output.html',
+            "python3.8 /opt/my_flask_app/scripts/CHR/script_chr.py {input_path} {output_path} {log_file}"),
+    'bucket': ('BUCKET', 'bucket_input.txt', 'bucket_output.html',
+               "python3.8 /opt/my_flask_app/scripts/Bucket/script_bucket.py {input_path} {output_path} {log_file}"),
+    'keyword': ('KEYWORD', 'keyword_input.json', 'keywordsearch.html',
+                "python3.8 /opt/my_flask_app/scripts/KeyWord/script_keyword.py {input_folder} {output_folder} {log_file} {session_id}"),
+}
+# Input stage (INPUT_CCR, ...) -> script option
+INPUT_STAGES = {f"INPUT_{name}": option for option, (name, _, _, _) in SCRIPTS.items()}
+# The stages that build inputs; ZIP runs after the scripts and does not count
+PIPELINE_STAGES = (STAGE_EXTRACT, STAGE_INDEX) + tuple(INPUT_STAGES)
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline stage cannot run for a session."""
+
+
+class InputSkipped(PipelineError):
+    """Raised by an input stage whose script has nothing to read; reported as a notice, not an error."""
+
+
+def extraction_options():
+    """Extraction settings from the app config, as keyword arguments for ensure_extracted."""
+    return {
+        'max_depth': current_app.config.get('EXTRACT_MAX_DEPTH', 10),
+        'owner': current_app.config.get('EXTRACT_OWNER'),
+        'workers': current_app.config.get('EXTRACT_WORKERS', 1),
+        'in_place': current_app.config.get('ZERO_EXTRACTION', False),
+    }
+
+
+def set_progress(session, status=None, progress=None, **counts):
+    """Record the pipeline's status and progress text on the session and stream them to the dashboard."""
+    if status is not None:
+        session.pipeline_status = status
+    session.pipeline_progress = progress[:255] if progress else None
+    db.session.commit()
+    if status is not None:
+        publish(channel_path(session.transaction_folder), 'stage', status=status, message=progress)
+    else:
+        publish(channel_path(session.transaction_folder), 'progress', script='PIPELINE', message=progress, **counts)
+
+
+def add_notices(session, notices):
+    if not notices:
+        return
+    session.pipeline_notices = json.dumps(json.loads(session.pipeline_notices or '[]') + [list(n) for n in notices])
+    db.session.commit()
+
+
+def stages_active(session_id):
+    """Return True while any of a session's pipeline stages is queued or running."""
+    return ScriptJob.query.filter(
+        ScriptJob.session_id == session_id,
+        ScriptJob.script.in_(PIPELINE_STAGES),
+        ScriptJob.status.in_(ACTIVE_STATUSES)
+    ).first() is not None
+
+
+def pipeline_state(session):
+    """Pipeline status, progress, error and notices of a session, for the dashboard."""
+    status, progress = session.pipeline_status, session.pipeline_progress
+    if status in PIPELINE_ACTIVE and not stages_active(session.session_id):
+        # Stages finish in any order, so the pipeline is settled here once none is left
+        status, progress = ('failed' if session.pipeline_error else 'ready'), None
+    return {
+        'status': status,
+        'progress': progress,
+        'error': session.pipeline_error,
+        'notices': json.loads(session.pipeline_notices or '[]'),
+    }
+
+
+def _session_lock(session, part=None):
+    # The lock finish_upload used to hold: identical uploads (and stages of one session) run one at a time.
+    # Stages that don't touch the same files pass a part of their own.
+    key = session.content_digest or session.session_id
+    return digest_lock(lock_dir(current_app.config['UPLOAD_FOLDER']), f"{key}.{part}" if part else key)
+
+
+def _stage(name, failure):
+    """Register a handler(job, session) as pipeline stage name; failures are recorded on the session."""
+    def register(func):
+        @functools.wraps(func)
+        def run(job):
+            session = SessionMetadata.query.filter_by(session_id=job.session_id).first()
+            if session is None:
+                raise PipelineError(f"Session {job.session_id} not found.")
+            try:
+                func(job, session)
+            except InputSkipped as e:
+                db.session.rollback()
+                logger.warning(f"{name} stage skipped for session {session.session_id}: {str(e)}")
+                add_notices(session, [(str(e), 'warning')])
+                raise
+            except Exception as e:
+                db.session.rollback()
+                message = str(e) if isinstance(e, (InputError, PipelineError)) else f"{failure}: {str(e)}"
+                logger.error(f"{name} stage failed for session {session.session_id}: {str(e)}")
+                session.pipeline_error = message
+                session.pipeline_progress = None
+                db.session.commit()
+                raise PipelineError(message)
+        stage_handlers[name] = run
+        return run
+    return register
+
+
+class ExtractionProgress:
+    """
+    on_header callback that reports the number of members read, at most every PROGRESS_INTERVAL
+    seconds, and passes each header to preflight (an app.preflight.Preflight) if given.
+    """
+
+    def __init__(self, session, preflight=None):
+        self.session = session
+        self.preflight = preflight
+        self.members = 0
+        self.reported = time.monotonic()
+
+    def __call__(self, member):
+        if self.preflight is not None:
+            self.preflight(member)
+        self.members += 1
+        now = time.monotonic()
+        if now - self.reported >= PROGRESS_INTERVAL:
+            self.reported = now
+            set_progress(self.session, progress=f"Extracting archive: {self.members} members read",
+                         members=self.members)
+
+
+@_stage(STAGE_EXTRACT, 'Failed to extract archive')
+def extract_stage(job, session):
+    script_options = job.command.split(',')
+    transaction_folder = session.transaction_folder
+    tar_path = find_session_archive(transaction_folder)
+    if not tar_path:
+        raise PipelineError('Uploaded archive not found.')
+    set_progress(session, 'extracting', 'Extracting archive')
+    # The upload request checked only the first header of a compressed bundle; the rest are checked here
+    with open(tar_path, 'rb') as f:
+        preflight = new_preflight(script_options, current_app.config['UPLOAD_FOLDER'],
+                                  current_app.config.get('PREFLIGHT_MAX_BYTES')) if is_compressed(f) else None
+    progress = ExtractionProgress(session, preflight)
+
+    with _session_lock(session):
+        source_folder = reuse_duplicate(session.content_digest, session.session_id, transaction_folder, tar_path)
+        if source_folder:
+            logger.info(f"Session {session.session_id} reuses extraction of identical upload in {source_folder}")
+        # Extract only the members the selected scripts will read (a no-op for streamed uploads)
+        try:
+            ensure_extracted(tar_path, transaction_folder, session.session_id, script_options,
+                             on_header=progress, **extraction_options())
+            if preflight is not None and preflight.members:
+                preflight.finish()
+        except PreflightError as e:
+            logger.warning(f"Rejected upload of session {session.session_id} during extraction: {str(e)}")
+            raise PipelineError(f"Upload rejected: {str(e)}")
+
+    for folder in ('var/log/oslog/memlogs', 'config'):
+        path = os.path.join(transaction_folder, folder)
+        if os.path.exists(path):
+            logger.debug(f"Contents of {folder} folder ({path}): {os.listdir(path)}")
+        else:
+            logger.debug(f"{folder} folder does not exist at {path}")
+
+
+@_stage(STAGE_INDEX, 'Failed to index tech-support.log')
+def index_stage(job, session):
+    set_progress(session, 'indexing', 'Indexing tech-support.log')
+    with _session_lock(session, 'index'):
+        index_session(session.transaction_folder)
+
+
+def input_stage(job, session):
+    """Build one script's input; job.command is the script option."""
+    option = job.command
+    name = SCRIPTS[option][0]
+    transaction_folder = session.transaction_folder
+    set_progress(session, 'preparing', f"Building {name} input")
+
+    with _session_lock(session, f"input.{option}"):
+        # An input linked from an identical upload is kept
+        notices = prepare_inputs(transaction_folder, missing_inputs(transaction_folder, [option]),
+                                 progress=lambda message: set_progress(session, progress=message))
+    add_notices(session, notices)
+    if missing_inputs(transaction_folder, [option]):
+        raise InputSkipped(f"{name} script skipped due to missing input file.")
+
+
+for _input_stage in INPUT_STAGES:
+    _stage(_input_stage, 'Failed to prepare inputs')(input_stage)
+
+
+def output_zip_path(session):
+    return os.path.join(session.transaction_folder, f"output_{session.session_id}.zip")
+
+
+def _zip_current(zip_path, output_folder):
+    """Return True if zip_path exists and is newer than everything in output_folder."""
+    try:
+        built = os.path.getmtime(zip_path)
+    except OSError:
+        return False
+    for root, dirs, files in os.walk(output_folder):
+        for name in [root] + [os.path.join(root, f) for f in files]:
+            if os.path.getmtime(name) >= built:
+                return False
+    return True
+
+
+def build_output_zip(session):
+    """Zip the session's output folder, unless the last archive is still current. Returns the archive's path."""
+    zip_path = output_zip_path(session)
+    output_folder = os.path.join(session.transaction_folder, 'output')
+    if _zip_current(zip_path, output_folder):
+        logger.debug(f"Output archive {zip_path} is current")
+        return zip_path
+    # Built under a temporary name so a download never sees a half-written archive
+    fd, temp_path = tempfile.mkstemp(prefix='.output_', suffix='.zip', dir=session.transaction_folder)
+    os.close(fd)
+    try:
+        shutil.make_archive(temp_path[:-len('.zip')], 'zip', output_folder)
+        os.replace(temp_path, zip_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.debug(f"Created zip archive of {output_folder} at {zip_path}")
+    return zip_path
+
+
+def zip_stage(job):
+    """Post-processing: build the download archive once the session's scripts have finished."""
+    session = SessionMetadata.query.filter_by(session_id=job.session_id).first()
+    if session is None:
+        raise PipelineError(f"Session {job.session_id} not found.")
+    build_output_zip(session)
+
+
+stage_handlers[STAGE_ZIP] = zip_stage
+
+
+def enqueue_script(session, option, after=()):
+    """Queue the run of one selected script, after the jobs that build its input. Returns its ScriptJob."""
+    transaction_folder = session.transaction_folder
+    input_folder = os.path.join(transaction_folder, 'input')
+    output_folder = os.path.join(transaction_folder, 'output')
+    log_file = os.path.join(transaction_folder, 'log', f"{session.session_id}.log")
+    name, input_filename, output_filename, template = SCRIPTS[option]
+    input_path = os.path.join(input_folder, input_filename)
+    output_path = os.path.join(output_folder, output_filename)
+    command = template.format(input_path=input_path, output_path=output_path, log_file=log_file,
+                              input_folder=input_folder, output_folder=output_folder,
+                              session_id=session.session_id)
+    return enqueue_job(session.session_id, name, command, output_path, after=after, input_path=input_path)
+
+
+def enqueue_pipeline(session, script_options):
+    """
+    Queue the stages that build the inputs of the given scripts, each script's run after
+    its own input. Returns the run jobs.
+    """
+    transaction_folder = session.transaction_folder
+    session_id = session.session_id
+    runs = []
+    # One extraction per member group, tech-support.log's first: its reports are the quick ones
+    groups = {}
+    for option in SCRIPTS:
+        if option in script_options:
+            groups.setdefault(SCRIPT_MEMBER_GROUPS[option], []).append(option)
+    for group, options in groups.items():
+        ready = enqueue_job(session_id, STAGE_EXTRACT, ','.join(options), transaction_folder)
+        if group == 'tech_support':
+            ready = enqueue_job(session_id, STAGE_INDEX, ','.join(options), transaction_folder, after=[ready])
+        for option in options:
+            built = enqueue_job(session_id, f"INPUT_{SCRIPTS[option][0]}", option, transaction_folder, after=[ready])
+            runs.append(enqueue_script(session, option, after=[built]))
+    return runs
+
+
+def request_scripts(session, script_options):
+    """
+    Queue the selected scripts: right away for those whose input exists, behind the
+    stages that build it for the rest. Returns notices for scripts skipped now.
+    """
+    transaction_folder = session.transaction_folder
+    missing = missing_inputs(transaction_folder, script_options)
+    runs = [enqueue_script(session, option) for option in SCRIPTS if option in script_options and option not in missing]
+    notices = []
+    if missing and not find_session_archive(transaction_folder):
+        logger.warning(f"Uploaded archive not found in {transaction_folder}, cannot prepare inputs for {missing}")
+        for option in missing:
+            name = SCRIPTS[option][0]
+            logger.warning(f"{name} input file not found, skipping {name} script")
+            notices.append((f"{name} script skipped due to missing input file.", 'warning'))
+    elif missing:
+        if not stages_active(session.session_id):
+            logger.debug(f"Queueing pipeline for {missing} in session {session.session_id}")
+            session.pipeline_error = None
+            set_progress(session, 'queued', 'Waiting for a worker')
+        runs += enqueue_pipeline(session, missing)
+    if runs:
+        enqueue_job(session.session_id, STAGE_ZIP, ','.join(job.script for job in runs), output_zip_path(session),
+                    after=runs, needs_success=False)
+    return notices
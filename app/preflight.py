@@ -0,0 +1,132 @@
+# Location: /opt/my_flask_app/app/preflight.py
+"""
+Fail-fast checks on an uploaded bundle, from its tar headers alone.
+
+Before anything is extracted (and, for streamed uploads, while the body is
+still arriving) the member headers are checked: the archive must be a readable
+tar, the members the selected scripts need must be present, and the estimated
+extracted size must fit the configured budget and the free space on the upload
+volume. A bad bundle is rejected without writing its contents to disk.
+
+Compressed bundles are the exception: their headers can only be reached by
+decompressing everything before them, so an upload request only checks that
+one opens as a tar, and the rest of the checks run on the headers the EXTRACT
+stage reads anyway (see app.pipeline.extract_stage).
+"""
+import os
+import shutil
+import tarfile
+import logging
+
+from app.member_index import member_kind
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the compressed forms tarfile opens: gzip, bzip2, xz
+COMPRESSED_MAGIC = (b'\x1f\x8b', b'BZh', b'\xfd7zXZ\x00')
+
+# Members the scripts cannot do without, as (description, test on the member basename)
+REQUIRED_MEMBERS = {
+    'tech_support': ('tech-support.log', lambda name: name == 'tech-support.log'),
+    'configs': ('configs archive (configs.tar*)', lambda name: name.startswith('configs.tar')),
+}
+SCRIPT_REQUIREMENTS = {
+    'ccr': 'tech_support',
+    'chr': 'tech_support',
+    'bucket': 'tech_support',
+    'keyword': 'configs',
+}
+
+
+class PreflightError(Exception):
+    """Raised when an uploaded bundle is rejected by the preflight checks."""
+
+
+class Preflight:
+    """Accumulates member headers and rejects the bundle as soon as something is known to be wrong."""
+
+    def __init__(self, script_options, max_bytes=None, free_bytes=None):
+        self.required = {SCRIPT_REQUIREMENTS[s] for s in script_options if s in SCRIPT_REQUIREMENTS}
+        self.seen = set()
+        self.members = 0
+        self.estimated_bytes = 0
+        limits = [b for b in (max_bytes, free_bytes) if b]
+        self.limit = min(limits) if limits else None
+        self.free_bytes = free_bytes
+
+    def __call__(self, member):
+        """Check one tar header. Raises PreflightError."""
+        self.members += 1
+        if member_kind(member) == 'file':
+            self.estimated_bytes += member.size
+        name = os.path.basename(member.name.rstrip('/'))
+        for key, (_, matches) in REQUIRED_MEMBERS.items():
+            if key in self.required and matches(name):
+                self.seen.add(key)
+        if self.limit is not None and self.estimated_bytes > self.limit:
+            where = 'free space on the upload volume' if self.limit == self.free_bytes else 'upload size limit'
+            raise PreflightError(f"Bundle would extract to more than {self.limit // (1024 * 1024)} MB "
+                                 f"(the {where}).")
+
+    def finish(self):
+        """Check what can only be judged at the end of the archive. Raises PreflightError."""
+        missing = [REQUIRED_MEMBERS[key][0] for key in sorted(self.required - self.seen)]
+        if missing:
+            raise PreflightError(f"Bundle is missing {', '.join(missing)}.")
+        logger.debug(f"Preflight passed: {self.members} members, ~{self.estimated_bytes} bytes to extract")
+
+
+def new_preflight(script_options, upload_folder, max_bytes=None):
+    """A Preflight bounded by max_bytes and the free space under upload_folder."""
+    try:
+        free_bytes = shutil.disk_usage(upload_folder).free
+    except OSError:
+        free_bytes = None
+    return Preflight(script_options, max_bytes=max_bytes, free_bytes=free_bytes)
+
+
+def preflight_fileobj(fileobj, preflight):
+    """
+    Run preflight over the headers of a tar / tar.gz file object and rewind it.
+    Seekable plain tars are checked by seeking from header to header. Of a seekable
+    compressed archive only the first header is read; returns False in that case, and
+    the remaining checks are left to extraction. Returns True if all checks ran.
+    """
+    seekable = _seekable(fileobj)
+    compressed = seekable and is_compressed(fileobj)
+    deferred = False
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r:*' if seekable and not compressed else 'r|*') as tar:
+            for member in tar:
+                preflight(member)
+                if compressed:
+                    deferred = True
+                    break
+    except (tarfile.TarError, EOFError, OSError) as e:
+        logger.debug(f"Preflight could not read archive headers: {str(e)}")
+        raise PreflightError('Not a readable .tar or .tar.gz archive.')
+    finally:
+        if seekable:
+            fileobj.seek(0)
+    if deferred:
+        logger.debug("Preflight of the compressed bundle's remaining headers deferred to extraction")
+        return False
+    preflight.finish()
+    return True
+
+
+def is_compressed(fileobj):
+    """Whether a seekable file object holds a compressed archive. Leaves its position unchanged."""
+    position = fileobj.tell()
+    head = fileobj.read(6)
+    fileobj.seek(position)
+    return head.startswith(COMPRESSED_MAGIC)
+
+
+def _seekable(fileobj):
+    # SpooledTemporaryFile (werkzeug's upload spool) has no seekable() before Python 3.11
+    try:
+        fileobj.seek(fileobj.tell())
+        return True
+    except (AttributeError, OSError):
+        return False
@@ -0,0 +1,115 @@
+# Location: /opt/my_flask_app/app/progress.py
+"""
+Per-session progress channel behind the dashboard's live stream.
+
+Pipeline stages, the job workers and the analyzers (from their pool
+processes) append one-line JSON events to <transaction folder>/log/
+progress.jsonl, and the server-sent-events endpoint tails it:
+
+    {"type": "job", "script": "CCR", "status": "running", "id": ...}
+    {"type": "stage", "status": "extracting", "message": "Extracting archive", "id": ...}
+    {"type": "progress", "script": "CCR", "step": "matching", "lines": 120000, "rows": 310, "id": ...}
+
+Writers take an flock on the file, so events from several processes don't
+interleave. The file is a ring buffer: once it grows past PROGRESS_MAX_BYTES
+the writer keeps only its newest half. Event ids count up in the file itself:
+under the lock, a writer gives its event the id after the last one in the file,
+so ids from workers on different hosts stay in order whatever their clocks say.
+A reader (or a browser reconnecting with Last-Event-ID) asks for the events
+after the last one it saw rather than for a file offset.
+"""
+import os
+import json
+import time
+import fcntl
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FILENAME = 'progress.jsonl'
+PROGRESS_MAX_BYTES = 256 * 1024
+REPORT_INTERVAL = 0.5  # seconds between the progress events of one analyzer run
+TAIL_BYTES = 8192  # how much of the end of the channel a writer reads for the last event id
+
+
+def channel_path(transaction_folder):
+    return os.path.join(transaction_folder, 'log', PROGRESS_FILENAME)
+
+
+def publish(path, event_type, **fields):
+    """Append an event to the channel at path. Progress is best effort: errors are only logged."""
+    event = dict(fields, type=event_type, id=None)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            event['id'] = _next_id(f)
+            f.write(json.dumps(event).encode('utf-8') + b'\n')
+            f.flush()
+            if f.tell() > PROGRESS_MAX_BYTES:
+                f.seek(0)
+                lines = f.readlines()
+                f.truncate(0)
+                f.writelines(lines[len(lines) // 2:])
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug(f"Could not publish progress to {path}: {str(e)}")
+    return event['id']
+
+
+def _next_id(f):
+    """The id after the last event in the channel f, which the caller has locked."""
+    size = f.seek(0, os.SEEK_END)
+    for start in (max(0, size - TAIL_BYTES), 0):
+        f.seek(start)
+        lines = f.read().splitlines()
+        if start:
+            lines = lines[1:]  # the first may be the end of a line
+        for line in reversed(lines):
+            try:
+                return int(json.loads(line)['id']) + 1
+            except (ValueError, KeyError, TypeError):
+                continue  # a line cut short by a writer that died
+        if not start:
+            break
+    return 1
+
+
+def read_events(path, after=0):
+    """The events in the channel with an id above after, oldest first."""
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    events = []
+    for line in lines:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue  # cut short by a concurrent trim
+        if isinstance(event, dict) and event.get('id', 0) > after:
+            events.append(event)
+    return events
+
+
+def last_event_id(path):
+    events = read_events(path)
+    return events[-1]['id'] if events else 0
+
+
+class ProgressReporter:
+    """
+    What an analyzer's progress(**counts) hook is replaced with in the pool: publishes the
+    counts as a progress event of script, at most every REPORT_INTERVAL seconds.
+    """
+
+    def __init__(self, path, script):
+        self.path = path
+        self.script = script
+        self.reported = 0.0
+
+    def __call__(self, **counts):
+        now = time.monotonic()
+        if now - self.reported >= REPORT_INTERVAL:
+            self.reported = now
+            publish(self.path, 'progress', script=self.script, **counts)
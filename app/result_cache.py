@@ -0,0 +1,245 @@
+# Location: /opt/my_flask_app/app/result_cache.py
+"""
+Cache of script outputs keyed by what produced them.
+
+The key of a script run is the SHA-256 of the script name, a hash of the
+analyzer's code (every .py file in its folder), the digest of its input file
+and its command line with the session's paths taken out. A run whose key has
+been seen gets the stored output hardlinked in place of running, so the same
+input re-analysed by the same code is served at once, whichever session or
+upload it comes from. Entries live under RESULT_CACHE_FOLDER/<key[:2]>/<key>/;
+an entry's mtime is its last use, and the least recently used entries are
+removed once the cache grows past RESULT_CACHE_MAX_BYTES. Hits and misses are
+recorded on the ScriptJob rows (cache_hit) for the admin dashboard.
+"""
+import os
+import json
+import shlex
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import db
+from app.models import ScriptJob
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DIGEST_SUFFIX = '.sha256'  # Memo of an input's digest, next to the input
+ENTRY_FILENAME = 'entry.json'
+STATS_WINDOW = timedelta(days=7)  # runs the admin hit rates are taken over
+
+
+def file_digest(path):
+    """
+    SHA-256 of a file, memoised in path + DIGEST_SUFFIX together with the size and mtime
+    it was taken at. Returns None if the file cannot be read.
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    signature = f"{stat.st_size} {stat.st_mtime_ns}"
+    memo_path = path + DIGEST_SUFFIX
+    try:
+        with open(memo_path) as f:
+            memo_signature, _, digest = f.read().strip().rpartition(' ')
+        if memo_signature == signature:
+            return digest
+    except OSError:
+        pass
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+    except OSError:
+        return None
+    digest = sha256.hexdigest()
+    try:
+        with open(memo_path, 'w') as f:
+            f.write(f"{signature} {digest}\n")
+    except OSError as e:
+        logger.debug(f"Could not save digest of {path}: {str(e)}")
+    return digest
+
+
+def _link_or_copy(src_path, dst_path):
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copy2(src_path, dst_path)
+
+
+class ResultCache:
+    def __init__(self):
+        self.folder = None
+        self.max_bytes = 0
+        self.scripts = set()
+        self.code_hashes = {}  # script folder -> (file signatures, hash)
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        from app.analyzers import ANALYZER_SCRIPTS
+        self.folder = app.config.get('RESULT_CACHE_FOLDER')
+        self.max_bytes = app.config.get('RESULT_CACHE_MAX_BYTES', 0)
+        self.scripts = set(ANALYZER_SCRIPTS)
+
+    @property
+    def enabled(self):
+        return bool(self.folder and self.max_bytes)
+
+    def code_hash(self, script_folder):
+        """Hash of the .py files in an analyzer's folder, recomputed only when one of them changes."""
+        try:
+            names = sorted(name for name in os.listdir(script_folder) if name.endswith('.py'))
+            signatures = tuple((name, os.stat(os.path.join(script_folder, name)).st_mtime_ns) for name in names)
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.code_hashes.get(script_folder)
+        if cached and cached[0] == signatures:
+            return cached[1]
+        sha256 = hashlib.sha256()
+        for name in names:
+            sha256.update(name.encode())
+            with open(os.path.join(script_folder, name), 'rb') as f:
+                sha256.update(f.read())
+        code_hash = sha256.hexdigest()
+        with self.lock:
+            self.code_hashes[script_folder] = (signatures, code_hash)
+        return code_hash
+
+    def key(self, job):
+        """Cache key of a script job, or None if it cannot be cached (not an analyzer, or no input yet)."""
+        if not self.enabled or job.script not in self.scripts or not job.input_path:
+            return None
+        try:
+            argv = shlex.split(job.command)
+        except ValueError:
+            return None
+        if len(argv) < 2:
+            return None
+        code_hash = self.code_hash(os.path.dirname(argv[1]))
+        input_digest = file_digest(job.input_path)
+        if code_hash is None or input_digest is None:
+            return None
+        # The command line minus the session's folder and id, so identical runs of other sessions match
+        transaction_folder = os.path.dirname(os.path.dirname(job.output_path))
+        options = job.command.replace(transaction_folder, '{folder}').replace(job.session_id, '{session}')
+        key = hashlib.sha256()
+        for part in (job.script, code_hash, input_digest, options):
+            key.update(part.encode())
+            key.update(b'\0')
+        return key.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.folder, key[:2], key)
+
+    def fetch(self, key, output_path):
+        """Link the cached output for key to output_path. Returns True on a hit."""
+        entry_dir = self._entry_dir(key)
+        cached_path = os.path.join(entry_dir, os.path.basename(output_path))
+        if not os.path.isfile(cached_path):
+            return False
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            temp_path = output_path + '.cache'
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            _link_or_copy(cached_path, temp_path)
+            os.replace(temp_path, output_path)
+            os.utime(entry_dir)
+        except OSError as e:
+            # Evicted while we were linking it
+            logger.debug(f"Result cache entry {key} unusable: {str(e)}")
+            return False
+        logger.info(f"Result cache hit {key[:12]} for {output_path}")
+        return True
+
+    def store(self, key, output_path, script):
+        """Keep output_path as the result for key, then trim the cache to its budget."""
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir) or not os.path.isfile(output_path):
+            return
+        parent = os.path.dirname(entry_dir)
+        temp_dir = None
+        try:
+            os.makedirs(parent, exist_ok=True)
+            temp_dir = tempfile.mkdtemp(prefix='.entry-', dir=parent)
+            _link_or_copy(output_path, os.path.join(temp_dir, os.path.basename(output_path)))
+            with open(os.path.join(temp_dir, ENTRY_FILENAME), 'w') as f:
+                json.dump({'script': script, 'size': os.path.getsize(output_path),
+                           'created': datetime.utcnow().isoformat()}, f)
+            os.rename(temp_dir, entry_dir)
+        except OSError as e:
+            # Another worker stored the same key first, or the cache folder is unusable
+            logger.debug(f"Result cache entry {key} not stored: {str(e)}")
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            return
+        logger.debug(f"Stored {output_path} in the result cache as {key[:12]}")
+        self.evict()
+
+    def entries(self):
+        """(last used, size, entry folder) of every entry."""
+        entries = []
+        if not self.folder or not os.path.isdir(self.folder):
+            return entries
+        for prefix in os.listdir(self.folder):
+            prefix_dir = os.path.join(self.folder, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, name)
+                if name.startswith('.'):
+                    continue
+                try:
+                    with open(os.path.join(entry_dir, ENTRY_FILENAME)) as f:
+                        size = json.load(f)['size']
+                    entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits RESULT_CACHE_MAX_BYTES."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            logger.debug(f"Evicted {entry_dir} from the result cache")
+
+    def stats(self):
+        """Cache size and per-script hit rates over the last STATS_WINDOW, for the admin dashboard."""
+        entries = self.entries()
+        rows = db.session.query(ScriptJob.script, ScriptJob.cache_hit, func.count(ScriptJob.id)).filter(
+            ScriptJob.cache_hit.isnot(None),
+            ScriptJob.finished_at >= datetime.utcnow() - STATS_WINDOW
+        ).group_by(ScriptJob.script, ScriptJob.cache_hit).all()
+        scripts = {}
+        for script, hit, count in rows:
+            entry = scripts.setdefault(script, {'script': script, 'hits': 0, 'lookups': 0})
+            entry['lookups'] += count
+            if hit:
+                entry['hits'] += count
+        for entry in scripts.values():
+            entry['hit_rate'] = entry['hits'] / entry['lookups']
+        return {
+            'enabled': self.enabled,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'scripts': [scripts[script] for script in sorted(scripts)],
+        }
+
+
+result_cache = ResultCache()
@@ -1,12 +1,17 @@
 # Location: /opt/my_flask_app/app/routes/admin_routes.py
 import logging
 import traceback
-from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app
+from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, jsonify
 from flask_login import login_user, login_required, current_user
 from flask_mail import Message
 from werkzeug.security import check_password_hash
-from app.models import User, SessionMetadata
+from app.models import User, SessionMetadata, ScriptJob
 from app import db, mail
+from app.jobs import ACTIVE_STATUSES, job_queue, cancel_job
+from app.estimates import usage_stats
+from app.scheduling import SchedulerPolicy, queue_stats
+from app.result_cache import result_cache
+from app.workers import worker_stats
 from datetime import datetime, timedelta
 from sqlalchemy import func
 
@@ -98,6 +103,21 @@ def admin_dashboard():
             func.count(SessionMetadata.id)
         ).group_by(func.year(SessionMetadata.upload_timestamp)).all()
         logger.debug(f"Sessions per year: {sessions_per_year}")
+
+        # Job queue: depth and waits per user, and the sessions with jobs left to run
+        user_queues = queue_stats(SchedulerPolicy.from_config(current_app.config))
+        active_sessions = SessionMetadata.query.filter(SessionMetadata.session_id.in_(
+            db.session.query(ScriptJob.session_id).filter(ScriptJob.status.in_(ACTIVE_STATUSES))
+        )).order_by(SessionMetadata.upload_timestamp).all()
+
+        # Result cache: size and hit rates per script
+        cache_stats = result_cache.stats()
+
+        # CPU time and peak memory per script, for sizing the hosts
+        script_usage = usage_stats()
+
+        # Processes running jobs, on this host and the worker hosts
+        job_workers = worker_stats(current_app.config['JOB_LEASE_SECONDS'])
         
         return render_template(
             'admin_dashboard.html',
@@ -108,7 +128,12 @@ def admin_dashboard():
             sessions_per_day=sessions_per_day,
             sessions_per_week=sessions_per_week,
             sessions_per_month=sessions_per_month,
-            sessions_per_year=sessions_per_year
+            sessions_per_year=sessions_per_year,
+            user_queues=user_queues,
+            active_sessions=active_sessions,
+            cache_stats=cache_stats,
+            script_usage=script_usage,
+            job_workers=job_workers
         )
     except Exception as e:
         logger.error(f"Error in admin_dashboard: {str(e)}")
@@ -182,6 +207,54 @@ def reject_user(user_id):
 
     return redirect(url_for('admin_bp.admin_dashboard'))
 
+@admin_bp.route('/queue')
+@login_required
+def queue():
+    """Job queue depth and waits per user, as JSON."""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admins only.'}), 403
+    return jsonify({'users': queue_stats(SchedulerPolicy.from_config(current_app.config))})
+
+@admin_bp.route('/cache')
+@login_required
+def cache():
+    """Result cache size and hit rates per script, as JSON."""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admins only.'}), 403
+    return jsonify(result_cache.stats())
+
+@admin_bp.route('/escalate/<session_id>', methods=['POST'])
+@login_required
+def escalate(session_id):
+    if current_user.role != 'admin':
+        flash('Access denied: Admins only.')
+        return redirect(url_for('auth_bp.login'))
+
+    session = SessionMetadata.query.filter_by(session_id=session_id).first_or_404()
+    session.priority = not session.priority
+    db.session.commit()
+    logger.info(f"Session {session_id} ({session.username}) {'escalated' if session.priority else 'de-escalated'} by {current_user.email}")
+    flash(f"Session {session_id} {'moved to' if session.priority else 'removed from'} the priority lane.")
+    job_queue.notify()
+    return redirect(url_for('admin_bp.admin_dashboard'))
+
+@admin_bp.route('/cancel/<session_id>', methods=['POST'])
+@login_required
+def cancel(session_id):
+    """Cancel a session's queued and running jobs, or only the one whose job_id is in the form."""
+    if current_user.role != 'admin':
+        flash('Access denied: Admins only.')
+        return redirect(url_for('auth_bp.login'))
+
+    query = ScriptJob.query.filter(ScriptJob.session_id == session_id, ScriptJob.status.in_(ACTIVE_STATUSES))
+    job_id = request.form.get('job_id', type=int)
+    if job_id is not None:
+        query = query.filter(ScriptJob.id == job_id)
+    cancelled = [job.script for job in query.all() if cancel_job(job, current_user.email)]
+    logger.info(f"Admin {current_user.email} cancelled {cancelled} in session {session_id}")
+    flash(f"Cancelled {', '.join(cancelled)} in session {session_id}." if cancelled else 'No job left to cancel.')
+    return redirect(url_for('admin_bp.admin_dashboard'))
+
 @admin_bp.route('/logout')
 @login_required
 def logout():
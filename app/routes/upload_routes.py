@@ -0,0 +1,137 @@
+# Location: /opt/my_flask_app/app/routes/upload_routes.py
+import os
+import glob
+import uuid
+import shutil
+import logging
+from flask import Blueprint, request, jsonify, redirect, url_for, current_app
+from flask_login import login_required, current_user
+from app.models import SessionMetadata
+from app.chunked_upload import (ChunkError, create_upload, write_chunk, load_manifest, upload_status,
+                                finalize_upload)
+from app.preflight import PreflightError, SCRIPT_REQUIREMENTS, preflight_fileobj
+from app.routes.employee_routes import new_transaction, finish_upload, upload_preflight, discard_transaction
+
+upload_bp = Blueprint('upload_bp', __name__)
+logger = logging.getLogger('app.routes.upload_routes')
+
+def find_upload_folder(upload_id):
+    """Transaction folder of one of the current user's chunked uploads, or None."""
+    try:
+        uuid.UUID(upload_id)
+    except ValueError:
+        return None
+    username = current_user.email.split('@')[0]
+    for folder in glob.glob(os.path.join(current_app.config['UPLOAD_FOLDER'], username, '*', upload_id)):
+        manifest = load_manifest(folder)
+        if manifest and manifest['username'] == current_user.email:
+            return folder
+    return None
+
+def upload_size_error(size):
+    """Why an upload of size bytes cannot be taken (PREFLIGHT_MAX_BYTES, free upload space), or None."""
+    max_bytes = current_app.config.get('PREFLIGHT_MAX_BYTES')
+    if max_bytes and size > max_bytes:
+        return f"Upload exceeds the {max_bytes // (1024 * 1024)} MB upload size limit."
+    try:
+        free_bytes = shutil.disk_usage(current_app.config['UPLOAD_FOLDER']).free
+    except OSError:
+        return None
+    if size > free_bytes:
+        return f"Upload exceeds the {free_bytes // (1024 * 1024)} MB of free space on the upload volume."
+    return None
+
+@upload_bp.route('/sessions', methods=['POST'])
+@login_required
+def create_session():
+    """Start a resumable upload. JSON body: filename, size, case_number, script_option (list)."""
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    case_number = data.get('case_number', 'default_case')
+    script_options = data.get('script_option', [])
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        size = 0
+
+    if not (filename.endswith('.tar') or filename.endswith('.tar.gz')):
+        return jsonify({'error': 'Please upload a .tar or .tar.gz file.'}), 400
+    if size <= 0:
+        return jsonify({'error': 'Upload size must be a positive number of bytes.'}), 400
+    if not isinstance(script_options, list) or not all(
+            isinstance(option, str) and option in SCRIPT_REQUIREMENTS for option in script_options):
+        return jsonify({'error': f"script_option must be a list of: {', '.join(SCRIPT_REQUIREMENTS)}."}), 400
+    size_error = upload_size_error(size)
+    if size_error:
+        logger.warning(f"Rejected chunked upload {filename} of {size} bytes: {size_error}")
+        return jsonify({'error': size_error}), 413
+
+    session_id, transaction_folder = new_transaction(case_number)
+    try:
+        manifest = create_upload(transaction_folder, session_id, filename, size, current_user.email, case_number,
+                                 script_options)
+    except OSError as e:
+        logger.error(f"Could not start chunked upload {session_id}: {str(e)}")
+        discard_transaction(transaction_folder)
+        return jsonify({'error': 'Could not start the upload.'}), 500
+    return jsonify(upload_status(manifest)), 201
+
+@upload_bp.route('/sessions/<upload_id>', methods=['GET'])
+@login_required
+def session_status(upload_id):
+    """Received and missing byte ranges, for resuming an interrupted upload."""
+    transaction_folder = find_upload_folder(upload_id)
+    if not transaction_folder:
+        return jsonify({'error': 'Upload not found.'}), 404
+    return jsonify(upload_status(load_manifest(transaction_folder)))
+
+@upload_bp.route('/sessions/<upload_id>', methods=['PUT'])
+@login_required
+def put_chunk(upload_id):
+    """Write one chunk. Query parameter offset; header X-Chunk-SHA256 with the chunk's hex digest."""
+    transaction_folder = find_upload_folder(upload_id)
+    if not transaction_folder:
+        return jsonify({'error': 'Upload not found.'}), 404
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'A numeric offset query parameter is required.'}), 400
+
+    max_chunk = current_app.config.get('UPLOAD_CHUNK_MAX_BYTES', 64 * 1024 * 1024)
+    if request.content_length is not None and request.content_length > max_chunk:
+        return jsonify({'error': f"Chunks may not exceed {max_chunk} bytes."}), 413
+    try:
+        manifest = write_chunk(transaction_folder, offset, request.get_data(cache=False),
+                               request.headers.get('X-Chunk-SHA256'), max_chunk)
+    except ChunkError as e:
+        logger.warning(f"Rejected chunk at offset {offset} for upload {upload_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 409
+    return jsonify(upload_status(manifest))
+
+@upload_bp.route('/sessions/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_session(upload_id):
+    """Verify the upload is complete and hand it to extraction and input generation."""
+    transaction_folder = find_upload_folder(upload_id)
+    if not transaction_folder:
+        return jsonify({'error': 'Upload not found.'}), 404
+    manifest = load_manifest(transaction_folder)
+    if manifest['finalized'] and SessionMetadata.query.filter_by(session_id=upload_id).first():
+        # A retried finalize after the first one went through
+        return redirect(url_for('employee_bp.process_scripts', session_id=upload_id,
+                                script_options=','.join(manifest['script_options'])))
+    try:
+        manifest, tar_path, content_digest = finalize_upload(transaction_folder)
+    except ChunkError as e:
+        return jsonify(dict(upload_status(manifest), error=str(e))), 409
+
+    try:
+        with open(tar_path, 'rb') as f:
+            preflight_fileobj(f, upload_preflight(manifest['script_options']))
+    except PreflightError as e:
+        logger.warning(f"Rejected chunked upload {upload_id}: {str(e)}")
+        discard_transaction(transaction_folder)
+        return jsonify({'error': f"Upload rejected: {str(e)}"}), 422
+
+    return finish_upload(upload_id, manifest['case_number'], transaction_folder, content_digest,
+                         manifest['script_options'])
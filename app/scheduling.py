@@ -0,0 +1,123 @@
+# Location: /opt/my_flask_app/app/scheduling.py
+"""
+Which ready job a free worker takes next.
+
+Jobs of sessions an admin has escalated form a priority lane: they go before
+everyone else's, are not held back by the per-user cap and don't count
+towards it. The rest are shared between users: a user with
+JOB_USER_MAX_RUNNING jobs running gets no more, and among the others the one
+with the fewest running jobs per unit of weight (JOB_USER_WEIGHTS) is served.
+Within a user (or the lane) the shortest predicted job goes first, with aging
+(see app.estimates). queue_stats reports depth and waits per user for tuning
+the weights.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import db
+from app.models import ScriptJob, SessionMetadata
+from app.estimates import priority
+
+logger = logging.getLogger(__name__)
+
+STATS_WINDOW = timedelta(hours=1)  # started jobs the mean wait is taken over
+
+
+class SchedulerPolicy:
+    def __init__(self, max_running=0, weights=None, aging_rate=1.0):
+        self.max_running = max_running
+        self.weights = weights or {}
+        self.aging_rate = aging_rate
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('JOB_USER_MAX_RUNNING', 0), config.get('JOB_USER_WEIGHTS', {}),
+                   config.get('JOB_AGING_RATE', 1.0))
+
+    def weight(self, username):
+        return max(float(self.weights.get(username, 1.0)), 0.01)
+
+    def capped(self, username, running):
+        return bool(self.max_running) and running >= self.max_running
+
+
+def job_owners(jobs):
+    """session_id -> (username, escalated) for the sessions of the given jobs."""
+    session_ids = {job.session_id for job in jobs}
+    if not session_ids:
+        return {}
+    rows = db.session.query(SessionMetadata.session_id, SessionMetadata.username, SessionMetadata.priority).filter(
+        SessionMetadata.session_id.in_(session_ids)).all()
+    return {session_id: (username, bool(escalated)) for session_id, username, escalated in rows}
+
+
+def running_per_user():
+    """Running jobs per user, not counting the priority lane's."""
+    rows = db.session.query(SessionMetadata.username, func.count(ScriptJob.id)).join(
+        ScriptJob, ScriptJob.session_id == SessionMetadata.session_id
+    ).filter(ScriptJob.status == 'running', SessionMetadata.priority.is_(False)).group_by(SessionMetadata.username).all()
+    return dict(rows)
+
+
+def pick_job(ready, policy, now, stages=()):
+    """Return the ready job to run next under policy, or None if every user with ready jobs is at the cap."""
+    owners = job_owners(ready)
+    key = lambda job: priority(job, now, policy.aging_rate, stages)
+    lane = [job for job in ready if owners.get(job.session_id, (None, False))[1]]
+    if lane:
+        return min(lane, key=key)
+
+    running = running_per_user()
+    best = {}  # username -> its best ready job
+    for job in ready:
+        username = owners.get(job.session_id, (None, False))[0]
+        if policy.capped(username, running.get(username, 0)):
+            continue
+        if username not in best or key(job) < key(best[username]):
+            best[username] = job
+    if not best:
+        return None
+    username = min(best, key=lambda u: (running.get(u, 0) / policy.weight(u), key(best[u])))
+    return best[username]
+
+
+def queue_stats(policy):
+    """
+    Per-user queue depth and waits, sorted by username: running, queued and ready job counts,
+    the longest current wait of a ready job and the mean wait of jobs started in the last
+    STATS_WINDOW (seconds from ready to started), plus the user's weight.
+    """
+    now = datetime.utcnow()
+    stats = {}
+
+    def user(username):
+        return stats.setdefault(username, {'username': username, 'weight': policy.weight(username),
+                                           'running': 0, 'queued': 0, 'ready': 0,
+                                           'oldest_wait': None, 'mean_wait': None, 'escalated': 0})
+
+    rows = db.session.query(ScriptJob.status, ScriptJob.ready_at, SessionMetadata.username,
+                            SessionMetadata.priority).join(
+        SessionMetadata, SessionMetadata.session_id == ScriptJob.session_id
+    ).filter(ScriptJob.status.in_(('queued', 'running'))).all()
+    for status, ready_at, username, escalated in rows:
+        entry = user(username)
+        entry[status] += 1
+        if escalated:
+            entry['escalated'] += 1
+        if status == 'queued' and ready_at is not None:
+            entry['ready'] += 1
+            wait = (now - ready_at).total_seconds()
+            entry['oldest_wait'] = max(entry['oldest_wait'] or 0.0, wait)
+
+    waits = db.session.query(SessionMetadata.username, ScriptJob.ready_at, ScriptJob.started_at).join(
+        SessionMetadata, SessionMetadata.session_id == ScriptJob.session_id
+    ).filter(ScriptJob.started_at >= now - STATS_WINDOW, ScriptJob.ready_at.isnot(None)).all()
+    totals = {}
+    for username, ready_at, started_at in waits:
+        total, count = totals.get(username, (0.0, 0))
+        totals[username] = (total + max(0.0, (started_at - ready_at).total_seconds()), count + 1)
+    for username, (total, count) in totals.items():
+        user(username)['mean_wait'] = total / count
+    return [stats[username] for username in sorted(stats)]
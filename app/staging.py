@@ -0,0 +1,91 @@
+# Location: /opt/my_flask_app/app/staging.py
+"""
+Byte-level staging of script inputs.
+
+Inputs that are verbatim copies (or byte ranges) of tech-support.log are
+produced without decoding: a whole-file copy is a hardlink, else a reflink,
+else an in-kernel os.copy_file_range; a range is a copy_file_range from the
+extracted log, or from the uploaded .tar at the member's offset when the log is
+read in place. Only a gzipped in-place member has to be streamed through
+Python, still as bytes.
+"""
+import os
+import fcntl
+import logging
+
+logger = logging.getLogger(__name__)
+
+FICLONE = 0x40049409  # linux/fs.h
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def source_location(source):
+    """(file descriptor, base offset) of a member file object's bytes on disk, or None if it has none."""
+    raw = getattr(source, 'raw', source)
+    if hasattr(raw, 'disk_location'):
+        return raw.disk_location()
+    try:
+        return raw.fileno(), 0
+    except (AttributeError, OSError):
+        return None
+
+
+def copy_range(source, start, length, out):
+    """Append length bytes of source starting at start to the binary file out."""
+    location = source_location(source)
+    if location is not None:
+        fd, base = location
+        out.flush()
+        offset = base + start
+        remaining = length
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(fd, out.fileno(), min(remaining, COPY_CHUNK_SIZE), offset)
+                if copied == 0:
+                    break
+                offset += copied
+                remaining -= copied
+            if remaining == 0:
+                return
+        except (AttributeError, OSError) as e:
+            # Python < 3.8, old kernels or filesystems that refuse cross-file copies
+            logger.debug(f"copy_file_range unavailable ({str(e)}), copying through user space")
+        start, length = offset - base, remaining
+    source.seek(start)
+    while length > 0:
+        chunk = source.read(min(length, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise EOFError(f"Source ended {length} bytes early")
+        out.write(chunk)
+        length -= len(chunk)
+
+
+def _reflink(src_path, dst_path):
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def stage_copy(source, dst_path):
+    """
+    Make dst_path a byte-identical copy of the member behind source. Returns the
+    method used: 'link', 'reflink', 'copy_file_range' or 'stream'.
+    """
+    if os.path.lexists(dst_path):
+        os.unlink(dst_path)
+    name = getattr(source, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        try:
+            os.link(name, dst_path)
+            return 'link'
+        except OSError as e:
+            logger.debug(f"Cannot hardlink {name} to {dst_path}: {str(e)}")
+        try:
+            _reflink(name, dst_path)
+            return 'reflink'
+        except OSError:
+            pass
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    with open(dst_path, 'wb') as out:
+        copy_range(source, 0, size, out)
+    return 'copy_file_range' if source_location(source) is not None else 'stream'
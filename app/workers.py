@@ -0,0 +1,106 @@
+# Location: /opt/my_flask_app/app/workers.py
+"""
+Registry of the processes that run script jobs.
+
+Any host that mounts UPLOAD_FOLDER at the same path and reaches the database
+can run jobs: the web process (JOB_WEB_WORKERS) and any number of worker.py
+daemons. Each registers a JobWorker row named host:pid and refreshes its
+heartbeat every JOB_HEARTBEAT_INTERVAL seconds; a job it claims carries its
+name. A worker whose heartbeat is older than JOB_LEASE_SECONDS is dead, and
+so is one on this host whose process has exited (a restarted web process need
+not wait for its predecessor's lease); its running jobs are reclaimed by
+whichever worker notices (see app.jobs.reclaim_jobs).
+"""
+import os
+import socket
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import db
+from app.models import JobWorker, ScriptJob
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    """This process's name in the registry. Taken afresh each time, as forked processes get new pids."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def register(name, threads):
+    now = datetime.utcnow()
+    db.session.merge(JobWorker(id=name, host=socket.gethostname(), pid=os.getpid(), threads=threads,
+                               started_at=now, heartbeat_at=now))
+    db.session.commit()
+    logger.info(f"Registered job worker {name} with {threads} threads")
+
+
+def heartbeat(name, threads):
+    """Renew name's lease. A worker that was given up for dead registers again; its old jobs are gone."""
+    if not JobWorker.query.filter_by(id=name).update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False):
+        logger.warning(f"Job worker {name} had been given up for dead")
+        register(name, threads)
+    db.session.commit()
+
+
+def deregister(name):
+    JobWorker.query.filter_by(id=name).delete(synchronize_session=False)
+    db.session.commit()
+    logger.info(f"Deregistered job worker {name}")
+
+
+def lease_cutoff(lease_seconds):
+    """Heartbeats older than this are from dead workers."""
+    return datetime.utcnow() - timedelta(seconds=lease_seconds)
+
+
+def live_workers(lease_seconds):
+    """Query of the names of the workers whose lease is current."""
+    return db.session.query(JobWorker.id).filter(JobWorker.heartbeat_at >= lease_cutoff(lease_seconds))
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # alive, under another user
+    return True
+
+
+def gone(name, live, restarting=None):
+    """
+    Whether the worker called name is dead: not among the live names, or a process of this host
+    that has exited. restarting is this process's own name, before it registers, for jobs an
+    earlier process with the same pid left behind.
+    """
+    if name is None or name not in live or name == restarting:
+        return True
+    host, _, pid = name.rpartition(':')
+    return host == socket.gethostname() and pid.isdigit() and not _process_alive(int(pid))
+
+
+def capacity(lease_seconds, default):
+    """Job threads across the live workers, or default if none is registered (yet)."""
+    threads = db.session.query(func.sum(JobWorker.threads)).filter(
+        JobWorker.heartbeat_at >= lease_cutoff(lease_seconds)).scalar()
+    return int(threads) if threads else default
+
+
+def remove_dead(lease_seconds):
+    """Drop dead workers from the registry once their jobs have been reclaimed. The caller commits."""
+    JobWorker.query.filter(JobWorker.heartbeat_at < lease_cutoff(lease_seconds)).delete(synchronize_session=False)
+
+
+def worker_stats(lease_seconds):
+    """Every registered worker with its running jobs and whether its lease is current, for the admin dashboard."""
+    cutoff = lease_cutoff(lease_seconds)
+    running = dict(db.session.query(ScriptJob.worker, func.count(ScriptJob.id)).filter(
+        ScriptJob.status == 'running').group_by(ScriptJob.worker).all())
+    return [{'name': worker.id, 'host': worker.host, 'pid': worker.pid, 'threads': worker.threads,
+             'running': running.get(worker.id, 0), 'started_at': worker.started_at,
+             'heartbeat_at': worker.heartbeat_at, 'alive': worker.heartbeat_at >= cutoff}
+            for worker in JobWorker.query.order_by(JobWorker.host, JobWorker.pid).all()]
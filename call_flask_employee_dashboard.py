@@ -7,6 +7,9 @@ and selecting all 4 scripts (CCR, CHR, Bucket, Keyword).
 
 import requests
 import os
+import json
+import time
+import hashlib
 import logging
 import sys
 
@@ -84,13 +87,130 @@ def call_employee_dashboard(tar_path, case_number="123", url="http://127.0.0.1:5
         print(f"Error: Request failed - {str(e)}")
         sys.exit(1)
 
+def stream_employee_upload(tar_path, case_number="123", url="http://127.0.0.1:5000/employee/ingest"):
+    """
+    Upload logs.tar as a raw request body to /employee/ingest, which extracts it while it arrives.
+
+    Args:
+        tar_path (str): Path to logs.tar or logs.tar.gz file.
+        case_number (str): Case number for the request (default: "123").
+        url (str): Flask app URL (default: local development server).
+    """
+    if not os.path.exists(tar_path):
+        logger.error("logs.tar not found at %s", tar_path)
+        print("Error: logs.tar not found.")
+        sys.exit(1)
+
+    params = {
+        "filename": os.path.basename(tar_path),
+        "case_number": case_number,
+        "script_option": ["ccr", "chr", "bucket", "keyword"]  # All scripts selected
+    }
+    session = requests.Session()
+    try:
+        with open(tar_path, "rb") as f:
+            # requests streams file objects instead of loading them into memory
+            response = session.post(url, params=params, data=f,
+                                    headers={"Content-Type": "application/octet-stream"})
+        if response.status_code == 200:
+            logger.info("Streaming upload to %s successful", url)
+            print("Request successful. Check Flask logs or transaction folder for outputs.")
+        else:
+            logger.error("Request failed with status %d: %s", response.status_code, response.text)
+            print(f"Error: Request failed with status {response.status_code}. Check logs.")
+    except requests.RequestException as e:
+        logger.error("Request exception: %s", str(e))
+        print(f"Error: Request failed - {str(e)}")
+        sys.exit(1)
+
+def chunked_employee_upload(tar_path, case_number="123", base_url="http://127.0.0.1:5000/upload",
+                            chunk_size=16 * 1024 * 1024, retries=5):
+    """
+    Upload logs.tar through the resumable chunked upload API.
+
+    The upload id is kept in <tar_path>.upload so a rerun after a dropped
+    connection resumes with the byte ranges the server is still missing.
+
+    Args:
+        tar_path (str): Path to logs.tar or logs.tar.gz file.
+        case_number (str): Case number for the request (default: "123").
+        base_url (str): Upload API URL (default: local development server).
+        chunk_size (int): Bytes per PUT request.
+        retries (int): Attempts per chunk before giving up.
+    """
+    if not os.path.exists(tar_path):
+        logger.error("logs.tar not found at %s", tar_path)
+        print("Error: logs.tar not found.")
+        sys.exit(1)
+
+    session = requests.Session()
+    state_path = tar_path + ".upload"
+    status = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            upload_id = json.load(f)["upload_id"]
+        response = session.get(f"{base_url}/sessions/{upload_id}")
+        if response.status_code == 200:
+            status = response.json()
+            logger.info("Resuming upload %s (%d of %d bytes received)", upload_id,
+                        status["received_bytes"], status["size"])
+    if status is None:
+        response = session.post(f"{base_url}/sessions", json={
+            "filename": os.path.basename(tar_path),
+            "size": os.path.getsize(tar_path),
+            "case_number": case_number,
+            "script_option": ["ccr", "chr", "bucket", "keyword"]  # All scripts selected
+        })
+        response.raise_for_status()
+        status = response.json()
+        with open(state_path, "w") as f:
+            json.dump({"upload_id": status["upload_id"]}, f)
+        logger.info("Started upload %s", status["upload_id"])
+    upload_id = status["upload_id"]
+
+    with open(tar_path, "rb") as f:
+        for start, end in status["missing"]:
+            for offset in range(start, end, chunk_size):
+                f.seek(offset)
+                chunk = f.read(min(chunk_size, end - offset))
+                headers = {"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest(),
+                           "Content-Type": "application/octet-stream"}
+                for attempt in range(1, retries + 1):
+                    try:
+                        response = session.put(f"{base_url}/sessions/{upload_id}", params={"offset": offset},
+                                               data=chunk, headers=headers)
+                        if response.status_code == 200:
+                            break
+                        logger.warning("Chunk at %d rejected (%d): %s", offset, response.status_code, response.text)
+                    except requests.RequestException as e:
+                        logger.warning("Chunk at %d failed (attempt %d): %s", offset, attempt, str(e))
+                    time.sleep(min(2 ** attempt, 30))
+                else:
+                    print(f"Error: chunk at offset {offset} failed {retries} times. Rerun to resume.")
+                    sys.exit(1)
+                logger.info("Uploaded %d/%d bytes", offset + len(chunk), status["size"])
+
+    response = session.post(f"{base_url}/sessions/{upload_id}/finalize")
+    if response.status_code == 200:
+        os.remove(state_path)
+        logger.info("Upload %s finalized", upload_id)
+        print("Request successful. Check Flask logs or transaction folder for outputs.")
+    else:
+        logger.error("Finalize failed with status %d: %s", response.status_code, response.text)
+        print(f"Error: Finalize failed with status {response.status_code}. Rerun to resume.")
+
 def main():
     # Define the path to logs.tar
     transaction_folder = "/home/manish/flask_uploads/quamruz/123/1861946b-154a-426b-8032-f3e7157193c4"
     tar_path = os.path.join(transaction_folder, "logs.tar")
     
     logger.info("Starting manual call to Flask employee_dashboard")
-    call_employee_dashboard(tar_path, case_number="123")
+    if "--stream" in sys.argv:
+        stream_employee_upload(tar_path, case_number="123")
+    elif "--chunked" in sys.argv:
+        chunked_employee_upload(tar_path, case_number="123")
+    else:
+        call_employee_dashboard(tar_path, case_number="123")
     logger.info("Manual call completed")
 
 if __name__ == "__main__":
@@ -20,12 +20,42 @@ SQLALCHEMY_TRACK_MODIFICATIONS = False
 SECRET_KEY = "CHANGE_ME_PLEASE"  # Change this to a unique, secure value!
 
 # File Upload Configuration
-UPLOAD_FOLDER = "/home/manish/flask_uploads"
+UPLOAD_FOLDER = "/home/manish/flask_uploads"  # Shared storage, mounted at this path on every job worker host
 ALLOWED_EXTENSIONS = {"tar", "tgz", "gz"}
+UPLOAD_CHUNK_MAX_BYTES = 64 * 1024 * 1024  # Largest chunk accepted by the resumable upload API
+PREFLIGHT_MAX_BYTES = 50 * 1024 * 1024 * 1024  # Reject bundles whose members add up to more than this
 
 # 7-Zip command (for non-POSIX systems; on Ubuntu, tar is used)
 SEVEN_ZIP_CMD = "/usr/bin/7z"
 
+# Extraction settings
+EXTRACT_OWNER = "manish"   # Extracted files are chowned to this user while they are written
+EXTRACT_MAX_DEPTH = 10     # Maximum nesting depth for archives inside logs.tar
+EXTRACT_WORKERS = 4        # Processes used to extract sibling nested archives (1 = sequential)
+ZERO_EXTRACTION = True     # Read tech-support.log from the uploaded archive instead of extracting it
+
+# Script job settings
+JOB_WORKERS = 4            # Scripts one worker process (the web process or a worker.py daemon) runs at a time
+JOB_WEB_WORKERS = True     # The web process runs JOB_WORKERS itself; False when worker.py hosts run every job
+JOB_CLAIM_LOCK = "database"  # "database": SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8+); "file": a lock file in UPLOAD_FOLDER
+JOB_HEARTBEAT_INTERVAL = 15  # Seconds between a worker process's heartbeats
+JOB_LEASE_SECONDS = 90     # A worker silent this long is dead and its running jobs are queued again
+JOB_MAX_ATTEMPTS = 3       # Claims of a job before a worker dying on it fails it instead
+ANALYZER_POOL = True       # Run the analysis scripts in a warm process pool instead of one interpreter per run
+ANALYZER_WORKERS = 4       # Processes in the analyzer pool
+ANALYZER_RECYCLE_JOBS = 50 # Replace the analyzer pool after this many jobs per worker (0 = never)
+SCRIPTS_FOLDER = "/opt/my_flask_app/scripts"
+JOB_AGING_RATE = 1.0       # Seconds of predicted runtime a queued job is forgiven for each second it waits
+JOB_USER_MAX_RUNNING = 2   # Jobs one user can have running at a time, escalated sessions aside (0 = no cap)
+JOB_USER_WEIGHTS = {}      # Fair-share weight by user email (default 1.0); weight 2 gets twice the running jobs
+SCRIPT_CPU_LIMIT = 1800    # CPU seconds a script run may use (0 = no limit)
+SCRIPT_MEMORY_LIMIT = 16 * 1024 * 1024 * 1024  # Address space of a script run, in bytes (0 = no limit)
+SCRIPT_OUTPUT_LIMIT = 4 * 1024 * 1024 * 1024   # Largest file a script run may write, in bytes (0 = no limit)
+
+# Result cache settings
+RESULT_CACHE_FOLDER = "/home/manish/flask_result_cache"  # Outside UPLOAD_FOLDER, so retention cleanup leaves it alone
+RESULT_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024  # Least recently used outputs are evicted past this (0 = no cache)
+
 # Retention settings
 RAW_RETENTION_DAYS = 30    # Retain raw tar files and untarred intermediate data for 30 days
 IO_RETENTION_DAYS = 360    # Retain generated input and output folders for 360 days
@@ -0,0 +1,32 @@
+"""Add priority lane and ready_at
+
+Revision ID: 0c6d2b8e93f4
+Revises: f2a9c7e41b58
+Create Date: 2026-10-16 20:31:12.087463
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6d2b8e93f4'
+down_revision = 'f2a9c7e41b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ready_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('session_metadata', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('priority', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('session_metadata', schema=None) as batch_op:
+        batch_op.drop_column('priority')
+
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.drop_column('ready_at')
@@ -0,0 +1,28 @@
+"""Add content_digest to session_metadata
+
+Revision ID: 3f1c2a7d9b41
+Revises: 9ac4785a08cd
+Create Date: 2026-10-16 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b41'
+down_revision = '9ac4785a08cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('session_metadata', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_digest', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_session_metadata_content_digest'), ['content_digest'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('session_metadata', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_session_metadata_content_digest'))
+        batch_op.drop_column('content_digest')
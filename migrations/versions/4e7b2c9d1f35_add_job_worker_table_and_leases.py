@@ -0,0 +1,47 @@
+"""Add job_worker table and leases
+
+Revision ID: 4e7b2c9d1f35
+Revises: 8d4b1f6e2a73
+Create Date: 2026-10-17 03:12:08.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7b2c9d1f35'
+down_revision = '8d4b1f6e2a73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_worker',
+    sa.Column('id', sa.String(length=120), nullable=False),
+    sa.Column('host', sa.String(length=255), nullable=False),
+    sa.Column('pid', sa.Integer(), nullable=False),
+    sa.Column('threads', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('job_worker', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_job_worker_heartbeat_at'), ['heartbeat_at'], unique=False)
+
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('worker', sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_script_job_worker'), ['worker'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_script_job_worker'))
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('worker')
+
+    with op.batch_alter_table('job_worker', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_job_worker_heartbeat_at'))
+
+    op.drop_table('job_worker')
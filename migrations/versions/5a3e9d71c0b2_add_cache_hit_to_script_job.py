@@ -0,0 +1,26 @@
+"""Add cache_hit to script_job
+
+Revision ID: 5a3e9d71c0b2
+Revises: 0c6d2b8e93f4
+Create Date: 2026-10-16 22:04:47.512930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a3e9d71c0b2'
+down_revision = '0c6d2b8e93f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cache_hit', sa.Boolean(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.drop_column('cache_hit')
@@ -0,0 +1,30 @@
+"""Add resource use and cancel to script_job
+
+Revision ID: 8d4b1f6e2a73
+Revises: 5a3e9d71c0b2
+Create Date: 2026-10-17 00:41:26.904318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4b1f6e2a73'
+down_revision = '5a3e9d71c0b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cpu_time', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('peak_rss', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('cancelled_by', sa.String(length=120), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.drop_column('cancelled_by')
+        batch_op.drop_column('peak_rss')
+        batch_op.drop_column('cpu_time')
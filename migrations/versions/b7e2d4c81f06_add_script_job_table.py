@@ -0,0 +1,45 @@
+"""Add script_job table
+
+Revision ID: b7e2d4c81f06
+Revises: 3f1c2a7d9b41
+Create Date: 2026-10-16 14:03:21.504117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4c81f06'
+down_revision = '3f1c2a7d9b41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('script_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.String(length=36), nullable=False),
+    sa.Column('script', sa.String(length=20), nullable=False),
+    sa.Column('command', sa.Text(), nullable=False),
+    sa.Column('output_path', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('return_code', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['session_metadata.session_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_script_job_session_id'), ['session_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_script_job_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_script_job_status'))
+        batch_op.drop_index(batch_op.f('ix_script_job_session_id'))
+
+    op.drop_table('script_job')
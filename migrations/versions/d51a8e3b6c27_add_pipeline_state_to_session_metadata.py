@@ -0,0 +1,34 @@
+"""Add pipeline state to session_metadata
+
+Revision ID: d51a8e3b6c27
+Revises: b7e2d4c81f06
+Create Date: 2026-10-16 15:27:09.861342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd51a8e3b6c27'
+down_revision = 'b7e2d4c81f06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('session_metadata', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('script_options', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('pipeline_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('pipeline_progress', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('pipeline_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('pipeline_notices', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('session_metadata', schema=None) as batch_op:
+        batch_op.drop_column('pipeline_notices')
+        batch_op.drop_column('pipeline_error')
+        batch_op.drop_column('pipeline_progress')
+        batch_op.drop_column('pipeline_status')
+        batch_op.drop_column('script_options')
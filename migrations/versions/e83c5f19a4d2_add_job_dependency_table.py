@@ -0,0 +1,36 @@
+"""Add job_dependency table
+
+Revision ID: e83c5f19a4d2
+Revises: d51a8e3b6c27
+Create Date: 2026-10-16 17:42:51.230948
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83c5f19a4d2'
+down_revision = 'd51a8e3b6c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_dependency',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('depends_on_id', sa.Integer(), nullable=False),
+    sa.Column('needs_success', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['depends_on_id'], ['script_job.id'], ),
+    sa.ForeignKeyConstraint(['job_id'], ['script_job.id'], ),
+    sa.PrimaryKeyConstraint('job_id', 'depends_on_id')
+    )
+    with op.batch_alter_table('job_dependency', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_job_dependency_depends_on_id'), ['depends_on_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job_dependency', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_job_dependency_depends_on_id'))
+
+    op.drop_table('job_dependency')
@@ -0,0 +1,34 @@
+"""Add runtime stats to script_job
+
+Revision ID: f2a9c7e41b58
+Revises: e83c5f19a4d2
+Create Date: 2026-10-16 19:08:37.614025
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9c7e41b58'
+down_revision = 'e83c5f19a4d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('input_path', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('input_bytes', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('input_lines', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('elapsed', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('predicted', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('script_job', schema=None) as batch_op:
+        batch_op.drop_column('predicted')
+        batch_op.drop_column('elapsed')
+        batch_op.drop_column('input_lines')
+        batch_op.drop_column('input_bytes')
+        batch_op.drop_column('input_path')
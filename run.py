@@ -8,6 +8,7 @@
 import os
 import subprocess
 from app import create_app
+from app.jobs import job_queue
 from flask_migrate import Migrate  # Explicitly import to ensure CLI recognition
 
 # Set the time zone explicitly
@@ -40,4 +41,6 @@ app = create_app()
 
 if __name__ == "__main__":
     free_port(5000)
+    # Recover what the previous instance left running and resume the job queue now, not on the first request
+    job_queue.start()
     app.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
\ No newline at end of file
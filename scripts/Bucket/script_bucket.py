@@ -5,6 +5,7 @@ script_bucket.py
 Usage: python3 script_bucket.py <input_file> <output_html> <log_file>
 Processes the complete tech-support.log file and categorizes command blocks into predefined buckets.
 Generates an HTML report preserving the original formatting.
+Also importable: run(input_file, output_html, log_file), with the command-to-bucket map built once on import.
 """
 
 import re
@@ -14,6 +15,8 @@ import sys
 import logging
 from collections import defaultdict
 
+logger = logging.getLogger(__name__)
+
 # Define the bucket order and their corresponding "show" commands
 bucket_order = [
     "show log", "show datapath", "show airgroup", "show ipc", "show gsm", "show ap", 
@@ -466,12 +469,19 @@ for bucket in bucket_order:
 def slugify(name):
     return re.sub(r'\W+', '-', name).lower()
 
+PROGRESS_EVERY = 10000  # lines between progress reports
+
+def progress(**counts):
+    """Progress hook, a no-op here: the app's analyzer pool replaces it to stream the counts to the dashboard."""
+
 # Function to parse the log file into blocks
 def parse_log_file(file_path):
     blocks = []
     current_block = []
     with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
+        for line_number, line in enumerate(f, 1):
+            if line_number % PROGRESS_EVERY == 0:
+                progress(step='reading', lines=line_number, blocks=len(blocks))
             if line.startswith("show "):
                 if current_block:  # If there's an existing block, append it
                     blocks.append(current_block)
@@ -636,25 +646,14 @@ def generate_html(bucket_to_blocks, bucket_order):
 """
     return html_content
 
-# Main execution
-def main():
-    if len(sys.argv) < 4:
-        print("Usage: python3 script_bucket.py <input_file> <output_html> <log_file>")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    output_html = sys.argv[2]
-    log_file = sys.argv[3]
-
-    # Set up logging
-    logging.basicConfig(filename=log_file, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    logger = logging.getLogger(__name__)
+def run(input_file, output_html, log_file):
+    """Write the bucket report for input_file to output_html. Logging goes wherever the caller sends it."""
     logger.info("Bucket script started.")
 
     # Check if the input file exists
     if not os.path.exists(input_file):
         logger.error(f"The input file does not exist at: {input_file}")
-        sys.exit(f"The input file does not exist at: {input_file}")
+        raise FileNotFoundError(f"The input file does not exist at: {input_file}")
     
     # Create the output directory if it doesn't exist
     output_dir = os.path.dirname(output_html)
@@ -676,11 +675,30 @@ def main():
             bucket_to_blocks[bucket].append(block)
     
     # Generate and write HTML
+    progress(step='writing', blocks=sum(len(b) for b in bucket_to_blocks.values()))
     html_content = generate_html(bucket_to_blocks, bucket_order)
     with open(output_html, 'w', encoding='utf-8') as f:
         f.write(html_content)
     logger.info(f"HTML file generated at: {output_html}")
     print(f"HTML file generated at: {output_html}")
 
+# Main execution
+def main():
+    if len(sys.argv) < 4:
+        print("Usage: python3 script_bucket.py <input_file> <output_html> <log_file>")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_html = sys.argv[2]
+    log_file = sys.argv[3]
+
+    # Set up logging
+    logging.basicConfig(filename=log_file, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        run(input_file, output_html, log_file)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
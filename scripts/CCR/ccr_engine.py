@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# Location: /opt/my_flask_app/scripts/CCR/ccr_engine.py
+"""
+Usage: python3 ccr_engine.py <input_file> <output_file> <log_file> [with_default|skip_default|both]
+CCR engine: reads a running config once, finds the profiles of both keyword lists in one pass and
+renders the with-default report, the skip-default report or both (the default, on one page).
+run(input_file, output_file, log_file[, report]) is what the app's analyzer pool calls; the two
+Script-*-Default-Profile.py scripts are the single-report command lines over it.
+
+The reports differ in one keyword. A profile is used when its name is on another line of the config,
+which the reference index (ccr_index.py) built in the same pass answers per profile; the index is
+saved next to the config, and the report links each used profile to the blocks naming it.
+"""
+import os
+import re
+import sys
+import html
+import logging
+import importlib.util
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+def _load_helper(name):
+    """Import a module from this folder (it need not be on sys.path)."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+    spec = importlib.util.spec_from_file_location(f"ccr_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+ccr_keywords = _load_helper("ccr_keywords")
+ccr_index = _load_helper("ccr_index")
+
+# CCR keywords, in report order within a line
+WITH_DEFAULT_KEYWORDS = [
+    "ip access-list geolocation", "ip access-list eth", "netdestination", "aaa bandwidth-contract",
+    "ip access-list session", "user-role", "vlan-name", "ip nexthop-list", "crypto isakmp policy",
+    "mgmt-server primary-server", "ntp server", "cp-bandwidth-contract", "aaa rfc-3576-server",
+    "aaa authentication mac", "aaa authentication dot1x", "aaa authentication-server ldap",
+    "aaa authentication-server tacacs", "aaa authentication-server radius", "scheduler-profile",
+    "aaa server-group", "aaa profile", "aaa authentication captive-portal", "aaa authentication wispr",
+    "aaa authentication vpn", "aaa authentication stateful-ntlm", "aaa authentication stateful-kerberos",
+    "aaa authentication via auth-profile", "aaa authentication via connection-profile",
+    "aaa authentication via web-auth", "ids ap-classification-rule", "ids management-profile",
+    "ids wms-general-profile", "ids wms-local-system-profile", "ucc", "lc-cluster group-profile",
+    "ap regulatory-domain-profile", "dump-auto-uploading-profile", "ap wired-ap-profile",
+    "ap enet-link-profile", "ap mesh-ht-ssid-profile", "ap lldp med-network-policy-profile",
+    "ap mesh-cluster-profile", "ap mesh-accesslist-profile", "ap wifi-uplink-profile",
+    "ap multizone-profile", "ap usb-acl-prof", "iot radio-profile", "dump-collection-profile",
+    "ap lldp profile", "ap mesh-radio-profile", "ap usb-profile", "ap system-profile",
+    "ap wired-port-profile", "gps service-profile", "ids general-profile", "ids rate-thresholds-profile",
+    "ids signature-profile", "ids impersonation-profile", "ids unauthorized-device-profile",
+    "ids signature-matching-profile", "ids dos-profile", "ids profile", "rf dot11-60GHz-radio-profile",
+    "wlan 6ghz-rrm-ie-profile", "rf arm-profile", "rf ht-radio-profile", "rf spectrum-profile",
+    "rf optimization-profile", "rf event-thresholds-profile", "rf am-scan-profile",
+    "rf dot11a-radio-profile", "rf dot11g-radio-profile", "rf dot11-6GHz-radio-profile",
+    "wlan rrm-ie-profile", "wlan bcn-rpt-req-profile", "wlan dot11r-profile", "wlan tsm-req-profile",
+    "wlan ht-ssid-profile", "wlan he-ssid-profile", "wlan hotspot anqp-venue-name-profile",
+    "wlan hotspot anqp-nwk-auth-profile", "wlan hotspot anqp-roam-cons-profile",
+    "wlan hotspot anqp-nai-realm-profile", "wlan hotspot anqp-3gpp-nwk-profile",
+    "wlan hotspot h2qp-operator-friendly-name-profile", "wlan hotspot h2qp-wan-metrics-profile",
+    "wlan hotspot h2qp-conn-capability-profile", "wlan hotspot h2qp-op-cl-profile",
+    "wlan hotspot h2qp-osu-prov-list-profile", "wlan hotspot anqp-ip-addr-avail-profile",
+    "wlan hotspot anqp-domain-name-profile", "wlan edca-parameters-profile station",
+    "wlan edca-parameters-profile ap", "wlan mu-edca-parameters-profile", "wlan dot11k-profile",
+    "wlan ssid-profile", "wlan virtual-ap", "wlan traffic-management-profile", "mgmt-server profile",
+    "ap authorization-profile", "ap provisioning-profile", "rf arm-rf-domain-profile",
+    "ap am-filter-profile", "ap spectrum local-override", "airmatch profile", "ap-lacp-striping-ip",
+    "ap general-profile", "ap deploy-profile", "airslice-profile", "ap-group", "ap-name",
+    "airgroupprofile service", "iot transportProfile", "iot useTransportProfile",
+    "snmp-server host", "ip probe"
+]
+# The skip-default report looks for the 3GPP radio profile where the with-default one has the network profile
+SKIP_DEFAULT_KEYWORDS = ["wlan hotspot anqp-3gpp-radio-profile" if keyword == "wlan hotspot anqp-3gpp-nwk-profile"
+                         else keyword for keyword in WITH_DEFAULT_KEYWORDS]
+
+Variant = namedtuple('Variant', 'title keywords')
+VARIANTS = {
+    'with_default': Variant("With Default Profiles", WITH_DEFAULT_KEYWORDS),
+    'skip_default': Variant("Skip Default Profiles", SKIP_DEFAULT_KEYWORDS),
+}
+
+ALL_KEYWORDS = list(dict.fromkeys(WITH_DEFAULT_KEYWORDS + SKIP_DEFAULT_KEYWORDS))
+keyword_matcher = ccr_keywords.KeywordMatcher(ALL_KEYWORDS)  # finds the keywords of both reports in one pass
+vrrp_pattern = re.compile(r"^vrrp (\d+)")
+virtual_router_pattern = re.compile(r"^Virtual Router (\d+)")
+PROGRESS_EVERY = 10000  # lines between progress reports
+REFERENCE_LIMIT = 20  # blocks listed per profile under "Where the Profiles Are Used"
+
+
+def progress(**counts):
+    """Progress hook, a no-op here: the app's analyzer pool replaces it to stream the counts to the dashboard."""
+
+
+PAGE_HEAD = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>HPE Aruba Config Cleanup Review</title>
+    <style>
+        body { font-family: Calibri, sans-serif; margin: 0; padding: 0px; display: flex; justify-content: center; align-items: center; flex-direction: column; min-height: 100vh; background-color: #f2f2f2; font-size: 18px; width: 100%; }
+        .box { border: 10px solid green; color: black; padding: 15px 25px; border-radius: 2px; font-size: 30px; font-weight: bold; text-align: center; margin-top: 10px; width: 90%; max-width: 600px; }
+        .found { color: green; font-weight: bold; }
+        .not-found { color: red; }
+        table { border-collapse: collapse; width: auto; margin: 20px; table-layout: auto; }
+        th, td { border: 1px solid black; padding: 5px; text-align: center; word-wrap: break-word; }
+        th { background-color: #FBE2D5; }
+    </style>
+</head>
+<body>
+    <div class="box">HPE Aruba Config Cleanup Review</div>
+    <div style="height: 15px;"></div>
+    <div class="info">This report is for the customer's review and action. HPE/Aruba Support is providing information on the usage status of configuration profiles.</div>
+"""
+TABLE_HEAD = """        <table>
+        <tr><th>Config Profile</th><th>Profile Name</th><th>Match</th></tr>
+"""
+
+
+class CcrAnalysis:
+    """What the reports are made from: the keyword matches of every line, the reference index and VRRP groups."""
+
+    def __init__(self, matches, index, vrrp_results):
+        self.matches = matches  # [(line number, [(keyword, profile name)])], lines without any left out
+        self.index = index
+        self.vrrp_results = vrrp_results
+
+    def rows(self, variant):
+        """[(keyword, profile name, "YES" or "NO")] of one report."""
+        order = {keyword: index for index, keyword in enumerate(variant.keywords)}
+        rows = []
+        for line_number, found in self.matches:
+            for _, keyword, name in sorted((order[keyword], keyword, name) for keyword, name in found if keyword in order):
+                rows.append((keyword, name, "YES" if self.index.used(name, line_number) else "NO"))
+        return rows
+
+
+def analyze(input_file_path):
+    """Read the config once: match every line against the keywords of both reports and index its references."""
+    if not os.path.exists(input_file_path):
+        logger.error(f"Input file not found: {input_file_path}")
+        raise FileNotFoundError(f"Input file not found: {input_file_path}")
+
+    index = ccr_index.ReferenceIndex()
+    matches = []
+    vrrp_numbers = set()
+    virtual_router_numbers = set()
+    with open(input_file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line_number = index.add_line(line)
+            if line_number % PROGRESS_EVERY == 0:
+                progress(step='matching', lines=line_number, rows=len(matches))
+            found = keyword_matcher.matches(line)
+            if found:
+                matches.append((line_number, found))
+                for keyword, name in found:
+                    index.add_profile(keyword, name, line_number)
+            if line.startswith("vrrp"):
+                match = vrrp_pattern.match(line)
+                if match:
+                    vrrp_numbers.add(match.group(1))
+            if line.startswith("Virtual Router"):
+                match = virtual_router_pattern.match(line)
+                if match:
+                    virtual_router_numbers.add(match.group(1))
+    index.fill(input_file_path)
+
+    vrrp_results = []
+    for vrrp_num in vrrp_numbers:
+        match_found = "YES" if vrrp_num in virtual_router_numbers else "NO"
+        vrrp_results.append((f"vrrp {vrrp_num}", match_found))
+    return CcrAnalysis(matches, index, vrrp_results)
+
+
+def render(rows, vrrp_results, anchors):
+    """The report table rows, as HTML. The names of used profiles link to their entry among the references."""
+    html_content = []
+    for keyword, next_word, found_status in rows:
+        color_class = "found" if found_status == "YES" else "not-found"
+        if found_status == "YES":
+            next_word = f"<a href=\"#{anchors[(keyword, next_word)]}\">{next_word}</a>"
+        html_content.append(f"<tr><td>{keyword}</td><td>{next_word}</td><td class='{color_class}'>{found_status}</td></tr>")
+    for vrrp, match_status in vrrp_results:
+        color_class = "found" if match_status == "YES" else "not-found"
+        html_content.append(f"<tr><td>{vrrp}</td><td>Virtual Router</td><td class='{color_class}'>{match_status}</td></tr>")
+    return "".join(html_content)
+
+
+def render_references(index, anchors):
+    """
+    Where each used profile is named, other than where it is reported from: the commands of the
+    blocks naming it, at most REFERENCE_LIMIT of them.
+    """
+    html_content = ["    <h2 id=\"references\">Where the Profiles Are Used</h2>\n",
+                    "        <table>\n        <tr><th>Config Profile</th><th>Profile Name</th><th>Named In</th></tr>\n"]
+    for (keyword, name), anchor in anchors.items():
+        lines, blocks = index.where(keyword, name)
+        if blocks:
+            places = [f"{line}: {html.escape(index.headers[line])}" for line in blocks[:REFERENCE_LIMIT]]
+        else:
+            places = [f"line {line}" for line in lines[:REFERENCE_LIMIT]]
+        more = len(blocks or lines) - len(places)
+        if more:
+            places.append(f"and {more} more")
+        elif not places:
+            places = ["only the lines it is reported from"]
+        html_content.append(f"<tr id=\"{anchor}\"><td>{keyword}</td><td>{name}</td><td style=\"text-align: left;\">{'<br>'.join(places)}</td></tr>")
+    html_content.append("</table>\n")
+    return "".join(html_content)
+
+
+def report_html(analysis, variant_names):
+    """
+    One report page: the table of a single variant, or a titled table for each of several with links
+    to them, followed by where the used profiles are named.
+    """
+    tables = [(name, analysis.rows(VARIANTS[name])) for name in variant_names]
+    anchors = {}
+    for _, rows in tables:
+        for keyword, next_word, found_status in rows:
+            if found_status == "YES" and (keyword, next_word) not in anchors:
+                anchors[(keyword, next_word)] = f"ref-{len(anchors) + 1}"
+    html_content = [PAGE_HEAD]
+    if len(tables) == 1:
+        html_content.append(TABLE_HEAD + render(tables[0][1], analysis.vrrp_results, anchors) + "</table>\n")
+    else:
+        html_content.append("    <div class=\"info\">" + " | ".join(
+            f"<a href=\"#{name}\">{VARIANTS[name].title}</a>" for name in variant_names) + "</div>\n")
+        for name, rows in tables:
+            html_content.append(f"    <h2 id=\"{name}\">{VARIANTS[name].title}</h2>\n")
+            html_content.append(TABLE_HEAD + render(rows, analysis.vrrp_results, anchors) + "</table>\n")
+    html_content.append(render_references(analysis.index, anchors))
+    html_content.append("</body></html>")
+    return "".join(html_content)
+
+
+def report_variants(report):
+    """The variant names of a report choice: "with_default", "skip_default" or "both"."""
+    if report == "both":
+        return tuple(VARIANTS)
+    if report not in VARIANTS:
+        raise ValueError(f"Unknown CCR report: {report}")
+    return (report,)
+
+
+def run(input_file_path, output_file_path, log_file_path, report="both"):
+    """Write the CCR report (with_default, skip_default or both, on one page) for input_file_path to output_file_path."""
+    variants = report_variants(report)
+    titles = " and ".join(VARIANTS[name].title.lower() for name in variants)
+    logger.info(f"CCR engine started for {titles}...")
+    analysis = analyze(input_file_path)
+
+    logger.info("Generating HTML output...")
+    progress(step='writing', rows=len(analysis.matches) + len(analysis.vrrp_results))
+    page = report_html(analysis, variants)
+    with open(output_file_path, "w", encoding="utf-8") as output_file:
+        output_file.write(page)
+    index_path = analysis.index.save(input_file_path)
+    if index_path:
+        logger.info(f"Reference index saved at: {index_path}")
+
+    logger.info("HTML report generated at: {}".format(output_file_path))
+    print("HTML report generated successfully at: {}".format(output_file_path))
+
+
+def main(report=None, script_name="ccr_engine.py"):
+    """Command line of the engine, and of the single-report scripts, which pass their report."""
+    usage = f"Usage: python3 {script_name} <input_file> <output_file> <log_file>"
+    if report is None:
+        usage += " [with_default|skip_default|both]"
+    if len(sys.argv) < 4:
+        print(usage)
+        sys.exit(1)
+    if report is None:
+        report = sys.argv[4] if len(sys.argv) > 4 else "both"
+        if report != "both" and report not in VARIANTS:
+            print(usage)
+            sys.exit(1)
+
+    input_file_path = sys.argv[1]
+    output_file_path = sys.argv[2]
+    log_file_path = sys.argv[3]
+
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logging.getLogger().addHandler(console_handler)
+
+    try:
+        run(input_file_path, output_file_path, log_file_path, report)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# Location: /opt/my_flask_app/scripts/CCR/ccr_index.py
+"""
+Reference index of a running config, for CCR's profile usage.
+
+Built in the same pass that finds the profiles: for every token of a line (a quoted
+string, or a run of non-blank characters) the index keeps the first line it is on and
+the second one, if any, and every line's block. A block runs from the first line after
+a "!" (or a "show" command) up to the next "!"; the app's CCR input has its lines
+stripped, so blocks cannot be told apart by indentation. A profile is used when its
+name is a token of some line other than the one it is reported from; "prof-1" and
+"10.1.1.1" are whole tokens, so they are not counted as uses of "prof" or "1". Only
+the names of reported profiles get their full list of lines: from the line they are
+first reported on, plus the earlier ones, which fill() looks up again in the config.
+The lines and blocks naming each profile, other than the lines it is reported from,
+are saved next to the config in <config>.refs.json:
+
+    {"version": 3,
+     "profiles": [{"type": <keyword>, "name": ..., "lines": [lines it is reported from],
+                   "references": [other lines naming it], "blocks": [first lines of their blocks]}],
+     "blocks": {<first line>: <its command>}}
+"""
+import os
+import re
+import json
+import logging
+from array import array
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.refs.json'
+INDEX_VERSION = 3
+TOKEN_PATTERN = re.compile(r"\"([^\"]+)\"|(\S+)")  # as a CCR keyword's name is read: quoted, or up to a blank
+
+
+def index_path(config_path):
+    return config_path + INDEX_SUFFIX
+
+
+def tokens(line):
+    if '"' in line:
+        return [quoted or plain for quoted, plain in TOKEN_PATTERN.findall(line)]
+    return line.split()
+
+
+class ReferenceIndex:
+    """Where the tokens of a config are, fed one line at a time, and the profiles reported from it."""
+
+    def __init__(self):
+        self.lines = 0
+        self.first_line = {}  # token -> first line it is on
+        self.second_line = {}  # token -> second line it is on, for tokens on more than one
+        self.references = {}  # profile name -> ascending lines naming it (see fill)
+        self.pending = {}  # profile name -> (second line, line it was first reported on) while lines between are missing
+        self.block_of = array('I', [0])  # line number -> first line of its block (0: none)
+        self.headers = {}  # first line of a block -> its command
+        self.profiles = {}  # (keyword, name) -> lines it is reported from
+        self._block = 0
+
+    def add_line(self, line):
+        """Index the next line of the config. Returns its line number."""
+        self.lines += 1
+        line_number = self.lines
+        stripped = line.strip()
+        if stripped[:1] == "!":
+            self._block = 0
+        elif stripped and (not self._block or stripped.startswith("show ")):
+            self._block = line_number
+            self.headers[line_number] = stripped
+        self.block_of.append(self._block)
+        first_line = self.first_line
+        second_line = self.second_line
+        references = self.references
+        for token in (line.split() if '"' not in line else tokens(line)):
+            first = first_line.setdefault(token, line_number)
+            if first != line_number:
+                if token not in second_line:
+                    second_line[token] = line_number
+                lines = references.get(token)
+                if lines is not None and lines[-1] != line_number:
+                    lines.append(line_number)
+        return line_number
+
+    def add_profile(self, keyword, name, line_number):
+        """Record a profile reported from line_number, the line add_line indexed last."""
+        self.profiles.setdefault((keyword, name), []).append(line_number)
+        if name in self.references:
+            return
+        first = self.first_line.get(name)
+        lines = [] if first is None else [first]
+        second = self.second_line.get(name)
+        if second is not None:
+            lines.append(second)
+            if second != line_number:
+                lines.append(line_number)
+                self.pending[name] = (second, line_number)
+        self.references[name] = lines
+
+    def fill(self, config_path):
+        """
+        Add the lines that named a profile between its second line and the line it was first
+        reported on, which add_line did not keep: only those lines of the config are read again.
+        """
+        if not self.pending:
+            return
+        start = min(second for second, _ in self.pending.values())
+        end = max(reported for _, reported in self.pending.values())
+        found = {}
+        names = self.pending.keys()
+        # Names without blanks or quotes are among the words of a line once its quotes are blanked out
+        plain = not any(re.search(r'[\s"]', name) for name in names)
+        with open(config_path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(islice(file, start, end - 1), start + 1):
+                if plain:
+                    if names.isdisjoint(line.replace('"', ' ').split()):
+                        continue
+                elif '"' not in line and names.isdisjoint(line.split()):
+                    continue
+                for name in {token for token in tokens(line) if token in self.pending}:
+                    second, reported = self.pending[name]
+                    if second < line_number < reported:
+                        found.setdefault(name, []).append(line_number)
+        for name, lines in found.items():
+            references = self.references[name]
+            references[2:2] = lines
+        self.pending = {}
+
+    def used(self, name, line_number):
+        """Whether name is on a line other than line_number."""
+        return name in self.second_line or self.first_line.get(name, line_number) != line_number
+
+    def where(self, keyword, name):
+        """(lines naming the profile other than those it is reported from, first lines of their blocks)."""
+        own = set(self.profiles.get((keyword, name), ()))
+        lines = [line for line in self.references.get(name, []) if line not in own]
+        blocks = sorted({self.block_of[line] for line in lines} - {0})
+        return lines, blocks
+
+    def save(self, config_path):
+        """Write the index of the profiles next to the config. Best effort: the report does not need it."""
+        path = index_path(config_path)
+        profiles = []
+        block_lines = set()
+        for (keyword, name), lines in self.profiles.items():
+            references, blocks = self.where(keyword, name)
+            block_lines.update(blocks)
+            profiles.append({'type': keyword, 'name': name, 'lines': lines,
+                             'references': references, 'blocks': blocks})
+        try:
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'version': INDEX_VERSION, 'profiles': profiles,
+                                    'blocks': {str(line): self.headers[line] for line in sorted(block_lines)}}))
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not save the reference index {path}: {str(e)}")
+            return None
+        return path
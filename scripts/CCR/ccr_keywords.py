@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Location: /opt/my_flask_app/scripts/CCR/ccr_keywords.py
+"""
+Single-pass keyword matcher for the CCR scripts.
+
+A CCR row is (keyword, the name that follows it) for the first occurrence of each
+keyword in a line that is followed by a name, as found by
+\\b<keyword>\\b\\s+(?:"([^"]+)"|(\\S+)). Rather than run that for every keyword on
+every line, one combined regex finds the words a keyword can start with, and only
+the keywords starting with a word found there are tried, with their own pattern
+anchored at that spot. The rows are the same, in keyword order within a line.
+
+    python3 ccr_keywords.py <input_file> [repeat]
+
+compares it with searching every keyword in turn on a config and prints both timings.
+"""
+import os
+import re
+import sys
+import time
+import importlib.util
+from collections import defaultdict
+
+NAME_PATTERN = r"\s+(?:\"([^\"]+)\"|(\S+))"  # what follows a keyword: a quoted or a plain name
+LEAD_PATTERN = re.compile(r"\w+")
+
+
+def keyword_pattern(keyword):
+    return re.compile(rf"\b{re.escape(keyword)}\b{NAME_PATTERN}")
+
+
+class KeywordMatcher:
+    """Finds the keywords of a list, and the names following them, in a line."""
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.patterns = [keyword_pattern(keyword) for keyword in self.keywords]
+        # A keyword that starts with a word character starts where a whole word of the line equals its
+        # leading word; the few that do not (none in the CCR lists) are searched on every line.
+        by_lead = defaultdict(list)
+        self.unanchored = []
+        for index, keyword in enumerate(self.keywords):
+            lead = LEAD_PATTERN.match(keyword)
+            if lead:
+                by_lead[lead.group()].append(index)
+            else:
+                self.unanchored.append(index)
+        self.by_lead = dict(by_lead)
+        leads = sorted(self.by_lead, key=len, reverse=True)
+        self.lead_pattern = re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, leads))) if leads else None
+
+    def matches(self, line):
+        """[(keyword, name)] for line, in keyword order."""
+        found = {}
+        if self.lead_pattern is not None:
+            for lead in self.lead_pattern.finditer(line):
+                start = lead.start()
+                for index in self.by_lead[lead.group()]:
+                    if index not in found and line.startswith(self.keywords[index], start):
+                        match = self.patterns[index].match(line, start)
+                        if match:
+                            found[index] = match.group(1) or match.group(2)
+        for index in self.unanchored:
+            match = self.patterns[index].search(line)
+            if match:
+                found[index] = match.group(1) or match.group(2)
+        return [(self.keywords[index], found[index]) for index in sorted(found)]
+
+
+def search_each(keyword_patterns, line):
+    """What KeywordMatcher.matches replaces: every [(keyword, pattern)] searched in turn."""
+    rows = []
+    for keyword, pattern in keyword_patterns:
+        match = pattern.search(line)
+        if match:
+            rows.append((keyword, match.group(1) if match.group(1) else match.group(2)))
+    return rows
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 ccr_keywords.py <input_file> [repeat]")
+        sys.exit(1)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ccr_engine.py")
+    spec = importlib.util.spec_from_file_location("ccr_engine", path)
+    engine = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(engine)
+    keywords = engine.WITH_DEFAULT_KEYWORDS
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with open(sys.argv[1], "r", encoding="utf-8") as file:
+        lines = file.readlines()
+    keyword_patterns = [(keyword, keyword_pattern(keyword)) for keyword in keywords]
+    matcher = KeywordMatcher(keywords)
+    timings = {}
+    rows = {}
+    for name, scan in (("each keyword", lambda line: search_each(keyword_patterns, line)), ("single pass", matcher.matches)):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = [row for line in lines for row in scan(line)]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+        rows[name] = found
+        print(f"{name:>12}: {best:.3f}s for {len(lines)} lines, {len(found)} rows")
+    if rows["each keyword"] != rows["single pass"]:
+        print("Rows differ!")
+        sys.exit(1)
+    print(f"Same rows, {timings['each keyword'] / timings['single pass']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
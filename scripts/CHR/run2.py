@@ -4,6 +4,7 @@
 run2.py - CHR Step 2
 Usage: python3 run2.py <modified_input_file> <output_html_file> <log_file>
 Generates an HTML output with a hierarchical view of the modified CHR configuration.
+Also importable: run(modified_input_file, output_html_file, log_file).
 """
 import sys
 import os
@@ -11,17 +12,6 @@ import re
 import json
 from pathlib import Path
 
-if len(sys.argv) < 4:
-    print("Usage: python3 run2.py <modified_input_file> <output_html_file> <log_file>")
-    sys.exit(1)
-
-input_file = sys.argv[1]
-output_html = sys.argv[2]
-log_file = sys.argv[3]
-
-# Ensure output directory exists
-os.makedirs(os.path.dirname(output_html), exist_ok=True)
-
 # -------------------------------------------------------
 # Helper Functions
 # -------------------------------------------------------
@@ -53,10 +43,12 @@ def split_into_blocks(lines):
         print(f"Error splitting lines into blocks: {e}")
         raise
 
+quoted_pattern = re.compile(r'"([^"]+)"')
+
 def extract_quoted(text):
     """Extract quoted strings from a line."""
     try:
-        return re.findall(r'"([^"]+)"', text)
+        return quoted_pattern.findall(text)
     except Exception as e:
         print(f"Error extracting quoted strings from text: {e}")
         raise
@@ -170,30 +162,10 @@ def build_hierarchy(block, block_index, visited=None):
         print(f"Error building hierarchy: {e}")
         raise
 
-# -------------------------------------------------------
-# Main Processing
-# -------------------------------------------------------
-try:
-    # Read and process the configuration
-    config_lines = read_config_file(input_file)
-    blocks = split_into_blocks(config_lines)
-    block_index = build_block_index(blocks)
-
-    # Find all ap-group blocks as the top-level structure
-    ap_group_blocks = [block for block in blocks if block and block[0].strip().lower().startswith("ap-group")]
-    ap_groups_hierarchy = {}
-    for block in ap_group_blocks:
-        header_quoted = extract_quoted(block[0])
-        if header_quoted:
-            ap_group_name = header_quoted[0]
-            ap_groups_hierarchy[ap_group_name] = build_hierarchy(block, block_index)
-except Exception as e:
-    print(f"Error in main processing: {e}")
-
 # -------------------------------------------------------
 # HTML Generation with Expandable Sections and Collapse All Button
 # -------------------------------------------------------
-def generate_html(ap_groups):
+def generate_html(ap_groups, output_html):
     """Generate an HTML page with an expandable hierarchy and a collapse all button."""
     try:
         hierarchy_json = json.dumps(ap_groups)
@@ -351,4 +323,37 @@ def generate_html(ap_groups):
     except Exception as e:
         print(f"Error generating HTML: {e}")
 
-generate_html(ap_groups_hierarchy)
\ No newline at end of file
+# -------------------------------------------------------
+# Main Processing
+# -------------------------------------------------------
+def run(input_file, output_html, log_file):
+    # Ensure output directory exists
+    os.makedirs(os.path.dirname(output_html), exist_ok=True)
+
+    ap_groups_hierarchy = None
+    try:
+        # Read and process the configuration
+        config_lines = read_config_file(input_file)
+        blocks = split_into_blocks(config_lines)
+        block_index = build_block_index(blocks)
+
+        # Find all ap-group blocks as the top-level structure
+        ap_group_blocks = [block for block in blocks if block and block[0].strip().lower().startswith("ap-group")]
+        ap_groups_hierarchy = {}
+        for block in ap_group_blocks:
+            header_quoted = extract_quoted(block[0])
+            if header_quoted:
+                ap_group_name = header_quoted[0]
+                ap_groups_hierarchy[ap_group_name] = build_hierarchy(block, block_index)
+    except Exception as e:
+        print(f"Error in main processing: {e}")
+    if ap_groups_hierarchy is None:
+        raise RuntimeError(f"Could not read the CHR configuration {input_file}")
+
+    generate_html(ap_groups_hierarchy, output_html)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python3 run2.py <modified_input_file> <output_html_file> <log_file>")
+        sys.exit(1)
+    run(sys.argv[1], sys.argv[2], sys.argv[3])
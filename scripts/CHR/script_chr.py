@@ -3,13 +3,28 @@
 """
 script_chr.py
 Usage: python3 script_chr.py <input_file> <final_output_html> <overall_log_file>
-Driver script for CHR processing. Calls run1.py to generate a modified input and then run2.py to produce the final CHR HTML report.
+Driver script for CHR processing. Runs run1.py to generate a modified input and then run2.py to produce the final CHR HTML report.
+Both steps are imported and run in this process; run(input_file, final_output_html, overall_log_file) is the importable entry point.
 """
 import sys
 import os
-import subprocess
+import importlib.util
 
-def main(input_file, final_output_html, overall_log_file):
+def _load_step(name):
+    """Import run1.py / run2.py from this folder (it need not be on sys.path)."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+    spec = importlib.util.spec_from_file_location(f"chr_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+run1 = _load_step("run1")
+run2 = _load_step("run2")
+
+def progress(**counts):
+    """Progress hook, a no-op here: the app's analyzer pool replaces it to stream the counts to the dashboard."""
+
+def run(input_file, final_output_html, overall_log_file):
     # Define intermediate file in the same directory as final_output_html
     intermediate_file = os.path.join(os.path.dirname(final_output_html), "chr_intermediate.txt")
     run1_log = os.path.join(os.path.dirname(overall_log_file), "chr_run1.log")
@@ -19,30 +34,27 @@ def main(input_file, final_output_html, overall_log_file):
     os.makedirs(os.path.dirname(run1_log), exist_ok=True)
 
     print("Running CHR Step 1 (run1.py)...")
-    run1_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run1.py")
-    ret1 = subprocess.run(["python3", run1_path, input_file, intermediate_file, run1_log],
-                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if ret1.returncode != 0:
-        print("Error: run1.py failed. Check log:", run1_log)
-        print("STDERR:", ret1.stderr)
-        sys.exit(1)
+    progress(step='step 1 of 2')
+    run1.run(input_file, intermediate_file, run1_log)
     
     run2_log = os.path.join(os.path.dirname(overall_log_file), "chr_run2.log")
-    run2_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run2.py")
     print("Running CHR Step 2 (run2.py)...")
-    ret2 = subprocess.run(["python3", run2_path, intermediate_file, final_output_html, run2_log],
-                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if ret2.returncode != 0:
-        print("Error: run2.py failed. Check log:", run2_log)
-        print("STDERR:", ret2.stderr)
-        sys.exit(1)
+    progress(step='step 2 of 2')
+    run2.run(intermediate_file, final_output_html, run2_log)
     
     print("CHR processing complete.")
     print("Final CHR report available at:", final_output_html)
     print("Overall log available at:", overall_log_file)
 
+def main(input_file, final_output_html, overall_log_file):
+    try:
+        run(input_file, final_output_html, overall_log_file)
+    except Exception as e:
+        print("Error: CHR processing failed:", e)
+        sys.exit(1)
+
 if __name__ == "__main__":
     if len(sys.argv) < 4:
         print("Usage: python3 script_chr.py <input_file> <final_output_html> <overall_log_file>")
         sys.exit(1)
-    main(sys.argv[1], sys.argv[2], sys.argv[3])
\ No newline at end of file
+    main(sys.argv[1], sys.argv[2], sys.argv[3])
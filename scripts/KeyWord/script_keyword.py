@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
 # Location: /opt/my_flask_app/scripts/KeyWord/script_keyword.py
+"""
+Usage: python3 script_keyword.py <input_dir> <output_dir> <log_file> <session_id>
+Also importable: run(input_dir, output_dir, log_file, session_id).
+"""
 import os
 import sys
 import json
@@ -7,17 +11,13 @@ import logging
 import re
 from typing import Tuple
 
-# Set up logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(sys.argv[3] if len(sys.argv) > 3 else "keyword_search.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+log_pattern = re.compile(r'httpd\[|nginx:|\[error\]|\[cgid:error\]|\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+
+def progress(**counts):
+    """Progress hook, a no-op here: the app's analyzer pool replaces it to stream the counts to the dashboard."""
+
 def sanitize_input(keyword_input: dict) -> dict:
     """
     Sanitize the keyword input by removing lines that look like log messages or errors.
@@ -29,9 +29,9 @@ def sanitize_input(keyword_input: dict) -> dict:
         Sanitized dictionary with filtered content.
     """
     sanitized_input = {}
-    log_pattern = re.compile(r'httpd\[|nginx:|\[error\]|\[cgid:error\]|\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
     
-    for file_path, data in keyword_input.items():
+    for file_number, (file_path, data) in enumerate(keyword_input.items(), 1):
+        progress(step='filtering', files=file_number, total=len(keyword_input))
         content = data['content']
         content_lowercase = data['content_lowercase']
         # Filter out lines that match the log pattern
@@ -71,6 +71,7 @@ def create_html_search_page(input_json_path: str, output_dir: str, session_id: s
 
     # Sanitize the input to remove log messages
     keyword_input = sanitize_input(keyword_input)
+    progress(step='writing', files=len(keyword_input))
 
     # HTML header with Bootstrap
     html_start = """<!DOCTYPE html>
@@ -393,10 +394,32 @@ def run_full_process(input_dir: str, output_dir: str, session_id: str) -> Tuple[
         logger.error("Unexpected error processing input.json: %s", e)
         return False, f"Error: Unexpected error processing input.json: {e}"
 
+def run(input_dir: str, output_dir: str, log_file: str, session_id: str) -> str:
+    """
+    Generate the search page for a session. Logging goes wherever the caller sends it.
+    
+    Returns:
+        The success message. Raises RuntimeError with the error message on failure.
+    """
+    success, result = run_full_process(input_dir, output_dir, session_id)
+    if not success:
+        raise RuntimeError(result)
+    print(result)
+    return result
+
 def main() -> None:
     """
     Main function to execute the script.
     """
+    # Set up logging configuration
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(sys.argv[3] if len(sys.argv) > 3 else "keyword_search.log"),
+            logging.StreamHandler()
+        ]
+    )
     if len(sys.argv) < 4:
         logger.error("Usage: python script_keyword.py <input_dir> <output_dir> <log_file> <session_id>")
         sys.exit(1)
@@ -0,0 +1 @@
+# Location: /opt/my_flask_app/tests/__init__.py
@@ -0,0 +1,106 @@
+# Location: /opt/my_flask_app/tests/test_ccr_input.py
+"""
+CCR input as the app builds it (app.inputs.build_ccr_input, which strips the lines of
+tech-support.log) read by the CCR engine: which blocks name each profile.
+Run with: python3 -m unittest discover -s tests -t .
+"""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+from app import inputs, log_index
+
+SCRIPTS_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+
+TECH_SUPPORT_LOG = """\
+show clock
+Sat Oct 17 10:00:00 UTC 2026
+show running-config
+version 8.10
+!
+aaa profile "corp-aaa"
+   authentication-dot1x "corp-dot1x"
+!
+aaa authentication dot1x "corp-dot1x"
+!
+wlan ssid-profile "corp-ssid"
+   essid "corp"
+!
+wlan virtual-ap "corp-vap"
+   aaa-profile "corp-aaa"
+   ssid-profile "corp-ssid"
+   vlan 10
+!
+end
+show vrrp stats all
+Virtual Router 1:
+show ap active
+ap1
+show clock
+Sat Oct 17 10:00:01 UTC 2026
+"""
+
+
+def _load_engine():
+    path = os.path.join(SCRIPTS_FOLDER, 'CCR', 'ccr_engine.py')
+    spec = importlib.util.spec_from_file_location('test_ccr_engine', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CcrInputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        log_path = os.path.join(self.folder, 'tech-support.log')
+        with open(log_path, 'w', encoding='utf-8') as f:
+            f.write(TECH_SUPPORT_LOG)
+        notices = []
+        with open(log_path, 'rb') as source:
+            index = log_index.scan(source)
+            inputs.build_ccr_input(source, index, self.folder, notices)
+        self.assertEqual(notices, [])
+        self.input_path = os.path.join(self.folder, inputs.INPUT_FILENAMES['ccr'])
+        self.output_path = os.path.join(self.folder, 'CCR_output.html')
+        _load_engine().run(self.input_path, self.output_path, os.path.join(self.folder, 'ccr.log'))
+        with open(self.input_path, encoding='utf-8') as f:
+            self.lines = f.read().split("\n")
+        with open(self.input_path + '.refs.json', encoding='utf-8') as f:
+            self.refs = json.load(f)
+
+    def line_of(self, text):
+        return self.lines.index(text) + 1
+
+    def test_input_lines_are_stripped(self):
+        self.assertIn('aaa-profile "corp-aaa"', self.lines)
+
+    def profile(self, keyword, name):
+        return next(p for p in self.refs['profiles'] if p['type'] == keyword and p['name'] == name)
+
+    def test_profile_named_inside_a_block_is_attributed_to_its_header(self):
+        header = self.line_of('wlan virtual-ap "corp-vap"')
+        self.assertEqual(self.refs['blocks'][str(header)], 'wlan virtual-ap "corp-vap"')
+        self.assertEqual(self.profile('aaa profile', 'corp-aaa')['blocks'], [header])
+        self.assertEqual(self.profile('wlan ssid-profile', 'corp-ssid')['blocks'], [header])
+        self.assertEqual(self.profile('aaa authentication dot1x', 'corp-dot1x')['blocks'],
+                         [self.line_of('aaa profile "corp-aaa"')])
+        with open(self.output_path, encoding='utf-8') as f:
+            self.assertIn(f'{header}: wlan virtual-ap &quot;corp-vap&quot;', f.read())
+
+    def test_references_leave_out_the_lines_a_profile_is_reported_from(self):
+        profile = self.profile('aaa profile', 'corp-aaa')
+        self.assertEqual(profile['lines'], [self.line_of('aaa profile "corp-aaa"')])
+        self.assertEqual(profile['references'], [self.line_of('aaa-profile "corp-aaa"')])
+        header = self.line_of('wlan virtual-ap "corp-vap"')
+        with open(self.output_path, encoding='utf-8') as f:
+            self.assertIn('<td>aaa profile</td><td>corp-aaa</td><td style="text-align: left;">'
+                          f'{header}: wlan virtual-ap &quot;corp-vap&quot;</td>', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/python3.8
+# Location: /opt/my_flask_app/worker.py
+# Script job worker daemon.
+# Runs queued script jobs and pipeline stages on this host, next to (or, with
+# JOB_WEB_WORKERS off, instead of) the web process's own workers. The host needs
+# the same config.py, the database and UPLOAD_FOLDER mounted at the same path.
+#
+#   python3.8 worker.py [--workers N]
+#
+# SIGTERM or Ctrl-C stops claiming jobs and waits for the running ones to finish;
+# a second one exits at once, and the jobs left running are reclaimed by the
+# other workers once this one's lease runs out.
+
+import os
+import signal
+import argparse
+import threading
+from app import create_app
+from app.jobs import job_queue
+
+# Set the time zone explicitly
+os.environ["TZ"] = "America/Los_Angeles"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run script jobs from the shared job queue.")
+    parser.add_argument("--workers", type=int, default=None, help="Jobs run at a time (default: JOB_WORKERS)")
+    args = parser.parse_args()
+
+    app = create_app()
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    job_queue.start(args.workers or app.config['JOB_WORKERS'])
+    print(f"Job worker {job_queue.name} running {len(job_queue.workers)} jobs at a time.")
+    while not stop.wait(1):
+        pass
+    print("Stopping: waiting for the running jobs to finish.")
+    job_queue.stop()
+
+if __name__ == "__main__":
+    main()